@@ -1,33 +1,30 @@
 # analytics_service/db.py
-import sqlite3
-from contextlib import contextmanager
 from typing import List, Dict
 import os
 import logging
+from shared.db_pool import get_pool
+from shared.write_behind import get_buffer
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AnalyticsDB")
 
 class AnalyticsDatabase:
     def __init__(self, db_path: str = 'analytics.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(
+            self.db_path,
+            pragmas=(('foreign_keys', 'ON'),),
+            journal_mode='WAL',
+            timeout=15.0
+        )
+        # product_views — har ko'rish alohida tranzaksiya emas, fon threadda paketlab
+        self.views = get_buffer(self.pool)
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=15.0)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.execute("PRAGMA journal_mode = WAL;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"DB xato: {e}")
-            raise
-        finally:
-            conn.close()
+        """
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
+        """
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -57,4 +54,14 @@ class AnalyticsDatabase:
 
             # 3. cache for fast queries
             conn.execute("CREATE INDEX IF NOT EXISTS idx_views_product ON product_views(product_id)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_views_date ON product_views(viewed_at)")
\ No newline at end of file
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_views_date ON product_views(viewed_at)")
+
+    # ========================
+    # PRODUCT VIEWS
+    # ========================
+    def record_product_view(self, product_id: int, user_id: int = None):
+        """Bitta ko'rish — buferga (fon threadda executemany bilan yoziladi)"""
+        self.views.add(
+            "INSERT INTO product_views (product_id, user_id) VALUES (?, ?)",
+            (product_id, user_id)
+        )
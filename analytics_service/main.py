@@ -1,9 +1,12 @@
 # analytics_service/main.py
-import ssl, os, subprocess, logging
-from http.server import HTTPServer
+import ssl, os, sys, subprocess, logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import logs
+from shared.server import create_server
 from api import GraphQLHandler
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(name)s | %(message)s')
+logs.setup('analytics')
 logger = logging.getLogger("AnalyticsService")
 
 def run():
@@ -15,10 +18,9 @@ def run():
             '-keyout', key, '-out', cert, '-days', '365', '-nodes', '-batch',
             '-subj', '/CN=localhost'
         ], check=True)
-    server = HTTPServer(('localhost', PORT), GraphQLHandler)
     ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     ctx.load_cert_chain(cert, key)
-    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    server = create_server(('localhost', PORT), GraphQLHandler, ctx)
     logger.info(f"Analytics Service → https://localhost:{PORT}")
     server.serve_forever()
 
@@ -1,7 +1,7 @@
 # analytics_service/repository.py
 from db import AnalyticsDatabase
 from typing import Dict, List
-import requests
+from shared import http_client
 import logging
 from datetime import datetime, timedelta
 import json
@@ -19,7 +19,7 @@ SERVICES = {
 
 def _call(service: str, query: str, variables: Dict = None) -> Dict:
     try:
-        resp = requests.post(SERVICES[service], json={"query": query, "variables": variables or {}}, verify=False, timeout=5)
+        resp = http_client.post_graphql(SERVICES[service], query, variables, timeout=5)
         resp.raise_for_status()
         return resp.json().get('data', {})
     except Exception as e:
@@ -94,4 +94,11 @@ def get_revenue_trend(days: int = 7) -> List[Dict]:
             WHERE date >= date('now', ? || ' days') 
             ORDER BY date
         """, (f"-{days}",))
-        return [dict(row) for row in cursor.fetchall()]
\ No newline at end of file
+        return [dict(row) for row in cursor.fetchall()]
+
+# ========================
+# PRODUCT VIEWS
+# ========================
+def track_product_view(product_id: int, user_id: int = None) -> bool:
+    db.record_product_view(product_id, user_id)
+    return True
@@ -1,9 +1,9 @@
 # analytics_service/schemas.py
 from graphql import (
     GraphQLSchema, GraphQLObjectType, GraphQLField, GraphQLString,
-    GraphQLInt, GraphQLFloat, GraphQLList, GraphQLNonNull
+    GraphQLInt, GraphQLFloat, GraphQLList, GraphQLNonNull, GraphQLBoolean
 )
-from repository import get_dashboard_stats, get_top_products, get_revenue_trend
+from repository import get_dashboard_stats, get_top_products, get_revenue_trend, track_product_view
 
 # TYPES
 DailyStatsType = GraphQLObjectType('DailyStats', {
@@ -31,4 +31,13 @@ Query = GraphQLObjectType('Query', {
     'revenueTrend': GraphQLField(GraphQLList(RevenueDayType), args={'days': GraphQLInt}, resolve=lambda _, i, days=7: get_revenue_trend(days)),
 })
 
-schema = GraphQLSchema(query=Query)
\ No newline at end of file
+# MUTATION
+Mutation = GraphQLObjectType('Mutation', {
+    'trackProductView': GraphQLField(
+        GraphQLBoolean,
+        args={'product_id': GraphQLNonNull(GraphQLInt), 'user_id': GraphQLInt},
+        resolve=lambda _, i, product_id, user_id=None: track_product_view(product_id, user_id)
+    ),
+})
+
+schema = GraphQLSchema(query=Query, mutation=Mutation)
\ No newline at end of file
@@ -0,0 +1,153 @@
+# api_gateway/federation.py
+"""
+Router tuzgan rejani bajarish: subquerylar upstreamlarga parallel yuboriladi
+(mutatsiyalar — ketma-ket), javoblar bitta natijaga birlashtiriladi,
+xizmatlararo bog'lanishlar (OrderItem.product) batched so'rov bilan to'ldiriladi.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from shared import config, http_client
+from router import Plan, SERVICES, REF_ID_ALIAS, Stitch, SubQuery, wrap_namespace
+
+logger = logging.getLogger("GatewayFederation")
+
+_pool = ThreadPoolExecutor(max_workers=config.GATEWAY_FANOUT_WORKERS, thread_name_prefix="gateway-fanout")
+
+
+def execute(plan: Plan, variables: Dict, operation_name: Optional[str] = None) -> Tuple[int, Dict]:
+    variables = variables or {}
+    if len(plan.subqueries) == 1:
+        return _run(plan.subqueries[0], variables, operation_name)
+
+    if plan.operation == 'mutation':
+        # GraphQL spetsifikatsiyasi: root mutatsiyalar ketma-ket bajariladi
+        results = [_run(sq, variables, operation_name) for sq in plan.subqueries]
+    else:
+        futures = [_pool.submit(_run, sq, variables, operation_name) for sq in plan.subqueries]
+        results = [f.result() for f in futures]
+    return _merge(plan, results)
+
+
+# ========================
+# UPSTREAM
+# ========================
+def _post(service: str, query: str, variables: Dict, operation_name: Optional[str] = None) -> Tuple[int, Dict]:
+    # APQ: upstreamga avval hash, topilmasa to'liq matn
+    resp = http_client.post_graphql(SERVICES[service], query, variables, operation_name, timeout=10)
+    # 4xx javoblar (GraphQL xatolari) klientga o'zgarishsiz qaytadi
+    if resp.status_code >= 500:
+        resp.raise_for_status()
+    return resp.status_code, resp.json()
+
+
+def _run(sq: SubQuery, variables: Dict, operation_name: Optional[str]) -> Tuple[int, Dict]:
+    if sq.variables is not None:
+        variables = {name: variables[name] for name in sq.variables if name in variables}
+    try:
+        status, result = _post(sq.service, sq.query, variables, operation_name)
+    except Exception as e:
+        logger.error(f"{sq.service} xizmati xatosi: {e}")
+        return 502, {"data": None, "errors": [{"message": f"{sq.service} xizmati javob bermadi"}]}
+
+    if sq.stitches and result.get('data'):
+        _stitch(result, sq.stitches)
+    if sq.namespace:
+        result = wrap_namespace(result, sq.namespace)
+    return status, result
+
+
+def _merge(plan: Plan, results: List[Tuple[int, Dict]]) -> Tuple[int, Dict]:
+    parts = {}
+    errors = []
+    has_data = False
+    for sq, (_, result) in zip(plan.subqueries, results):
+        data = result.get('data')
+        has_data = has_data or data is not None
+        for key in sq.keys:
+            parts[key] = data.get(key) if isinstance(data, dict) else None
+        errors.extend(result.get('errors') or [])
+
+    merged = {"data": {key: parts.get(key) for key in plan.keys} if has_data else None}
+    if errors:
+        merged["errors"] = errors
+    status = 200 if has_data else max(status for status, _ in results)
+    return status, merged
+
+
+# ========================
+# STITCHING
+# ========================
+def _parents(node, path) -> List[Dict]:
+    """Javobdagi `path` bo'yicha ota obyektlar (ro'yxatlar ochiladi)"""
+    nodes = [node]
+    for key in path:
+        next_nodes = []
+        for item in nodes:
+            value = item.get(key) if isinstance(item, dict) else None
+            if isinstance(value, list):
+                next_nodes.extend(value)
+            elif value is not None:
+                next_nodes.append(value)
+        nodes = next_nodes
+    result = []
+    for item in nodes:
+        if isinstance(item, list):
+            result.extend(i for i in item if isinstance(i, dict))
+        elif isinstance(item, dict):
+            result.append(item)
+    return result
+
+
+def _stitch(result: Dict, stitches: Tuple[Stitch, ...]):
+    """
+    Bitta subquery javobidagi barcha bog'lanishlar: har bir egasi xizmatga bitta so'rov,
+    har bir bog'lanish — alias bilan alohida maydon (ids bir marta, takrorsiz).
+    """
+    by_service: Dict[str, List[Tuple[int, Stitch, List[Dict], List]]] = {}
+    for i, stitch in enumerate(stitches):
+        parents = _parents(result['data'], stitch.path)
+        ids = list(dict.fromkeys(p.get(stitch.key) for p in parents if p.get(stitch.key) is not None))
+        by_service.setdefault(stitch.reference.service, []).append((i, stitch, parents, ids))
+
+    for service, entries in by_service.items():
+        fetched = _fetch_references(service, [(i, stitch, ids) for i, stitch, _, ids in entries if ids])
+        if fetched is None:
+            result.setdefault('errors', []).append({"message": f"{service} xizmatidan bog'langan ma'lumot olinmadi"})
+            fetched = {}
+        for i, stitch, parents, _ in entries:
+            objects = fetched.get(i, {})
+            for parent in parents:
+                parent[stitch.field] = objects.get(parent.pop(stitch.key, None))
+        for objects in fetched.values():
+            for obj in objects.values():
+                obj.pop(REF_ID_ALIAS, None)
+
+
+def _fetch_references(service: str, entries: List[Tuple[int, Stitch, List]]) -> Optional[Dict[int, Dict]]:
+    if not entries:
+        return {}
+    definitions, fields, variables, fragments = [], [], {}, []
+    for i, stitch, ids in entries:
+        definitions.append(f"$ids{i}: [Int!]!")
+        fields.append(f"r{i}: {stitch.reference.field}(ids: $ids{i}) {stitch.selection}")
+        variables[f"ids{i}"] = ids
+        fragments.extend(f for f in stitch.fragments if f not in fragments)
+    query = f"query ({', '.join(definitions)}) {{\n" + "\n".join(fields) + "\n}\n" + "\n".join(fragments)
+
+    try:
+        _, data = _post(service, query, variables)
+    except Exception as e:
+        logger.error(f"{service} bog'lanish so'rovi xatosi: {e}")
+        return None
+    if data.get('errors'):
+        logger.warning(f"{service} bog'lanish xatolari: {[e.get('message') for e in data['errors']]}")
+    if not data.get('data'):
+        return None
+
+    fetched = {}
+    for i, _, _ in entries:
+        items = data['data'].get(f"r{i}") or []
+        fetched[i] = {item[REF_ID_ALIAS]: item for item in items if item and item.get(REF_ID_ALIAS) is not None}
+    return fetched
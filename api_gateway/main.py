@@ -1,92 +1,138 @@
 # api_gateway/api.py
-from http.server import BaseHTTPRequestHandler
-import json
-import requests
+import asyncio
 import logging
+import ssl, os, sys, subprocess
+from typing import Any, Dict, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import logs, persisted_queries
+from shared.graphql_app import GraphQLApp
+from shared.handler import GraphQLRequestHandler
+from shared.server import create_server
+import federation
+from router import Plan, Router, RoutingError
 
 logger = logging.getLogger("APIGateway")
 
-SERVICES = {
-    "users": "https://localhost:8443/graphql",
-    "products": "https://localhost:8444/graphql",
-    "orders": "https://localhost:8445/graphql",
-    "payments": "https://localhost:8446/graphql",
-}
-
-class GraphQLHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
-            html = """
-            <h1>API GATEWAY — ISHLAYAPTI!</h1>
-            <p><strong>Port:</strong> <code>8447</code></p>
-            <p><strong>GraphQL:</strong> <code>POST /graphql</code></p>
-            <hr>
-            <h3>Test: Buyurtma yaratish</h3>
-            <pre>
+router = Router()
+persisted_store = persisted_queries.PersistedQueryStore()
+
+
+class OperationError(Exception):
+    """Operatsiyani rejalashtirib bo'lmadi — tayyor javob bilan"""
+
+    def __init__(self, status: int, payload: Dict):
+        super().__init__(payload)
+        self.status = status
+        self.payload = payload
+
+
+def _error_payload(msg: str) -> Dict:
+    return GraphQLApp.error_payload(msg)
+
+
+# ========================
+# OPERATSIYALAR
+# ========================
+def prepare_operation(data) -> Tuple[Plan, Dict, Optional[str]]:
+    if not isinstance(data, dict):
+        raise OperationError(400, _error_payload("Noto'g'ri so'rov formati"))
+    variables = data.get('variables') or {}
+    operation_name = data.get('operationName')
+
+    # APQ: klient faqat hash yuborishi mumkin
+    try:
+        query = persisted_store.resolve(data.get('query'), persisted_queries.extract_hash(data))
+    except persisted_queries.PersistedQueryError as e:
+        raise OperationError(e.status, e.payload())
+    if not query:
+        raise OperationError(400, _error_payload("GraphQL query bo'sh"))
+
+    # Reja: sxema bo'yicha xizmatlarga bo'lish (query hash keshi bilan)
+    try:
+        plan = router.plan(query, operation_name)
+    except RoutingError as e:
+        raise OperationError(400, _error_payload(str(e)))
+    return plan, variables, operation_name
+
+
+def execute_operation(data) -> Tuple[int, Dict]:
+    try:
+        plan, variables, operation_name = prepare_operation(data)
+    except OperationError as e:
+        return e.status, e.payload
+    # Subquerylar parallel, natija birlashtiriladi
+    return federation.execute(plan, variables, operation_name)
+
+
+# ========================
+# APP
+# ========================
+INDEX_HTML = """
+<h1>API GATEWAY — ISHLAYAPTI!</h1>
+<p><strong>Port:</strong> <code>8447</code></p>
+<p><strong>GraphQL:</strong> <code>POST /graphql</code></p>
+<hr>
+<h3>Test: Buyurtma yaratish</h3>
+<pre>
 curl -k -X POST https://localhost:8447/graphql \\
   -d '{"query": "mutation { orders { createOrder(input: {userId:1, items:[{productId:1,quantity:1}], shippingAddress:\\"Toshkent\\", paymentMethod:\\"card\\"}) } }"}'
-            </pre>
-            """
-            self.wfile.write(html.encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-
-    def do_POST(self):
-        if self.path != '/graphql':
-            self._error(404, "Endpoint topilmadi")
-            return
+</pre>
+"""
+
+
+class GatewayApp(GraphQLApp):
+    """
+    Gatewayning o'z sxemasi yo'q: operatsiya router bilan rejalashtiriladi va federation
+    orqali xizmatlarda bajariladi. So'rovni o'qish, batch (mutatsiyalar ketma-ket),
+    kodlash va HTTP qatlami — xizmatlar bilan umumiy (GraphQLApp / GraphQLRequestHandler).
+    """
+
+    def __init__(self):
+        super().__init__(schema=None, name='gateway', index_html=INDEX_HTML)
+
+    def _handle_operation(self, request_data: Any, client_ip: str = None, request: Any = None) -> Tuple[int, Dict]:
+        try:
+            return execute_operation(request_data)
+        except Exception:
+            self.logger.exception("Operatsiya xatosi")
+            return 500, self.error_payload("Ichki xato")
 
+    async def _handle_operation_async(self, request_data: Any, client_ip: str = None) -> Tuple[int, Dict]:
+        # Upstream so'rovlar bloklovchi (requests) — event loopdan tashqarida
+        return await asyncio.to_thread(self._handle_operation, request_data, client_ip)
+
+    def _is_mutation(self, request_data: Any) -> bool:
+        # Batch parallelligi uchun: reja router keshidan (query hash bo'yicha) olinadi
         try:
-            length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(length).decode()
-            data = json.loads(body)
-            query = data.get('query', '')
-            variables = data.get('variables', {})
-
-            # Service aniqlash
-            service = None
-            if 'users' in query.lower():
-                service = "users"
-            elif 'products' in query.lower() or 'checkStock' in query:
-                service = "products"
-            elif 'orders' in query.lower() or 'createOrder' in query:
-                service = "orders"
-            elif 'payments' in query.lower() or 'createPayment' in query:
-                service = "payments"
-
-            if not service:
-                self._error(400, "Xizmat aniqlanmadi")
-                return
-
-            url = SERVICES[service]
-            logger.info(f"Forward → {service.upper()} ({url})")
-
-            # Forward
-            resp = requests.post(
-                url,
-                json={"query": query, "variables": variables},
-                verify=False,
-                timeout=10
-            )
-            resp.raise_for_status()
-            result = resp.json()
-
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result, ensure_ascii=False, indent=2).encode())
-
-        except Exception as e:
-            logger.error(f"Xato: {e}")
-            self._error(500, "Ichki xato")
-
-    def _error(self, code, msg):
-        self.send_response(code)
-        self.send_header('.Content-type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps({"errors": [{"message": msg}]}).encode())
-        
\ No newline at end of file
+            plan, _, _ = prepare_operation(request_data)
+        except OperationError:
+            return False
+        return plan.operation == 'mutation'
+
+
+class GraphQLHandler(GraphQLRequestHandler):
+    app = GatewayApp()
+
+
+# ========================
+# HTTPS SERVER
+# ========================
+def run():
+    PORT = 8447
+    cert, key = 'cert.pem', 'key.pem'
+    if not os.path.exists(cert):
+        subprocess.run([
+            'openssl', 'req', '-x509', '-newkey', 'rsa:4096',
+            '-keyout', key, '-out', cert, '-days', '365', '-nodes', '-batch',
+            '-subj', '/CN=localhost'
+        ], check=True)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    server = create_server(('localhost', PORT), GraphQLHandler, ctx)
+    logger.info(f"API Gateway → https://localhost:{PORT}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    logs.setup('gateway')
+    run()
@@ -0,0 +1,525 @@
+# api_gateway/router.py
+"""
+Sxemaga asoslangan marshrutlash.
+
+Har bir xizmatning root maydonlari introspection orqali olinadi va
+(operatsiya turi, maydon) -> xizmat jadvali tuziladi. So'rov bir marta parse qilinadi,
+qaror esa query hash bo'yicha keshlanadi — takroriy so'rovlar parse qilinmaydi.
+
+Ikki xil yozuv qo'llab-quvvatlanadi:
+    { product(id: 1) { name } }                 — maydon nomi bo'yicha
+    mutation { orders { createOrder(...) } }    — xizmat nomi bilan (namespace)
+
+Bir nechta xizmatga tegishli so'rov xizmatlar bo'yicha subquerylarga bo'linadi
+(Plan); ularni federation.execute() parallel bajaradi va natijani birlashtiradi.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from graphql import (
+    DocumentNode, FieldNode, FragmentDefinitionNode, FragmentSpreadNode,
+    GraphQLError, InlineFragmentNode, NameNode, OperationDefinitionNode,
+    SelectionSetNode, Visitor, parse, print_ast, visit
+)
+
+from shared import config, http_client
+
+logger = logging.getLogger("GatewayRouter")
+
+SERVICES = {
+    "users": "https://localhost:8443/graphql",
+    "products": "https://localhost:8444/graphql",
+    "orders": "https://localhost:8445/graphql",
+    "payments": "https://localhost:8446/graphql",
+    "delivery": "https://localhost:8448/graphql",
+    "analytics": "https://localhost:8449/graphql",
+    "blog": "https://localhost:8450/graphql",
+    "cart": "https://localhost:8451/graphql",
+    "promotions": "https://localhost:8452/graphql",
+}
+
+# Bir nechta xizmatda bor maydonlar uchun asosiy egasi.
+# Boshqasiga namespace orqali murojaat qilinadi: { blog { categories { id } } }
+PREFERRED_OWNER = {
+    ('query', 'categories'): 'products',
+    ('mutation', 'createCategory'): 'products',
+    ('mutation', 'requestRefund'): 'orders',
+}
+
+# Xizmatlar orasidagi bog'lanishlar: (xizmat, tip, maydon) -> boshqa xizmatdagi obyekt.
+# Maydon upstream sxemasida yo'q — gateway uni so'rovdan olib tashlaydi, `key` ni
+# so'raydi va barcha idlarni bitta batched so'rov bilan yuklab javobga qo'shadi.
+#   { order(id: 1) { items { quantity product { name price } } } }
+class Reference(NamedTuple):
+    key: str          # ota obyektdagi id maydoni
+    service: str      # obyekt egasi
+    field: str        # ids: [Int!]! qabul qiladigan root maydon
+    id_field: str = 'id'
+
+
+REFERENCES = {
+    ('orders', 'OrderItem', 'product'): Reference('product_id', 'products', 'productsByIds'),
+}
+
+# Faqat __typename / __schema so'ralsa
+DEFAULT_SERVICE = "products"
+
+INTROSPECTION_QUERY = """
+{
+  __schema {
+    queryType { name }
+    mutationType { name }
+    types {
+      name
+      fields {
+        name
+        type { name ofType { name ofType { name ofType { name ofType { name } } } } }
+      }
+    }
+  }
+}
+"""
+
+# Gateway qo'shgan yordamchi aliaslar (javobdan olib tashlanadi)
+REF_KEY_PREFIX = "_ref_"
+REF_ID_ALIAS = "_ref_id"
+
+
+class RoutingError(Exception):
+    """So'rovni xizmatga yo'naltirib bo'lmadi (HTTP 400)"""
+
+
+class Stitch(NamedTuple):
+    path: Tuple[str, ...]       # subquery javobida ota obyektlargacha kalitlar
+    key: str                    # ota obyektga qo'shilgan id alias
+    field: str                  # javobdagi kalit (alias yoki maydon nomi)
+    reference: Reference
+    selection: str              # obyekt uchun selection set (_ref_id bilan)
+    fragments: Tuple[str, ...] = ()
+
+
+class SubQuery(NamedTuple):
+    service: str
+    query: str
+    # Subquery ishlatadigan o'zgaruvchilar; None — so'rov o'zgarmagan, hammasi yuboriladi
+    variables: Optional[Tuple[str, ...]]
+    # Javobdagi root kalitlar (birlashtirish uchun)
+    keys: Tuple[str, ...]
+    # Namespace yozuvida javob shu kalit ostiga o'raladi
+    namespace: Optional[str] = None
+    stitches: Tuple[Stitch, ...] = ()
+
+
+class Plan(NamedTuple):
+    operation: str
+    subqueries: Tuple[SubQuery, ...]
+    keys: Tuple[str, ...]
+
+
+# ========================
+# ROUTING TABLE
+# ========================
+class RoutingTable:
+    def __init__(self, services: Dict[str, str] = None):
+        self.services = services or SERVICES
+        self._fields: Dict[Tuple[str, str], List[str]] = {}
+        # xizmat -> tip -> maydon -> maydon tipi (List/NonNull ochilgan)
+        self._types: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self._roots: Dict[str, Dict[str, str]] = {}
+        self._loaded: Set[str] = set()
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        self.version = 0
+
+    def _introspect(self, service: str) -> Optional[Dict]:
+        try:
+            resp = http_client.post(
+                self.services[service],
+                json={"query": INTROSPECTION_QUERY},
+                timeout=config.GATEWAY_INTROSPECTION_TIMEOUT
+            )
+            resp.raise_for_status()
+            return resp.json()['data']['__schema']
+        except Exception as e:
+            logger.warning(f"{service} sxemasini olib bo'lmadi: {e}")
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Hali yuklanmagan xizmatlarni introspection qiladi. Jadval o'zgarsa True"""
+        with self._lock:
+            missing = [s for s in self.services if s not in self._loaded]
+            if not missing or (not force and time.monotonic() - self._last_refresh < config.GATEWAY_REFRESH_INTERVAL):
+                return False
+            self._last_refresh = time.monotonic()
+
+            with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+                results = dict(zip(missing, pool.map(self._introspect, missing)))
+
+            changed = False
+            for service, schema in results.items():
+                if schema is None:
+                    continue
+                self._load(service, schema)
+                changed = True
+            if changed:
+                self.version += 1
+                logger.info(f"Marshrut jadvali: {len(self._loaded)}/{len(self.services)} xizmat, "
+                            f"{len(self._fields)} maydon")
+            return changed
+
+    def _load(self, service: str, schema: Dict):
+        types = {}
+        for t in schema['types']:
+            if t.get('fields') is None or t['name'].startswith('__'):
+                continue
+            types[t['name']] = {f['name']: _named_type(f['type']) for f in t['fields']}
+        roots = {
+            op: (schema.get(key) or {}).get('name')
+            for op, key in (('query', 'queryType'), ('mutation', 'mutationType'))
+        }
+        for op, root in roots.items():
+            for name in types.get(root, {}) if root else ():
+                owners = self._fields.setdefault((op, name), [])
+                if service not in owners:
+                    owners.append(service)
+        self._types[service] = types
+        self._roots[service] = roots
+        self._loaded.add(service)
+
+    @property
+    def loaded(self) -> Set[str]:
+        return set(self._loaded)
+
+    def owners(self, op: str, name: str) -> List[str]:
+        return self._fields.get((op, name), [])
+
+    def owner(self, op: str, name: str) -> Optional[str]:
+        owners = self.owners(op, name)
+        if not owners:
+            return None
+        if len(owners) == 1:
+            return owners[0]
+        preferred = PREFERRED_OWNER.get((op, name))
+        return preferred if preferred in owners else owners[0]
+
+    def root_type(self, service: str, op: str) -> Optional[str]:
+        return self._roots.get(service, {}).get(op)
+
+    def field_type(self, service: str, type_name: str, field: str) -> Optional[str]:
+        return self._types.get(service, {}).get(type_name, {}).get(field)
+
+
+# ========================
+# ROUTER
+# ========================
+class Router:
+    def __init__(self, table: RoutingTable = None, cache_size: int = None):
+        self.table = table or RoutingTable()
+        self.cache_size = cache_size or config.GATEWAY_ROUTE_CACHE_SIZE
+        self._cache: "OrderedDict[str, Plan]" = OrderedDict()
+        self._cache_version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, query: str, operation_name: Optional[str] = None) -> Plan:
+        key = hashlib.sha256(f"{operation_name or ''}\n{query}".encode('utf-8')).hexdigest()
+        with self._lock:
+            if self._cache_version != self.table.version:
+                self._cache.clear()
+                self._cache_version = self.table.version
+            plan = self._cache.get(key)
+            if plan is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+
+        plan = self._build(query, operation_name)
+        with self._lock:
+            self._cache[key] = plan
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return plan
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses,
+                    'services': sorted(self.table.loaded)}
+
+    # ========================
+    # PLANNING
+    # ========================
+    def _build(self, query: str, operation_name: Optional[str]) -> Plan:
+        if not self.table.loaded:
+            self.table.refresh()
+
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            raise RoutingError(f"Sintaksis xatosi: {e.message}")
+
+        operation = _select_operation(document, operation_name)
+        op = operation.operation.value
+        if op == 'subscription':
+            raise RoutingError("Subscription qo'llab-quvvatlanmaydi")
+
+        fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+        root_fields = _root_fields(operation.selection_set, fragments)
+        keys = tuple(OrderedDict.fromkeys(_response_key(f) for f in root_fields))
+        meta = [f for f in root_fields if f.name.value.startswith('__')]
+        fields = [f for f in root_fields if not f.name.value.startswith('__')]
+
+        if not fields:
+            return Plan(op, (SubQuery(DEFAULT_SERVICE, query, None, keys),), keys)
+
+        # (xizmat, namespace maydoni, root maydonlar)
+        groups: List[Tuple[str, Optional[FieldNode], List[FieldNode]]] = []
+        for field in fields:
+            if self._is_namespace(op, field):
+                groups.append((field.name.value, field, [field]))
+                continue
+            service = self._owner(op, field.name.value)
+            if op == 'mutation':
+                # Mutatsiyalar tartibi saqlanadi: faqat ketma-ket kelganlar birlashadi
+                target = groups[-1] if groups and groups[-1][0] == service and groups[-1][1] is None else None
+            else:
+                target = next((g for g in groups if g[0] == service and g[1] is None), None)
+            if target is None:
+                groups.append((service, None, [field]))
+            else:
+                target[2].append(field)
+
+        subqueries = []
+        for i, (service, namespace, group_fields) in enumerate(groups):
+            selections = list(namespace.selection_set.selections) if namespace else list(group_fields)
+            if i == 0:
+                selections = list(meta) + selections
+
+            stitches: List[Stitch] = []
+            selection_set = SelectionSetNode(selections=tuple(selections))
+            if any(ref[0] == service for ref in REFERENCES):
+                selection_set = self._extract_stitches(
+                    service, self.table.root_type(service, op), selection_set, (), stitches, fragments
+                )
+
+            if len(groups) == 1 and namespace is None and not stitches:
+                # O'zgartirish shart emas — so'rov aynan o'zi yuboriladi
+                return Plan(op, (SubQuery(service, query, None, keys),), keys)
+
+            used = _used_fragments(selection_set, fragments)
+            variables = _used_variables(selection_set, [fragments[n] for n in used])
+            subquery_op = OperationDefinitionNode(**{
+                **_node_kwargs(operation),
+                'variable_definitions': tuple(
+                    v for v in operation.variable_definitions or () if v.variable.name.value in variables
+                ),
+                'selection_set': selection_set,
+            })
+            text = print_ast(DocumentNode(definitions=[subquery_op] + [fragments[n] for n in sorted(used)]))
+            subqueries.append(SubQuery(
+                service=service,
+                query=text,
+                variables=tuple(sorted(variables)),
+                keys=(_response_key(namespace),) if namespace else
+                     tuple(OrderedDict.fromkeys(_response_key(f) for f in (meta if i == 0 else []) + group_fields)),
+                namespace=_response_key(namespace) if namespace else None,
+                stitches=tuple(stitches),
+            ))
+
+        logger.debug(f"Reja: {[sq.service for sq in subqueries]}")
+        return Plan(op, tuple(subqueries), keys)
+
+    def _extract_stitches(self, service: str, type_name: Optional[str], selection_set: SelectionSetNode,
+                          path: Tuple[str, ...], stitches: List[Stitch],
+                          fragments: Dict[str, FragmentDefinitionNode],
+                          inlining: frozenset = frozenset()) -> SelectionSetNode:
+        """
+        REFERENCES dagi maydonlarni selection'dan olib, o'rniga id alias qo'yadi.
+        Bog'lanishi bor xizmatlarda fragment spreadlar inline qilinadi.
+        """
+        selections = []
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                name = selection.name.value
+                key = _response_key(selection)
+                reference = REFERENCES.get((service, type_name, name))
+                if reference is not None:
+                    if selection.selection_set is None:
+                        raise RoutingError(f"{type_name}.{name} uchun maydonlar tanlanmagan")
+                    id_field = FieldNode(alias=NameNode(value=REF_ID_ALIAS), name=NameNode(value=reference.id_field))
+                    target = SelectionSetNode(selections=(id_field,) + tuple(selection.selection_set.selections))
+                    used = _used_fragments(target, fragments)
+                    stitches.append(Stitch(
+                        path=path,
+                        key=REF_KEY_PREFIX + key,
+                        field=key,
+                        reference=reference,
+                        selection=print_ast(target),
+                        fragments=tuple(print_ast(fragments[n]) for n in sorted(used)),
+                    ))
+                    selections.append(FieldNode(alias=NameNode(value=REF_KEY_PREFIX + key), name=NameNode(value=reference.key)))
+                    continue
+                if selection.selection_set is not None and type_name:
+                    child = self.table.field_type(service, type_name, name)
+                    selection = FieldNode(**{
+                        **_node_kwargs(selection),
+                        'selection_set': self._extract_stitches(
+                            service, child, selection.selection_set, path + (key,), stitches, fragments, inlining
+                        ),
+                    })
+            elif isinstance(selection, (InlineFragmentNode, FragmentSpreadNode)):
+                if isinstance(selection, FragmentSpreadNode):
+                    # Spread inline fragmentga aylantiriladi: bog'lanish yo'li joylashuvga bog'liq
+                    name = selection.name.value
+                    fragment = fragments.get(name)
+                    if fragment is None:
+                        raise RoutingError(f"Fragment topilmadi: {name}")
+                    if name in inlining:
+                        raise RoutingError(f"Fragment sikli: {name}")
+                    inlining = inlining | {name}
+                    selection = InlineFragmentNode(
+                        type_condition=fragment.type_condition,
+                        directives=selection.directives,
+                        selection_set=fragment.selection_set
+                    )
+                condition = selection.type_condition.name.value if selection.type_condition else type_name
+                selection = InlineFragmentNode(**{
+                    **_node_kwargs(selection),
+                    'selection_set': self._extract_stitches(
+                        service, condition, selection.selection_set, path, stitches, fragments, inlining
+                    ),
+                })
+            selections.append(selection)
+        return SelectionSetNode(selections=tuple(selections))
+
+    def _owner(self, op: str, name: str) -> str:
+        owner = self.table.owner(op, name)
+        if owner is None and self.table.refresh():
+            owner = self.table.owner(op, name)
+        if owner is None:
+            raise RoutingError(f"Noma'lum maydon: {name}")
+        return owner
+
+    def _is_namespace(self, op: str, field: FieldNode) -> bool:
+        """
+        Xizmat nomi bilan atalgan maydon namespace hisoblanadi, agar
+        argumentsiz bo'lsa va ichidagi barcha maydonlar o'sha xizmatning root maydonlari bo'lsa.
+        (`users { id }` — oddiy users maydoni, `users { me { id } }` — namespace)
+        """
+        service = field.name.value
+        if service not in self.table.services or field.arguments or not field.selection_set:
+            return False
+        inner = [s for s in field.selection_set.selections if isinstance(s, FieldNode)]
+        if len(inner) != len(field.selection_set.selections):
+            return False
+        if not self.table.owners(op, service):
+            return True
+        return all(service in self.table.owners(op, s.name.value) for s in inner if not s.name.value.startswith('__'))
+
+
+# ========================
+# AST HELPERS
+# ========================
+def _select_operation(document: DocumentNode, operation_name: Optional[str]) -> OperationDefinitionNode:
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    if operation_name:
+        for operation in operations:
+            if operation.name and operation.name.value == operation_name:
+                return operation
+        raise RoutingError(f"Operatsiya topilmadi: {operation_name}")
+    if len(operations) != 1:
+        raise RoutingError("Bir nechta operatsiya bo'lsa operationName kerak")
+    return operations[0]
+
+
+def _root_fields(selection_set, fragments: Dict[str, FragmentDefinitionNode], seen: Set[str] = None) -> List[FieldNode]:
+    """Root darajadagi maydonlar (fragment spread va inline fragmentlar ochiladi)"""
+    seen = seen if seen is not None else set()
+    fields = []
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.append(selection)
+        elif isinstance(selection, InlineFragmentNode):
+            fields.extend(_root_fields(selection.selection_set, fragments, seen))
+        elif isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            if name in seen:
+                continue
+            seen.add(name)
+            fragment = fragments.get(name)
+            if fragment is None:
+                raise RoutingError(f"Fragment topilmadi: {name}")
+            fields.extend(_root_fields(fragment.selection_set, fragments, seen))
+    return fields
+
+
+def _used_fragments(node, fragments: Dict[str, FragmentDefinitionNode], used: Set[str] = None) -> Set[str]:
+    """Selection set ichida (ichma-ich) ishlatilgan fragment nomlari"""
+    used = used if used is not None else set()
+    if node is None:
+        return used
+    for selection in node.selections:
+        if isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            if name not in used and name in fragments:
+                used.add(name)
+                _used_fragments(fragments[name].selection_set, fragments, used)
+        else:
+            _used_fragments(selection.selection_set, fragments, used)
+    return used
+
+
+class _VariableCollector(Visitor):
+    def __init__(self):
+        super().__init__()
+        self.names: Set[str] = set()
+
+    def enter_variable(self, node, *_):
+        self.names.add(node.name.value)
+
+
+def _used_variables(*nodes) -> Set[str]:
+    collector = _VariableCollector()
+    for node in nodes:
+        if isinstance(node, list):
+            for item in node:
+                visit(item, collector)
+        else:
+            visit(node, collector)
+    return collector.names
+
+
+def _response_key(field: FieldNode) -> str:
+    return (field.alias or field.name).value
+
+
+def _named_type(type_ref: Dict) -> Optional[str]:
+    """NonNull/List o'ramlarini ochib, asosiy tip nomini qaytaradi"""
+    while type_ref is not None:
+        if type_ref.get('name'):
+            return type_ref['name']
+        type_ref = type_ref.get('ofType')
+    return None
+
+
+def _node_kwargs(node) -> Dict:
+    return {key: getattr(node, key) for key in node.keys}
+
+
+def wrap_namespace(result: Dict, namespace: str) -> Dict:
+    """Upstream javobini namespace kaliti ostiga o'raydi"""
+    wrapped = dict(result)
+    if result.get('data') is not None:
+        wrapped['data'] = {namespace: result['data']}
+    if result.get('errors'):
+        wrapped['errors'] = [
+            {**e, 'path': [namespace] + e['path']} if e.get('path') else e
+            for e in result['errors']
+        ]
+    return wrapped
@@ -0,0 +1,158 @@
+# benchmarks/bench_reservations.py
+"""
+Flash-sale stsenariysi: bir nechta worker (thread yoki process) bir vaqtda bitta "issiq" SKU ni (har savatda
+yana 2 ta tasodifiy mahsulot bilan) bron qiladi.
+
+- eski — deferred tranzaksiya, har pozitsiyaga alohida UPDATE, qayta urinishsiz (oldingi reserve_stock)
+- yangi — ProductDatabase.reserve_stock: BEGIN IMMEDIATE, omborlarga taqsimlash + bitta UPDATE ... FROM, jitterli backoff
+
+Har variant vaqtinchalik bazada o'lchanadi: op/s, muvaffaqiyatli / stock tugagan / qulf xatolari,
+kechikish p50 / p99 va oversell tekshiruvi (bron qilingan jami = muvaffaqiyatli savatlar soni).
+
+Ishga tushirish (repo ildizidan):
+    python benchmarks/bench_reservations.py [workerlar] [har_worker_savatlar] [issiq_sku_stock] [--processes]
+
+--processes — workerlar alohida processlar (prefork rejimi), aks holda bitta processdagi threadlar.
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'products_service'))
+sys.path.append(ROOT)
+
+from db import ProductDatabase  # noqa: E402
+
+PRODUCTS = 100
+HOT_SKU = 1
+
+
+def seed(db: ProductDatabase, hot_stock: int):
+    with db.get_connection() as conn:
+        conn.execute("INSERT INTO categories (name, slug) VALUES ('Bench', 'bench')")
+        for i in range(1, PRODUCTS + 1):
+            conn.execute("""
+                INSERT INTO products (id, name, slug, sku, price, category_id)
+                VALUES (?, ?, ?, ?, 1000, 1)
+            """, (i, f"Mahsulot {i}", f"bench-{i}", f"BENCH-{i}"))
+            conn.execute("INSERT INTO inventory (product_id, quantity) VALUES (?, ?)",
+                         (i, hot_stock if i == HOT_SKU else 10 ** 9))
+
+
+def legacy_reserve(conn: sqlite3.Connection, items) -> bool:
+    """Oldingi repository.reserve_stock (xato o'rniga False)"""
+    cursor = conn.cursor()
+    try:
+        for item in items:
+            cursor.execute("""
+                UPDATE inventory
+                SET reserved_quantity = reserved_quantity + ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE product_id = ?
+                  AND (quantity - reserved_quantity) >= ?
+            """, (item['quantity'], item['product_id'], item['quantity']))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def basket():
+    others = random.sample(range(2, PRODUCTS + 1), 2)
+    return [{'product_id': HOT_SKU, 'quantity': 1}] + [{'product_id': pid, 'quantity': 1} for pid in others]
+
+
+def worker(variant: str, path: str, baskets: int, barrier=None) -> tuple:
+    """Bitta thread/process: baskets ta savat; (natijalar, kechikishlar, lock_retries)"""
+    db = ProductDatabase(path)
+    conn = sqlite3.connect(path, timeout=db.pool.timeout) if variant == 'eski' else None
+    counts = {'ok': 0, 'sold_out': 0, 'locked': 0}
+    timings = []
+    if barrier is not None:
+        barrier.wait()
+    for _ in range(baskets):
+        items = basket()
+        start = time.perf_counter()
+        try:
+            if variant == 'eski':
+                ok = legacy_reserve(conn, items)
+            else:
+                ok = not db.reserve_stock(items)['shortfalls']
+            counts['ok' if ok else 'sold_out'] += 1
+        except sqlite3.OperationalError:
+            counts['locked'] += 1
+        timings.append(time.perf_counter() - start)
+    return counts, timings, db.pool.lock_retries
+
+
+def run(variant: str, mode: str, workers: int, baskets: int, hot_stock: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{variant}.db")
+        db = ProductDatabase(path)
+        seed(db, hot_stock)
+        db.pool.close_all()
+
+        start = time.perf_counter()
+        if mode == 'process':
+            # Prefork rejimi: har process o'z ulanishi, GIL yo'q — qulf uchun haqiqiy raqobat
+            with multiprocessing.Pool(workers) as pool:
+                results = pool.starmap(worker, [(variant, path, baskets)] * workers)
+        else:
+            barrier = threading.Barrier(workers)
+            results = [None] * workers
+
+            def target(index: int):
+                results[index] = worker(variant, path, baskets, barrier)
+
+            threads = [threading.Thread(target=target, args=(i,)) for i in range(workers)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        elapsed = time.perf_counter() - start
+
+        counts = {key: sum(r[0][key] for r in results) for key in ('ok', 'sold_out', 'locked')}
+        latencies = sorted(t for r in results for t in r[1])
+        check = sqlite3.connect(path)
+        reserved, quantity = check.execute(
+            "SELECT reserved_quantity, quantity FROM inventory WHERE product_id = ?", (HOT_SKU,)
+        ).fetchone()
+        check.close()
+
+        return {
+            **counts,
+            'ops': len(latencies) / elapsed,
+            'p50': latencies[len(latencies) // 2] * 1000,
+            'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+            'consistent': reserved == counts['ok'] and reserved <= quantity,
+            'lock_retries': sum(r[2] for r in results),
+        }
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    mode = 'process' if '--processes' in sys.argv else 'thread'
+    workers = int(args[0]) if len(args) > 0 else 16
+    baskets = int(args[1]) if len(args) > 1 else 200
+    hot_stock = int(args[2]) if len(args) > 2 else workers * baskets // 2
+    print(f"{workers} {mode} x {baskets} savat, issiq SKU stock = {hot_stock}\n")
+    print(f"{'variant':<8} {'op/s':>8} {'ok':>6} {'tugadi':>7} {'qulf':>6} {'qayta':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8}  oversell yo'q")
+    for variant in ('eski', 'yangi'):
+        r = run(variant, mode, workers, baskets, hot_stock)
+        print(f"{variant:<8} {r['ops']:>8.0f} {r['ok']:>6} {r['sold_out']:>7} {r['locked']:>6} {r['lock_retries']:>6} "
+              f"{r['p50']:>8.2f} {r['p99']:>8.2f}  {r['consistent']}")
+
+
+if __name__ == '__main__':
+    main()
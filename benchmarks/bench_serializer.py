@@ -0,0 +1,77 @@
+# benchmarks/bench_serializer.py
+"""
+Javob kodlash benchmarki: eski encoder (indent=2) vs ixcham stdlib vs orjson,
+hamda gzip / br siqilgan hajmlar.
+
+Ishga tushirish (repo ildizidan):
+    python benchmarks/bench_serializer.py [mahsulotlar_soni] [takrorlar]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared import serializer as serializer_module
+from shared.serializer import Serializer, compress
+
+
+def make_payload(count: int) -> dict:
+    """productsList ga o'xshash sintetik javob"""
+    products = []
+    for i in range(count):
+        products.append({
+            "id": i + 1,
+            "name": f"Mahsulot {i + 1} — erkaklar ko'ylagi",
+            "price": 129000.0 + i,
+            "stockQuantity": i % 50,
+            "category": {"id": i % 12 + 1, "name": f"Kategoriya {i % 12 + 1}"},
+            "attributes": [
+                {"name": "rang", "value": "qora"},
+                {"name": "o'lcham", "value": "XL"},
+            ],
+            "images": [{"url": f"/media/products/{i + 1}/1.jpg", "isMain": True}],
+        })
+    return {"data": {"productsList": products}}
+
+
+def bench(name: str, fn, payload, repeat: int):
+    fn(payload)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn(payload)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{name:<28} {elapsed * 1000:9.2f} ms   {len(body) / 1024:9.1f} KB")
+    return body
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    payload = make_payload(count)
+    print(f"{count} ta mahsulot, {repeat} takror\n")
+    print(f"{'encoder':<28} {'vaqt':>12}   {'hajm':>12}")
+
+    bench("json indent=2 (eski)",
+          lambda p: json.dumps(p, ensure_ascii=False, indent=2).encode('utf-8'), payload, repeat)
+    compact = bench("json ixcham", Serializer(backend='json').encode, payload, repeat)
+    bench("json ixcham (oqim)",
+          lambda p: b''.join(Serializer(backend='json').iter_encode(p)), payload, repeat)
+    if serializer_module.orjson is not None:
+        bench("orjson", Serializer(backend='orjson').encode, payload, repeat)
+        bench("orjson (oqim)",
+              lambda p: b''.join(Serializer(backend='orjson').iter_encode(p)), payload, repeat)
+    else:
+        print(f"{'orjson':<28} o'rnatilmagan")
+
+    print()
+    bench("ixcham + gzip", lambda p: compress(compact, 'gzip'), payload, repeat)
+    if serializer_module.brotli is not None:
+        bench("ixcham + br", lambda p: compress(compact, 'br'), payload, repeat)
+    else:
+        print(f"{'ixcham + br':<28} brotli o'rnatilmagan")
+
+
+if __name__ == '__main__':
+    main()
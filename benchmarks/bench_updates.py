@@ -0,0 +1,124 @@
+# benchmarks/bench_updates.py
+"""
+UPDATE o'tkazuvchanligi: AFTER UPDATE trigger (qatorni ikkinchi marta yozadi) vs
+updated_at ni UPDATE ning o'zida yozish — inventory, orders, posts jadvallarida.
+
+Har bir jadval vaqtinchalik WAL bazada (servislardagidek) ikki rejimda o'lchanadi:
+- har UPDATE alohida tranzaksiya (servisdagi so'rov — commit + WAL yozuvi)
+- barcha UPDATE lar bitta tranzaksiyada (faqat SQL bajarish narxi)
+
+Ishga tushirish (repo ildizidan):
+    python benchmarks/bench_updates.py [yangilashlar_soni] [qatorlar_soni]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+TABLES = {
+    'inventory': {
+        'schema': """
+            CREATE TABLE inventory (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER DEFAULT 0,
+                reserved_quantity INTEGER DEFAULT 0,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        'seed': "INSERT INTO inventory (product_id, quantity) VALUES (?, 100)",
+        'update': "UPDATE inventory SET reserved_quantity = reserved_quantity + 1{ts} WHERE id = ?",
+    },
+    'orders': {
+        'schema': """
+            CREATE TABLE orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'created',
+                total_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+                shipping_address TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        'seed': "INSERT INTO orders (user_id, total_amount, shipping_address) VALUES (?, 150000, 'Toshkent, Chilonzor 9')",
+        'update': "UPDATE orders SET status = 'confirmed'{ts} WHERE id = ?",
+    },
+    'posts': {
+        'schema': """
+            CREATE TABLE posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                view_count INTEGER DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        'seed': "INSERT INTO posts (title, content) VALUES ('Post ' || ?, printf('%.2000c', 'x'))",
+        'update': "UPDATE posts SET view_count = view_count + 1{ts} WHERE id = ?",
+    },
+}
+
+TRIGGER = """
+    CREATE TRIGGER {table}_ts AFTER UPDATE ON {table} FOR EACH ROW
+    BEGIN
+        UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
+    END
+"""
+
+
+def open_db(path: str, table: str, spec: dict, with_trigger: bool, rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(spec['schema'])
+    if with_trigger:
+        conn.execute(TRIGGER.format(table=table))
+    conn.execute("BEGIN")
+    conn.executemany(spec['seed'], [(i,) for i in range(rows)])
+    conn.execute("COMMIT")
+    return conn
+
+
+def run(conn: sqlite3.Connection, sql: str, ids, per_statement_commit: bool) -> float:
+    start = time.perf_counter()
+    if per_statement_commit:
+        for row_id in ids:
+            conn.execute("BEGIN")
+            conn.execute(sql, (row_id,))
+            conn.execute("COMMIT")
+    else:
+        conn.execute("BEGIN")
+        for row_id in ids:
+            conn.execute(sql, (row_id,))
+        conn.execute("COMMIT")
+    return time.perf_counter() - start
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    ids = [random.randint(1, rows) for _ in range(updates)]
+    print(f"{updates} ta UPDATE, {rows} qatorli jadval\n")
+    print(f"{'jadval':<10} {'rejim':<18} {'trigger':>14} {'inline':>14} {'tezlashish':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for table, spec in TABLES.items():
+            for per_statement_commit, mode in ((True, 'har biri commit'), (False, 'bitta tranzaksiya')):
+                results = {}
+                for variant, with_trigger in (('trigger', True), ('inline', False)):
+                    path = os.path.join(tmp, f"{table}_{variant}_{int(per_statement_commit)}.db")
+                    conn = open_db(path, table, spec, with_trigger, rows)
+                    ts = "" if with_trigger else ", updated_at = CURRENT_TIMESTAMP"
+                    # Uch o'lchovning eng yaxshisi (fsync shovqini kamroq)
+                    elapsed = min(run(conn, spec['update'].format(ts=ts), ids, per_statement_commit) for _ in range(3))
+                    conn.close()
+                    results[variant] = updates / elapsed
+                print(f"{table:<10} {mode:<18} {results['trigger']:>10.0f} op/s {results['inline']:>10.0f} op/s "
+                      f"{results['inline'] / results['trigger']:>10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
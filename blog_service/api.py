@@ -1,43 +1,12 @@
 # blog_service/api.py
-from http.server import BaseHTTPRequestHandler
-import json
-import logging
-from graphql import graphql_sync
 from schemas import schema
+from shared.graphql_app import GraphQLApp
+from shared.handler import GraphQLRequestHandler
 
-logger = logging.getLogger("BlogAPI")
+INDEX_HTML = "<h1>Blog Service — ISHLAYAPTI! (8450)</h1><p>POST /graphql</p>"
 
-class GraphQLHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write("<h1>Blog Service — ISHLAYAPTI! (8450)</h1><p>POST /graphql</p>")
-        else:
-            self.send_response(404)
-            self.end_headers()
+app = GraphQLApp(schema, name="blog", index_html=INDEX_HTML)
 
-    def do_POST(self):
-        if self.path != '/graphql':
-            self._error(404, "Endpoint topilmadi")
-            return
-        try:
-            length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(length).decode()
-            data = json.loads(body)
-            result = graphql_sync(schema, data.get('query', ''), variable_values=data.get('variables', {}))
-            response = result.formatted
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response, ensure_ascii=False, indent=2).encode())
-        except Exception as e:
-            logger.error(f"Xato: {e}")
-            self._error(500, "Ichki xato")
 
-    def _error(self, code, msg):
-        self.send_response(code)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps({"errors": [{"message": msg}]}).encode())
\ No newline at end of file
+class GraphQLHandler(GraphQLRequestHandler):
+    app = app
@@ -1,33 +1,39 @@
 # blog_service/db.py
-import sqlite3
-from contextlib import contextmanager
 from typing import Optional, List, Dict
 import os
 import logging
+from shared.db_pool import get_pool
+from shared.migrations import Migration, migrate
+from shared.write_behind import get_buffer
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("BlogDB")
 
+# Boshlang'ich sxemadan keyingi o'zgarishlar (shared/migrations.py)
+MIGRATIONS = (
+    # AFTER UPDATE trigger har UPDATE ni (view_count ham) ikki marta yozardi
+    Migration(1, 'drop_updated_at_trigger', (
+        "DROP TRIGGER IF EXISTS update_post_ts",
+    )),
+)
+
 class BlogDatabase:
     def __init__(self, db_path: str = 'blog.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(
+            self.db_path,
+            pragmas=(('foreign_keys', 'ON'),),
+            journal_mode='WAL',
+            timeout=15.0
+        )
+        # view_count oshirishlari buferda jamlanadi — post o'qish yozuv tranzaksiyasiga aylanmaydi
+        self.views = get_buffer(self.pool)
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=15.0)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.execute("PRAGMA journal_mode = WAL;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"DB xato: {e}")
-            raise
-        finally:
-            conn.close()
+        """
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
+        """
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -91,12 +97,13 @@ class BlogDatabase:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_published ON posts(is_published)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_category ON posts(category_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_post_tags_tag ON post_tags(tag_id)")
-
-            # Trigger
+            # Keyset pagination: WHERE is_published = 1 AND (published_at, id) < (?, ?) ORDER BY published_at DESC, id DESC
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_published_at ON posts(is_published, published_at, id)")
+            # NULL sanali nashr qilingan postlar keyset tartibidan tushib qolmasligi uchun
             conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_post_ts
-                AFTER UPDATE ON posts FOR EACH ROW
-                BEGIN
-                    UPDATE posts SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-                END;
-            """)
\ No newline at end of file
+                UPDATE posts SET published_at = created_at
+                WHERE is_published = 1 AND published_at IS NULL
+            """)
+
+            # Migrations (updated_at — tahrirlovchi UPDATE ning o'zida, trigger yo'q)
+            migrate(conn, MIGRATIONS)
\ No newline at end of file
@@ -3,6 +3,8 @@ from db import BlogDatabase
 from typing import List, Dict, Optional
 import logging
 
+from shared.pagination import connection, decode_cursor, keyset_condition, page_size
+
 logger = logging.getLogger(__name__)
 db = BlogDatabase()
 
@@ -40,11 +42,11 @@ def create_post(data: Dict) -> int:
             INSERT INTO posts 
             (title, slug, content, excerpt, image_url, author_id, category_id, 
              is_published, published_at, meta_title, meta_description)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CASE WHEN ? THEN CURRENT_TIMESTAMP END), ?, ?)
         """, (
             data['title'], data['slug'], data['content'], data.get('excerpt'),
             data.get('image_url'), data['author_id'], data.get('category_id'),
-            data.get('is_published', 0), data.get('published_at'),
+            data.get('is_published', 0), data.get('published_at'), data.get('is_published', 0),
             data.get('meta_title'), data.get('meta_description')
         ))
         post_id = cursor.lastrowid
@@ -78,9 +80,9 @@ def get_post_by_slug(slug: str) -> Optional[Dict]:
         """, (post['id'],))
         post['tags'] = [dict(r) for r in cursor.fetchall()]
 
-        # View count
-        conn.execute("UPDATE posts SET view_count = view_count + 1 WHERE id = ?", (post['id'],))
-        return post
+    # View count (write-behind: bir nechta ko'rish — bitta UPDATE)
+    db.views.increment("UPDATE posts SET view_count = view_count + ? WHERE id = ?", (post['id'],))
+    return post
 
 def get_posts(page: int = 1, limit: int = 10, category: str = None, tag: str = None) -> List[Dict]:
     offset = (page - 1) * limit
@@ -109,6 +111,40 @@ def get_posts(page: int = 1, limit: int = 10, category: str = None, tag: str = N
         cursor.execute(query, params)
         return [dict(row) for row in cursor.fetchall()]
 
+def get_posts_connection(first: int = None, after: str = None, category: str = None, tag: str = None) -> Dict:
+    """
+    Postlar lentasi (Relay connection): (published_at, id) bo'yicha keyset —
+    chuqur sahifalar ham idx_posts_published_at oralig'idan o'qiladi
+    """
+    size = page_size(first)
+    # users jadvali blog bazasida yo'q (users servisida) — muallif nomi bu yerda qo'shilmaydi
+    query = """
+        SELECT p.id, p.title, p.slug, p.excerpt, p.image_url, p.published_at, p.author_id,
+               c.name as category_name
+        FROM posts p
+        LEFT JOIN categories c ON p.category_id = c.id
+        WHERE p.is_published = 1
+    """
+    params = []
+
+    if category:
+        query += " AND c.slug = ?"
+        params.append(category)
+    if tag:
+        query += " AND p.id IN (SELECT post_id FROM post_tags pt JOIN tags t ON pt.tag_id = t.id WHERE t.slug = ?)"
+        params.append(tag)
+    condition, keyset_params = keyset_condition(("p.published_at", "p.id"), decode_cursor(after, 2))
+    if condition:
+        query += f" AND {condition}"
+        params.extend(keyset_params)
+
+    query += " ORDER BY p.published_at DESC, p.id DESC LIMIT ?"
+    params.append(size + 1)
+
+    with db.get_connection() as conn:
+        rows = [dict(row) for row in conn.execute(query, params)]
+    return connection(rows, size, lambda p: (p['published_at'], p['id']), after)
+
 def search_posts(q: str, limit: int = 10) -> List[Dict]:
     with db.get_connection() as conn:
         cursor = conn.cursor()
@@ -4,9 +4,10 @@ from graphql import (
     GraphQLInt, GraphQLList, GraphQLNonNull, GraphQLInputObjectType,
     GraphQLInputField, GraphQLBoolean
 )
+from shared.pagination import connection_type
 from repository import (
     get_categories, create_category, get_tags,
-    create_post, get_post_by_slug, get_posts, search_posts
+    create_post, get_post_by_slug, get_posts, get_posts_connection, search_posts
 )
 
 # TYPES
@@ -47,6 +48,8 @@ PostPreviewType = GraphQLObjectType('PostPreview', {
     'username': GraphQLField(GraphQLString),
 })
 
+PostConnectionType = connection_type(PostPreviewType, 'Post')
+
 # INPUTS
 PostInput = GraphQLInputObjectType('PostInput', {
     'title': GraphQLInputField(GraphQLNonNull(GraphQLString)),
@@ -71,6 +74,9 @@ Query = GraphQLObjectType('Query', {
     'posts': GraphQLField(GraphQLList(PostPreviewType), args={
         'page': GraphQLInt, 'limit': GraphQLInt, 'category': GraphQLString, 'tag': GraphQLString
     }, resolve=lambda _, i, page=1, limit=10, category=None, tag=None: get_posts(page, limit, category, tag)),
+    'postsConnection': GraphQLField(PostConnectionType, args={
+        'first': GraphQLInt, 'after': GraphQLString, 'category': GraphQLString, 'tag': GraphQLString
+    }, resolve=lambda _, i, **kw: get_posts_connection(**kw)),
     'searchPosts': GraphQLField(GraphQLList(PostPreviewType), args={'q': GraphQLNonNull(GraphQLString), 'limit': GraphQLInt}, resolve=lambda _, i, q, limit=10: search_posts(q, limit)),
 })
 
@@ -1,45 +1,45 @@
 # cart_service/db.py
-import sqlite3
-from contextlib import contextmanager
 from typing import Optional, List, Dict
 import os
 import logging
 import json
+from shared.db_pool import get_pool
+from shared.migrations import Migration, migrate
+from shared.write_behind import get_buffer
 
 # ========================
 # LOGGING
 # ========================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger("CartDB")
 
+# Boshlang'ich sxemadan keyingi o'zgarishlar (shared/migrations.py)
+MIGRATIONS = (
+    # Triggerlar har UPDATE / guest INSERT dan keyin qatorni yana yozardi —
+    # updated_at va expires_at endi INSERT / UPDATE ning o'zida
+    Migration(1, 'drop_row_rewrite_triggers', (
+        "DROP TRIGGER IF EXISTS update_cart_ts",
+        "DROP TRIGGER IF EXISTS set_cart_expiry",
+    )),
+)
+
 class CartDatabase:
     def __init__(self, db_path: str = 'cart.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(
+            self.db_path,
+            pragmas=(('foreign_keys', 'ON'), ('synchronous', 'NORMAL')),
+            journal_mode='WAL',
+            timeout=15.0
+        )
+        # cart_activity_log — telemetriya: so'rov ichida emas, fon threadda paketlab yoziladi
+        self.activity = get_buffer(self.pool)
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
         """
-        Xavfsiz tranzaksiya: commit yoki rollback
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
         """
-        conn = sqlite3.connect(self.db_path, timeout=15.0)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.execute("PRAGMA journal_mode = WAL;")
-        conn.execute("PRAGMA synchronous = NORMAL;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"DB tranzaksiya xatosi: {e}")
-            raise
-        finally:
-            conn.close()
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -101,23 +101,8 @@ class CartDatabase:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_cart ON cart_activity_log(cart_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_action ON cart_activity_log(action)")
 
-            # Trigger: updated_at
-            conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_cart_ts
-                AFTER UPDATE ON carts FOR EACH ROW
-                BEGIN
-                    UPDATE carts SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-                END;
-            """)
-
-            # Trigger: expires_at for guest (1 soat)
-            conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS set_cart_expiry
-                AFTER INSERT ON carts WHEN NEW.user_id IS NULL
-                BEGIN
-                    UPDATE carts SET expires_at = datetime('now', '+1 hour') WHERE id = NEW.id;
-                END;
-            """)
+            # Migrations
+            migrate(conn, MIGRATIONS)
 
     # ========================
     # CART CRUD
@@ -125,10 +110,11 @@ class CartDatabase:
     def create_cart(self, user_id: Optional[int], session_id: str) -> int:
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # Guest cart 1 soatda eskiradi (cleanup_expired_carts)
             cursor.execute("""
-                INSERT INTO carts (user_id, session_id)
-                VALUES (?, ?)
-            """, (user_id, session_id))
+                INSERT INTO carts (user_id, session_id, expires_at)
+                VALUES (?, ?, CASE WHEN ? IS NULL THEN datetime('now', '+1 hour') END)
+            """, (user_id, session_id, user_id))
             return cursor.lastrowid
 
     def get_cart_by_session(self, session_id: str) -> Optional[Dict]:
@@ -186,7 +172,7 @@ class CartDatabase:
             """, (user_cart_id, guest_cart_id))
 
             # Guest cartni yopish
-            conn.execute("UPDATE carts SET status = 'merged' WHERE id = ?", (guest_cart_id,))
+            conn.execute("UPDATE carts SET status = 'merged', updated_at = CURRENT_TIMESTAMP WHERE id = ?", (guest_cart_id,))
             return user_cart_id
 
     # ========================
@@ -216,12 +202,12 @@ class CartDatabase:
                 SELECT id FROM cart_items WHERE cart_id = ? AND product_id = ? AND variant_id = ?
             """, (cart_id, product_id, variant_id)).fetchone()['id']
 
-            # Log
-            conn.execute("""
-                INSERT INTO cart_activity_log (cart_id, action, product_id, quantity, metadata)
-                VALUES (?, 'add', ?, ?, ?)
-            """, (cart_id, product_id, quantity, json.dumps({"price": price, "discount": discount_price})))
-            return item_id
+        # Log — buferga tashqi tranzaksiya (add_to_cart) commit bo'lgandan keyin tushadi (write_behind)
+        self.activity.add("""
+            INSERT INTO cart_activity_log (cart_id, action, product_id, quantity, metadata)
+            VALUES (?, 'add', ?, ?, ?)
+        """, (cart_id, product_id, quantity, json.dumps({"price": price, "discount": discount_price})))
+        return item_id
 
     def update_quantity(self, item_id: int, quantity: int) -> bool:
         with self.get_connection() as conn:
@@ -233,11 +219,12 @@ class CartDatabase:
             cursor.execute("""
                 UPDATE cart_items SET quantity = ? WHERE id = ?
             """, (quantity, item_id))
-            conn.execute("""
-                INSERT INTO cart_activity_log (cart_id, action, product_id, quantity)
-                VALUES (?, 'update', ?, ?)
-            """, (row['cart_id'], row['product_id'], quantity))
-            return True
+
+        self.activity.add("""
+            INSERT INTO cart_activity_log (cart_id, action, product_id, quantity)
+            VALUES (?, 'update', ?, ?)
+        """, (row['cart_id'], row['product_id'], quantity))
+        return True
 
     def remove_item(self, item_id: int) -> bool:
         with self.get_connection() as conn:
@@ -247,16 +234,17 @@ class CartDatabase:
             if not row:
                 return False
             cursor.execute("DELETE FROM cart_items WHERE id = ?", (item_id,))
-            conn.execute("""
-                INSERT INTO cart_activity_log (cart_id, action, product_id)
-                VALUES (?, 'remove', ?)
-            """, (row['cart_id'], row['product_id']))
-            return True
+
+        self.activity.add("""
+            INSERT INTO cart_activity_log (cart_id, action, product_id)
+            VALUES (?, 'remove', ?)
+        """, (row['cart_id'], row['product_id']))
+        return True
 
     def clear_cart(self, cart_id: int) -> bool:
         with self.get_connection() as conn:
             conn.execute("DELETE FROM cart_items WHERE cart_id = ?", (cart_id,))
-            conn.execute("UPDATE carts SET status = 'checkout' WHERE id = ?", (cart_id,))
+            conn.execute("UPDATE carts SET status = 'checkout', updated_at = CURRENT_TIMESTAMP WHERE id = ?", (cart_id,))
             return True
 
     # ========================
@@ -279,6 +267,6 @@ class CartDatabase:
         """Har 10 daqiqada ishlaydi"""
         with self.get_connection() as conn:
             conn.execute("""
-                UPDATE carts SET status = 'abandoned'
+                UPDATE carts SET status = 'abandoned', updated_at = CURRENT_TIMESTAMP
                 WHERE user_id IS NULL AND expires_at < CURRENT_TIMESTAMP AND status = 'active'
             """)
\ No newline at end of file
@@ -1,7 +1,7 @@
 # cart_service/repository.py
 from db import CartDatabase
 from typing import Dict, Optional, List
-import requests
+from shared import http_client
 import logging
 import json
 import uuid
@@ -10,11 +10,6 @@ from datetime import datetime
 # ========================
 # LOGGING
 # ========================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-    datefmt='%H:%M:%S'
-)
 logger = logging.getLogger("CartRepo")
 
 # ========================
@@ -37,13 +32,11 @@ db = CartDatabase()
 # ========================
 def _call_gateway(query: str, variables: Dict = None) -> Dict:
     try:
-        payload = {"query": query}
-        if variables:
-            payload["variables"] = variables
-        resp = requests.post(
+        # APQ: odatda faqat hash yuboriladi, matn — gateway birinchi marta ko'rganda
+        resp = http_client.post_graphql(
             SERVICES["products"],  # bitta endpoint
-            json=payload,
-            verify=False,
+            query,
+            variables,
             timeout=5
         )
         resp.raise_for_status()
@@ -196,24 +189,26 @@ def add_to_cart(
     if product["stock"] < quantity:
         raise ValueError(f"Yetarli qoldiq yo‘q: {product['stock']} dona bor")
 
-    # 2. Savatni olish/yaratish
-    cart = create_or_get_cart(user_id, session_id)
-
-    # 3. Narx snapshot
-    price = product["discount_price"] or product["price"]
-
-    # 4. DB ga yozish
-    item_id = db.add_item(
-        cart_id=cart["id"],
-        product_id=product_id,
-        variant_id=variant_id,
-        quantity=quantity,
-        price=price,
-        discount_price=product["discount_price"]
-    )
+    # 2-5 bitta ulanish va bitta tranzaksiyada (ichki db chaqiruvlari shu ulanishni oladi)
+    with db.get_connection():
+        # 2. Savatni olish/yaratish
+        cart = create_or_get_cart(user_id, session_id)
+
+        # 3. Narx snapshot
+        price = product["discount_price"] or product["price"]
+
+        # 4. DB ga yozish
+        item_id = db.add_item(
+            cart_id=cart["id"],
+            product_id=product_id,
+            variant_id=variant_id,
+            quantity=quantity,
+            price=price,
+            discount_price=product["discount_price"]
+        )
 
-    # 5. Summary
-    summary = db.get_cart_summary(cart["id"])
+        # 5. Summary
+        summary = db.get_cart_summary(cart["id"])
 
     logger.info(f"Savatga qo‘shildi: product_id={product_id}, quantity={quantity}, cart_id={cart['id']}")
 
@@ -1,33 +1,27 @@
 # delivery_service/db.py
-import sqlite3
-from contextlib import contextmanager
 from typing import Optional, List, Dict
 import os
 import logging
+from shared.db_pool import get_pool
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("DeliveryDB")
 
 class DeliveryDatabase:
     def __init__(self, db_path: str = 'delivery.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(
+            self.db_path,
+            pragmas=(('foreign_keys', 'ON'),),
+            journal_mode='WAL',
+            timeout=15.0
+        )
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=15.0)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.execute("PRAGMA journal_mode = WAL;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"DB xato: {e}")
-            raise
-        finally:
-            conn.close()
+        """
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
+        """
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -1,7 +1,7 @@
 # delivery_service/repository.py
 from db import DeliveryDatabase
 from typing import List, Dict, Optional
-import requests
+from shared import http_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,7 +11,7 @@ ORDERS_URL = "https://localhost:8445/graphql"
 
 def _call_orders(query: str, variables: Dict = None) -> Dict:
     try:
-        resp = requests.post(ORDERS_URL, json={"query": query, "variables": variables or {}}, verify=False, timeout=5)
+        resp = http_client.post_graphql(ORDERS_URL, query, variables, timeout=5)
         resp.raise_for_status()
         return resp.json().get('data', {})
     except Exception as e:
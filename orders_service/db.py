@@ -1,36 +1,67 @@
 # orders_service/db.py
-import sqlite3
-from contextlib import contextmanager
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable, Tuple
 import os
 import logging
+from shared.db_pool import get_pool
+from shared.migrations import Migration, migrate
+from shared.pagination import keyset_condition
 
 # Logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Buyurtma bilan birga yuklanadigan ichki ro'yxatlar
+ORDER_RELATIONS = ('items', 'status_history', 'refunds')
+RELATION_QUERIES = {
+    'items': "SELECT * FROM order_items WHERE order_id IN ({}) ORDER BY order_id, id",
+    'status_history': "SELECT * FROM order_status_history WHERE order_id IN ({}) ORDER BY order_id, timestamp, id",
+    'refunds': "SELECT * FROM refunds WHERE order_id IN ({}) ORDER BY order_id, requested_at DESC, id DESC",
+}
+# SQLite bitta so'rovdagi ? soni chegarasi (eski versiyalarda 999)
+MAX_SQL_VARIABLES = 900
+
+# Boshlang'ich sxemadan keyingi o'zgarishlar (shared/migrations.py)
+MIGRATIONS = (
+    Migration(1, 'order_status_history_index', (
+        # get_order: WHERE order_id = ? ORDER BY timestamp — saralashsiz, indeks tartibida
+        "CREATE INDEX IF NOT EXISTS idx_status_history_order ON order_status_history(order_id, timestamp)",
+    )),
+    # AFTER UPDATE trigger har UPDATE ni ikki marta yozardi — updated_at endi UPDATE ning o'zida
+    Migration(2, 'drop_updated_at_trigger', (
+        "DROP TRIGGER IF EXISTS update_order_ts",
+    )),
+    # userOrders(status: ...) — holat filtri bilan ham sana tartibida, saralashsiz
+    Migration(3, 'orders_user_status_index', (
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_status ON orders(user_id, status, created_at, id)",
+    )),
+)
+
+# Tez-tez ishlaydigan so'rovlar — `python -m shared.migrations` to'liq o'qishga tekshiradi
+HOT_QUERIES = {
+    'order_by_id': ("SELECT * FROM orders WHERE id = ?", (1,)),
+    **{name: (sql.format('?, ?'), (1, 2)) for name, sql in RELATION_QUERIES.items()},
+    'user_orders_page': ("""
+        SELECT * FROM orders
+        WHERE user_id = ? AND (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC LIMIT 21
+    """, (1, '2024-01-01', 1)),
+    'user_orders_by_status': ("""
+        SELECT * FROM orders
+        WHERE user_id = ? AND status = ? AND created_at >= date(?) AND created_at < date(?, '+1 day')
+        ORDER BY created_at DESC, id DESC LIMIT 21
+    """, (1, 'delivered', '2024-01-01', '2024-01-31')),
+}
+
 class OrderDatabase:
     def __init__(self, db_path: str = 'orders.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(self.db_path, pragmas=(('foreign_keys', 'ON'),), timeout=10.0)
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
         """
-        Xavfsiz tranzaksiya: commit yoki rollback
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
         """
-        conn = sqlite3.connect(self.db_path, timeout=10.0)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"DB tranzaksiya xatosi: {e}")
-            raise
-        finally:
-            conn.close()
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -101,18 +132,14 @@ class OrderDatabase:
 
             # 5. indexes
             conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)")
+            # Keyset pagination: WHERE user_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders(user_id, created_at, id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_refunds_order ON refunds(order_id)")
 
-            # 6. triggers
-            conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_order_ts
-                AFTER UPDATE ON orders FOR EACH ROW
-                BEGIN
-                    UPDATE orders SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-                END;
-            """)
+            # 6. migrations (updated_at — har bir UPDATE ning o'zida, trigger yo'q)
+            migrate(conn, MIGRATIONS)
 
     # ========================
     # ORDER CRUD
@@ -163,50 +190,101 @@ class OrderDatabase:
 
             return order_id
 
-    def get_order(self, order_id: int) -> Optional[Dict]:
+    def get_order(self, order_id: int, relations: Iterable[str] = ORDER_RELATIONS) -> Optional[Dict]:
+        """
+        Buyurtma + faqat so'ralgan ichki ro'yxatlar (relations) — barchasi bitta o'qish tranzaksiyasida.
+        users jadvali buyurtmalar bazasida yo'q (users servisida) — username/email bu yerda qo'shilmaydi
+        """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT o.*, u.username, u.email
-                FROM orders o
-                LEFT JOIN users u ON o.user_id = u.id
-                WHERE o.id = ?
-            """, (order_id,))
-            row = cursor.fetchone()
+            if relations and not conn.in_transaction:
+                # Buyurtma va ro'yxatlar bitta snapshotdan o'qiladi
+                conn.execute("BEGIN")
+            row = conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
             if not row:
                 return None
-            order = dict(row)
+            return self.load_relations([dict(row)], relations)[0]
 
-            # items
-            cursor.execute("SELECT * FROM order_items WHERE order_id = ?", (order_id,))
-            order['items'] = [dict(r) for r in cursor.fetchall()]
+    def get_order_status(self, order_id: int) -> Optional[str]:
+        """Holat mashinasi tekshiruvlari uchun — faqat status ustuni"""
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT status FROM orders WHERE id = ?", (order_id,)).fetchone()
+            return row['status'] if row else None
 
-            # status history
-            cursor.execute("""
-                SELECT * FROM order_status_history 
-                WHERE order_id = ? ORDER BY timestamp
-            """, (order_id,))
-            order['status_history'] = [dict(r) for r in cursor.fetchall()]
+    def load_relations(self, orders: List[Dict], relations: Iterable[str] = ORDER_RELATIONS) -> List[Dict]:
+        """
+        Buyurtmalar ro'yxatiga items / status_history / refunds ni biriktirish:
+        har bir ro'yxat uchun bitta IN (...) so'rov, xotirada order_id bo'yicha guruhlanadi
+        """
+        relations = set(relations)
+        if not orders or not relations:
+            return orders
+        ids = list(dict.fromkeys(o['id'] for o in orders))
+        with self.get_connection() as conn:
+            for name in ORDER_RELATIONS:
+                if name not in relations:
+                    continue
+                grouped = self._group_by_order(conn, RELATION_QUERIES[name], ids)
+                for order in orders:
+                    order[name] = grouped.get(order['id'], [])
+        return orders
 
-            # refunds
-            cursor.execute("SELECT * FROM refunds WHERE order_id = ? ORDER BY requested_at DESC", (order_id,))
-            order['refunds'] = [dict(r) for r in cursor.fetchall()]
+    @staticmethod
+    def _group_by_order(conn, sql: str, ids: List[int]) -> Dict[int, List[Dict]]:
+        grouped: Dict[int, List[Dict]] = {}
+        for start in range(0, len(ids), MAX_SQL_VARIABLES):
+            chunk = ids[start:start + MAX_SQL_VARIABLES]
+            for row in conn.execute(sql.format(', '.join('?' * len(chunk))), chunk):
+                item = dict(row)
+                grouped.setdefault(item['order_id'], []).append(item)
+        return grouped
 
-            return order
+    def get_user_orders(
+        self,
+        user_id: int,
+        limit: Optional[int] = None,
+        after: Optional[Tuple] = None,
+        status: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Foydalanuvchi buyurtmalari, yangilari birinchi (idx_orders_user_created / idx_orders_user_status).
+        after — oldingi sahifaning oxirgi (created_at, id) qiymati (keyset);
+        date_from / date_to — sana (YYYY-MM-DD), ikkala chegara ham kiradi
+        """
+        conditions, params = ["user_id = ?"], [user_id]
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if date_from:
+            conditions.append("created_at >= date(?)")
+            params.append(date_from)
+        if date_to:
+            conditions.append("created_at < date(?, '+1 day')")
+            params.append(date_to)
+        condition, keyset_params = keyset_condition(("created_at", "id"), after)
+        if condition:
+            conditions.append(condition)
+            params.extend(keyset_params)
 
-    def get_user_orders(self, user_id: int) -> List[Dict]:
+        sql = f"""
+            SELECT * FROM orders
+            WHERE {' AND '.join(conditions)}
+            ORDER BY created_at DESC, id DESC
+        """
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, status, total_amount, created_at, tracking_code, payment_status
-                FROM orders WHERE user_id = ? ORDER BY created_at DESC
-            """, (user_id,))
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in conn.execute(sql, params)]
 
     def update_order_status(self, order_id: int, new_status: str, changed_by: int = None, notes: str = None) -> bool:
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (new_status, order_id))
+            cursor.execute(
+                "UPDATE orders SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (new_status, order_id)
+            )
             if cursor.rowcount == 0:
                 return False
             conn.execute("""
@@ -1,19 +1,19 @@
 # orders_service/main.py
 import ssl
 import os
+import sys
 import subprocess
 import logging
-from http.server import HTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import logs
+from shared.server import create_server
 from api import GraphQLHandler
 
 # ========================
 # LOGGING
 # ========================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-    datefmt='%H:%M:%S'
-)
+logs.setup('orders')
 logger = logging.getLogger("OrdersService")
 
 # ========================
@@ -60,16 +60,14 @@ def run_server():
     # Sertifikat yaratish
     cert_file, key_file = generate_ssl_cert()
 
-    # Server yaratish
-    server = HTTPServer((HOST, PORT), GraphQLHandler)
-
     # SSL sozlash
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     context.load_cert_chain(certfile=cert_file, keyfile=key_file)
     context.minimum_version = ssl.TLSVersion.TLSv1_2
     context.set_ciphers('ECDHE+AESGCM:ECDHE+CHACHA20:DHE+AESGCM:DHE+CHACHA20:!aNULL')
 
-    server.socket = context.wrap_socket(server.socket, server_side=True)
+    # Server yaratish (thread pool + TLS)
+    server = create_server((HOST, PORT), GraphQLHandler, context)
 
     # Banner
     banner = f"""
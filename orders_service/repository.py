@@ -1,11 +1,12 @@
 # orders_service/repository.py
-from db import OrderDatabase
-from typing import List, Dict, Optional, Any
-import requests
+from db import OrderDatabase, ORDER_RELATIONS
+from typing import List, Dict, Optional, Any, Iterable
+import asyncio
+from shared import http_client
+from shared.pagination import connection, decode_cursor, page_size
 import logging
 
 # Logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Global DB
@@ -23,12 +24,7 @@ def _graphql_request(url: str, query: str, variables: Dict = None) -> Dict:
     Xavfsiz GraphQL so'rov
     """
     try:
-        resp = requests.post(
-            url,
-            json={"query": query, "variables": variables or {}},
-            verify=False,
-            timeout=5
-        )
+        resp = http_client.post_graphql(url, query, variables, timeout=5)
         resp.raise_for_status()
         data = resp.json()
         if 'errors' in data:
@@ -38,6 +34,20 @@ def _graphql_request(url: str, query: str, variables: Dict = None) -> Dict:
         logger.error(f"API so'rov xatosi ({url}): {e}")
         raise ValueError(f"Xizmat bilan bog'lanib bo'lmadi: {url.split('/')[-2]}")
 
+def _graphql_batch(url: str, operations: List[tuple]) -> List[Dict]:
+    """
+    Bir nechta (query, variables) bitta so'rovda — har biri uchun data qaytadi
+    """
+    try:
+        results = http_client.post_graphql_batch(url, operations, timeout=5)
+    except Exception as e:
+        logger.error(f"API batch so'rov xatosi ({url}): {e}")
+        raise ValueError(f"Xizmat bilan bog'lanib bo'lmadi: {url.split('/')[-2]}")
+    for result in results:
+        if result.get('errors'):
+            raise ValueError(f"API xato: {result['errors']}")
+    return [result['data'] for result in results]
+
 # ========================
 # USER VALIDATION
 # ========================
@@ -73,23 +83,14 @@ def _validate_and_enrich_items(items: List[Dict]) -> tuple[List[Dict], float]:
     if not product_ids:
         raise ValueError("Buyurtma bo'sh")
 
-    # 1. Mahsulotlarni olish
-    ids_str = ",".join(map(str, product_ids))
-    query = f"""
-    query {{
-        productsByIds(ids: [{ids_str}]) {{
-            id name price sku stockAvailable reservedQuantity
-        }}
-    }}
-    """
-    data = _graphql_request(PRODUCTS_URL, query)
-    products = {p['id']: p for p in data['productsByIds']}
-    
-    if len(products) != len(product_ids):
-        missing = set(product_ids) - set(products.keys())
-        raise ValueError(f"Mahsulot topilmadi: {missing}")
-
-    # 2. Stock tekshirish
+    # Mahsulotlar + stock tekshiruvi — bitta batch so'rovda (ikki round trip o'rniga bitta)
+    products_query = """
+    query ($ids: [Int!]!) {
+        productsByIds(ids: $ids) {
+            id name price sku stock_available reserved_quantity
+        }
+    }
+    """
     stock_items = [{"product_id": i['product_id'], "quantity": i['quantity']} for i in items]
     stock_query = """
     query ($items: [StockItemInput!]!) {
@@ -98,7 +99,18 @@ def _validate_and_enrich_items(items: List[Dict]) -> tuple[List[Dict], float]:
         }
     }
     """
-    stock_data = _graphql_request(PRODUCTS_URL, stock_query, {"items": stock_items})
+    data, stock_data = _graphql_batch(PRODUCTS_URL, [
+        (products_query, {"ids": product_ids}),
+        (stock_query, {"items": stock_items}),
+    ])
+
+    # 1. Mahsulotlar
+    products = {p['id']: p for p in data['productsByIds'] if p}
+    if len(products) != len(set(product_ids)):
+        missing = set(product_ids) - set(products.keys())
+        raise ValueError(f"Mahsulot topilmadi: {missing}")
+
+    # 2. Stock
     stock_results = {r['product_id']: r for r in stock_data['checkStock']}
 
     enriched_items = []
@@ -129,7 +141,7 @@ def _validate_and_enrich_items(items: List[Dict]) -> tuple[List[Dict], float]:
 # ========================
 # ORDER CREATION
 # ========================
-def create_order(
+async def create_order(
     user_id: int,
     items: List[Dict],
     shipping_address: str,
@@ -139,8 +151,7 @@ def create_order(
 ) -> int:
     """
     To'liq buyurtma yaratish:
-    1. User tekshirish
-    2. Mahsulot + stock tekshirish
+    1-2. User va mahsulot + stock tekshirish (parallel)
     3. Narx hisoblash
     4. DB ga yozish
     5. Stockni bron qilish
@@ -150,12 +161,27 @@ def create_order(
     if payment_method not in ['card', 'cash', 'click', 'payme']:
         raise ValueError("Noto'g'ri to'lov usuli")
 
-    # 1. User
-    user = _validate_user(user_id)
+    # 1-2. User va mahsulotlar + stock — bir-biriga bog'liq emas, parallel so'raladi
+    user, (enriched_items, total) = await asyncio.gather(
+        asyncio.to_thread(_validate_user, user_id),
+        asyncio.to_thread(_validate_and_enrich_items, items)
+    )
 
-    # 2. Mahsulotlar + stock
-    enriched_items, total = _validate_and_enrich_items(items)
+    # 3-4. DB ga yozish va stockni bron qilish (bloklovchi I/O — alohida threadda)
+    return await asyncio.to_thread(
+        _place_order, user_id, items, enriched_items,
+        shipping_address, billing_address, payment_method, notes
+    )
 
+def _place_order(
+    user_id: int,
+    items: List[Dict],
+    enriched_items: List[Dict],
+    shipping_address: str,
+    billing_address: str,
+    payment_method: str,
+    notes: str
+) -> int:
     # 3. DB ga yozish
     order_id = db.create_order(
         user_id=user_id,
@@ -168,18 +194,25 @@ def create_order(
 
     # 4. Stockni bron qilish
     try:
+        # order_id bilan: products xizmati bronni buyurtmaga bog'laydi (idempotent, to'lanmasa TTL da qaytadi)
         reserve_query = """
-        mutation ($items: [StockItemInput!]!) {
-            reserveStock(items: $items)
+        mutation ($items: [StockItemInput!]!, $order_id: Int) {
+            reserveStock(items: $items, order_id: $order_id)
         }
         """
         reserve_items = [{"product_id": i['product_id'], "quantity": i['quantity']} for i in items]
-        reserve_resp = _graphql_request(PRODUCTS_URL, reserve_query, {"items": reserve_items})
+        reserve_resp = _graphql_request(PRODUCTS_URL, reserve_query, {"items": reserve_items, "order_id": order_id})
         if not reserve_resp['reserveStock']:
             raise ValueError("Stock bron qilib bo'lmadi")
     except Exception as e:
-        # Rollback: buyurtmani o'chirish
+        # Rollback: buyurtmani o'chirish; javob yo'qolgan (timeout) bo'lsa bron TTL kutmasdan qaytadi
         db.cancel_order(order_id, f"Stock bron xatosi: {e}")
+        try:
+            _graphql_request(PRODUCTS_URL, """
+            mutation ($order_id: Int) { releaseStock(order_id: $order_id) }
+            """, {"order_id": order_id})
+        except Exception:
+            logger.warning(f"Bronni qaytarib bo'lmadi (TTL da qaytadi): order_id={order_id}")
         raise ValueError(f"Buyurtma qayta ishlandi: {e}")
 
     logger.info(f"Buyurtma #{order_id} muvaffaqiyatli yaratildi (user_id={user_id})")
@@ -201,24 +234,37 @@ def update_order_status(
         'shipped': ['delivered'],
         'delivered': ['refunded'],
     }
-    order = db.get_order(order_id)
-    if not order:
+    current = db.get_order_status(order_id)
+    if current is None:
         raise ValueError("Buyurtma topilmadi")
-    
-    current = order['status']
+
     if new_status not in valid_transitions.get(current, []):
         raise ValueError(f"{current} → {new_status} o'tish mumkin emas")
 
-    # Agar cancelled bo'lsa → stockni qaytarish
+    # Tasdiqlandi (to'landi) → bron sotuvga aylanadi; muddati o'tgan bo'lsa tasdiqlanmaydi
+    if new_status == 'confirmed':
+        commit_query = """
+        mutation ($order_id: Int!) {
+            commitStock(order_id: $order_id)
+        }
+        """
+        try:
+            _graphql_request(PRODUCTS_URL, commit_query, {"order_id": order_id})
+        except Exception as e:
+            raise ValueError(f"Stockni tasdiqlab bo'lmadi: {e}")
+
+    # Agar cancelled bo'lsa → stockni qaytarish (pozitsiyalar faqat shu holatda o'qiladi)
     if new_status == 'cancelled':
+        order = db.get_order(order_id, relations=('items',))
+        # items — bron yozuvi bo'lmagan (ledgerdan oldingi) buyurtmalar uchun
         items = [{"product_id": i['product_id'], "quantity": i['quantity']} for i in order['items']]
         try:
             release_query = """
-            mutation ($items: [StockItemInput!]!) {
-                releaseStock(items: $items)
+            mutation ($items: [StockItemInput!], $order_id: Int) {
+                releaseStock(items: $items, order_id: $order_id)
             }
             """
-            _graphql_request(PRODUCTS_URL, release_query, {"items": items})
+            _graphql_request(PRODUCTS_URL, release_query, {"items": items, "order_id": order_id})
         except:
             logger.warning(f"Stock qaytarishda xato: order_id={order_id}")
 
@@ -228,7 +274,7 @@ def update_order_status(
 # REFUND
 # ========================
 def request_refund(order_id: int, amount: float, reason: str) -> int:
-    order = db.get_order(order_id)
+    order = db.get_order(order_id, relations=())
     if not order:
         raise ValueError("Buyurtma topilmadi")
     if order['status'] != 'delivered':
@@ -240,11 +286,56 @@ def request_refund(order_id: int, amount: float, reason: str) -> int:
 # ========================
 # UTILS
 # ========================
-def get_order(order_id: int) -> Optional[Dict]:
-    return db.get_order(order_id)
+def get_order(order_id: int, relations: Iterable[str] = ORDER_RELATIONS) -> Optional[Dict]:
+    """Buyurtma + faqat so'ralgan ichki ro'yxatlar (items / status_history / refunds)"""
+    return db.get_order(order_id, relations)
 
-def get_user_orders(user_id: int) -> List[Dict]:
-    return db.get_user_orders(user_id)
+def get_relations_by_order_ids(name: str, order_ids: List[int]) -> List[List[Dict]]:
+    """
+    Bitta ichki ro'yxat bir nechta buyurtma uchun (bitta IN so'rov) — order_ids tartibida
+    """
+    orders = db.load_relations([{'id': oid} for oid in order_ids], (name,))
+    return [o[name] for o in orders]
+
+def get_user_orders(
+    user_id: int,
+    limit: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    relations: Iterable[str] = ()
+) -> List[Dict]:
+    """
+    Foydalanuvchi buyurtmalari + filtrlar. relations (masalan items) butun ro'yxat uchun
+    bitta IN so'rov bilan yuklanadi — har buyurtmani alohida so'rash shart emas
+    """
+    if limit is not None and limit <= 0:
+        raise ValueError("limit musbat bo'lishi kerak")
+    orders = db.get_user_orders(user_id, limit=limit, status=status, date_from=date_from, date_to=date_to)
+    return db.load_relations(orders, relations)
+
+def get_user_orders_connection(
+    user_id: int,
+    first: int = None,
+    after: str = None,
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    relations: Iterable[str] = ()
+) -> Dict:
+    """Foydalanuvchi buyurtmalari (Relay connection, (created_at, id) bo'yicha keyset) + filtrlar"""
+    size = page_size(first)
+    orders = db.get_user_orders(
+        user_id,
+        limit=size + 1,
+        after=decode_cursor(after, 2),
+        status=status,
+        date_from=date_from,
+        date_to=date_to
+    )
+    # Ichki ro'yxatlar faqat sahifadagilar uchun (hasNextPage uchun o'qilgan ortiqcha qatorga emas)
+    db.load_relations(orders[:size], relations)
+    return connection(orders, size, lambda o: (o['created_at'], o['id']), after)
 
 def get_order_stats() -> Dict:
     return db.get_order_stats()
\ No newline at end of file
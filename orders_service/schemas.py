@@ -5,11 +5,43 @@ from graphql import (
     GraphQLInputObjectType, GraphQLInputField, GraphQLBoolean,
     GraphQLArgument
 )
+from functools import partial
+
+from shared.dataloader import DataLoader
+from shared.pagination import connection_type
+from shared.selection import requested
+from db import ORDER_RELATIONS
 from repository import (
-    create_order, get_order, get_user_orders,
-    update_order_status, request_refund, get_order_stats
+    create_order, get_order, get_user_orders, get_user_orders_connection,
+    get_relations_by_order_ids, update_order_status, request_refund, get_order_stats
 )
 
+# ========================
+# DATALOADERS (har bir so'rov uchun context ichida)
+# ========================
+def loaders(info) -> dict:
+    """Ro'yxatdagi buyurtmalarning items / status_history / refunds lari — har biri bitta IN so'rov"""
+    context = info.context
+    result = context.get('loaders')
+    if result is None:
+        result = {name: DataLoader(partial(get_relations_by_order_ids, name)) for name in ORDER_RELATIONS}
+        context['loaders'] = result
+    return result
+
+async def _load(loader: DataLoader, key):
+    return await loader.load(key)
+
+def relation_resolver(name: str):
+    """
+    Oldindan yuklangan bo'lsa (order) o'shani, aks holda loader orqali.
+    Korutina qaytadi — root resolverlar sinxron bo'lsa ham ro'yxatdagi barcha load() bitta batchga tushadi
+    """
+    def resolve(order, info):
+        if name in order:
+            return order[name]
+        return _load(loaders(info)[name], order['id'])
+    return resolve
+
 # ========================
 # TYPES
 # ========================
@@ -57,11 +89,13 @@ OrderType = GraphQLObjectType('Order', {
     'notes': GraphQLField(GraphQLString),
     'created_at': GraphQLField(GraphQLString),
     'updated_at': GraphQLField(GraphQLString),
-    'items': GraphQLField(GraphQLList(OrderItemType)),
-    'status_history': GraphQLField(GraphQLList(StatusHistoryType)),
-    'refunds': GraphQLField(GraphQLList(RefundType)),
+    'items': GraphQLField(GraphQLList(OrderItemType), resolve=relation_resolver('items')),
+    'status_history': GraphQLField(GraphQLList(StatusHistoryType), resolve=relation_resolver('status_history')),
+    'refunds': GraphQLField(GraphQLList(RefundType), resolve=relation_resolver('refunds')),
 })
 
+OrderConnectionType = connection_type(OrderType)
+
 OrderStatsType = GraphQLObjectType('OrderStats', {
     'created': GraphQLField(GraphQLInt),
     'confirmed': GraphQLField(GraphQLInt),
@@ -107,16 +141,39 @@ RefundRequestInput = GraphQLInputObjectType('RefundRequestInput', {
 # QUERY
 # ========================
 
+# userOrders / userOrdersConnection filtrlari (sanalar YYYY-MM-DD, chegaralar kiradi)
+ORDER_FILTER_ARGS = {
+    'status': GraphQLArgument(GraphQLString),
+    'date_from': GraphQLArgument(GraphQLString),
+    'date_to': GraphQLArgument(GraphQLString),
+}
+
 Query = GraphQLObjectType('Query', {
     'order': GraphQLField(
         OrderType,
         args={'id': GraphQLNonNull(GraphQLInt)},
-        resolve=lambda _, info, id: get_order(id)
+        resolve=lambda _, info, id: get_order(id, relations=requested(info, ORDER_RELATIONS))
     ),
     'userOrders': GraphQLField(
         GraphQLList(OrderType),
-        args={'user_id': GraphQLNonNull(GraphQLInt)},
-        resolve=lambda _, info, user_id: get_user_orders(user_id)
+        args={
+            'user_id': GraphQLArgument(GraphQLNonNull(GraphQLInt)),
+            'limit': GraphQLArgument(GraphQLInt),
+            **ORDER_FILTER_ARGS,
+        },
+        resolve=lambda _, info, **args: get_user_orders(**args, relations=requested(info, ORDER_RELATIONS))
+    ),
+    'userOrdersConnection': GraphQLField(
+        OrderConnectionType,
+        args={
+            'user_id': GraphQLArgument(GraphQLNonNull(GraphQLInt)),
+            'first': GraphQLArgument(GraphQLInt),
+            'after': GraphQLArgument(GraphQLString),
+            **ORDER_FILTER_ARGS,
+        },
+        resolve=lambda _, info, **args: get_user_orders_connection(
+            **args, relations=requested(info, ORDER_RELATIONS, path=('edges', 'node'))
+        )
     ),
     'orderStats': GraphQLField(
         OrderStatsType,
@@ -1,37 +1,48 @@
 # payments_service/db.py
-import sqlite3
-from contextlib import contextmanager
 from typing import Optional, List, Dict
 import os
 import logging
 import json
+from shared.db_pool import get_pool
+from shared.migrations import Migration, migrate
 # Logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PaymentsDB")
 
+# Boshlang'ich sxemadan keyingi o'zgarishlar (shared/migrations.py)
+MIGRATIONS = (
+    Migration(1, 'payment_logs_index', (
+        "CREATE INDEX IF NOT EXISTS idx_payment_logs_payment ON payment_logs(payment_id, timestamp)",
+    )),
+    # AFTER UPDATE trigger har UPDATE ni ikki marta yozardi — updated_at endi UPDATE ning o'zida
+    Migration(2, 'drop_updated_at_trigger', (
+        "DROP TRIGGER IF EXISTS update_payment_ts",
+    )),
+)
+
+# Tez-tez ishlaydigan so'rovlar — `python -m shared.migrations` to'liq o'qishga tekshiradi
+HOT_QUERIES = {
+    'payment_logs': ("SELECT * FROM payment_logs WHERE payment_id = ? ORDER BY timestamp", (1,)),
+    'payment_refunds': ("SELECT * FROM refunds WHERE payment_id = ? ORDER BY requested_at DESC", (1,)),
+    'payments_by_order': ("SELECT * FROM payments WHERE order_id = ? ORDER BY created_at DESC", (1,)),
+    'method_by_name': ("SELECT id FROM payment_methods WHERE name = ? AND is_active = 1", ('card',)),
+}
+
 class PaymentDatabase:
     def __init__(self, db_path: str = 'payments.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(
+            self.db_path,
+            pragmas=(('foreign_keys', 'ON'),),
+            journal_mode='WAL',
+            timeout=15.0
+        )
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
         """
-        Xavfsiz tranzaksiya: commit yoki rollback
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
         """
-        conn = sqlite3.connect(self.db_path, timeout=15.0)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.execute("PRAGMA journal_mode = WAL;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"DB tranzaksiya xatosi: {e}")
-            raise
-        finally:
-            conn.close()
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -104,15 +115,6 @@ class PaymentDatabase:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_payments_method ON payments(method_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_refunds_payment ON refunds(payment_id)")
 
-            # Trigger: updated_at
-            conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_payment_ts
-                AFTER UPDATE ON payments FOR EACH ROW
-                BEGIN
-                    UPDATE payments SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-                END;
-            """)
-
             # Default payment methods
             default_methods = [
                 ('card', 'Karta orqali', 1, '{}'),
@@ -126,6 +128,9 @@ class PaymentDatabase:
                 VALUES (?, ?, ?, ?)
             """, default_methods)
 
+            # Migrations
+            migrate(conn, MIGRATIONS)
+
     # ========================
     # PAYMENT CRUD
     # ========================
@@ -192,7 +197,8 @@ class PaymentDatabase:
                 SET status = ?, 
                     gateway_transaction_id = ?, 
                     gateway_response = ?, 
-                    error_message = ?
+                    error_message = ?,
+                    updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             """, (
                 new_status,
@@ -1,19 +1,19 @@
 # payments_service/main.py
 import ssl
 import os
+import sys
 import subprocess
 import logging
-from http.server import HTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import logs
+from shared.server import create_server
 from api import GraphQLHandler
 
 # ========================
 # LOGGING (PROFESSIONAL)
 # ========================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-    datefmt='%H:%M:%S'
-)
+logs.setup('payments')
 logger = logging.getLogger("PaymentsService")
 
 # ========================
@@ -60,9 +60,6 @@ def run_server():
     # Sertifikat yaratish
     cert_file, key_file = generate_ssl_cert()
 
-    # Server yaratish
-    server = HTTPServer((HOST, PORT), GraphQLHandler)
-
     # SSL sozlash (XAVFSIZ)
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     context.load_cert_chain(certfile=cert_file, keyfile=key_file)
@@ -70,7 +67,8 @@ def run_server():
     context.set_ciphers('ECDHE+AESGCM:ECDHE+CHACHA20:DHE+AESGCM:DHE+CHACHA20:!aNULL')
     context.verify_mode = ssl.CERT_NONE  # test uchun
 
-    server.socket = context.wrap_socket(server.socket, server_side=True)
+    # Server yaratish (thread pool + TLS)
+    server = create_server((HOST, PORT), GraphQLHandler, context)
 
     # PROFESSIONAL BANNER
     banner = f"""
@@ -9,7 +9,6 @@ import json
 import logging
 
 # Logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Global DB
@@ -0,0 +1,401 @@
+# products_service/bulk.py
+"""
+Katalogni ommaviy import / eksport qilish (CSV yoki JSONL). Fayl oqim bilan o'qiladi/yoziladi —
+xotirada faqat bitta paket turadi.
+
+Import (products_service papkasidan):
+    python bulk.py import katalog.jsonl [--format csv|jsonl] [--batch 5000] [--errors xatolar.jsonl] [--restart]
+- Yozuvlar BULK_BATCH_SIZE lik paketlarda tekshiriladi va bitta tranzaksiyada executemany bilan yoziladi:
+  mahsulot, atributlar, rasmlar va ombor qoldiqlari birga
+- Mahsulot slug bo'yicha upsert — qayta ishga tushirish dublikat yaratmaydi
+- Har commit dan keyin checkpoint (<fayl>.checkpoint, bayt offset): to'xtab qolsa keyingi ishga tushirish
+  o'sha joydan davom etadi (--restart — boshidan)
+- Yaroqsiz yozuv paketni to'xtatmaydi: raqami va sababi xatolar fayliga (<fayl>.errors.jsonl) yoziladi
+- Qoldiq (stock) — ombordagi jami miqdor, bron qilinganlari bilan birga. Bronlar (reserved_quantity,
+  stock_reservations) import bilan o'zgarmaydi: ombor qoldig'i o'sha ombordagi faol bronlardan kam bo'lsa
+  yozuv rad etiladi (xatolar fayliga) — bron to'langanda sotiladigan mahsulot yo'qolib qolmasin
+- Ishlayotgan servis yangi qoldiqlarni stock keshi TTL idan (STOCK_CACHE_TTL) keyin ko'radi
+
+Eksport:
+    python bulk.py export katalog.jsonl [--format csv|jsonl]   ('-' — stdout)
+
+JSONL — bir qatorda bitta mahsulot:
+    {"slug": "iphone-15", "name": "iPhone 15", "price": 12000000, "sku": "IP15", "category": "telefonlar",
+     "attributes": [{"name": "Rang", "value": "qora"}], "images": [{"url": "...", "alt_text": "", "is_main": true}],
+     "stock": {"asosiy": 10, "Toshkent-1": 4}}
+  attributes {nom: qiymat} ko'rinishida ham, images URL lar ro'yxati, stock bitta son (asosiy ombor) ham bo'lishi mumkin.
+  Kategoriya — category (slug) yoki category_id. Kalit berilmagan bo'lsa (attributes / images / stock) o'zgarmaydi.
+CSV — ustunlar xuddi shunday; attr:<nom> — atribut, stock:<ombor> — ombor qoldig'i (stock — asosiy ombor),
+images — URL lar '|' bilan (birinchisi asosiy). Bir nechta qiymat ham '|' bilan.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import config  # noqa: E402
+from db import ProductDatabase, BULK_COLUMNS, DEFAULT_WAREHOUSE  # noqa: E402
+
+# CSV dagi ro'yxat qiymatlari ajratgichi (images, bir nomli atributlar)
+LIST_SEPARATOR = '|'
+TRUE_VALUES = ('1', 'true', 'ha', 'yes')
+
+
+# ========================
+# O'QISH (oqim)
+# ========================
+def detect_format(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(path: str, fmt: str, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """
+    (xom yozuv, keyingi yozuv boshlanadigan bayt offset) oqimi. offset — checkpoint dan davom etish.
+    Buzuq JSON qatori — {'__error__': sabab}
+    """
+    with open(path, 'rb') as f:
+        def lines() -> Iterator[str]:
+            # readline (iterator emas) — f.tell() har yozuvdan keyin aniq bo'lsin
+            while True:
+                line = f.readline()
+                if not line:
+                    return
+                yield line.decode('utf-8-sig')
+
+        if fmt == 'csv':
+            source = lines()
+            header = next(csv.reader(source), None)
+            if header is None:
+                return
+            if offset:
+                f.seek(offset)
+            for row in csv.DictReader(source, fieldnames=header):
+                yield row, f.tell()
+            return
+
+        f.seek(offset)
+        for line in lines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("obyekt kutilgan")
+            except ValueError as e:
+                record = {'__error__': f"JSON xato: {e}"}
+            yield record, f.tell()
+
+
+# ========================
+# TEKSHIRISH
+# ========================
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _number(record: Dict, key: str, cast=float, required: bool = False):
+    value = record.get(key)
+    if _blank(value):
+        if required:
+            raise ValueError(f"{key} majburiy")
+        return None
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} son emas: {value!r}")
+    if number < 0:
+        raise ValueError(f"{key} manfiy bo'lishi mumkin emas")
+    return number
+
+
+def _split(value) -> List[str]:
+    if isinstance(value, list):
+        return value
+    return [part.strip() for part in str(value).split(LIST_SEPARATOR) if part.strip()]
+
+
+def normalize(raw: Dict, categories: Dict[str, int], category_ids: Set[int]) -> Dict:
+    """
+    Xom yozuv (CSV qatori yoki JSON obyekt) -> db.bulk_upsert_products yozuvi; yaroqsiz bo'lsa ValueError.
+    categories — {slug: id}, category_ids — mavjud id lar
+    """
+    if '__error__' in raw:
+        raise ValueError(raw['__error__'])
+    name, slug = (str(raw.get(key) or '').strip() for key in ('name', 'slug'))
+    if not name or not slug:
+        raise ValueError("name va slug majburiy")
+
+    product = {'name': name, 'slug': slug, 'price': _number(raw, 'price', required=True)}
+    for key in ('description', 'short_description', 'sku', 'brand', 'dimensions'):
+        if key in raw:
+            product[key] = None if _blank(raw[key]) else str(raw[key]).strip()
+    for key, cast in (('old_price', float), ('weight_kg', float), ('warranty_months', int)):
+        if key in raw:
+            product[key] = _number(raw, key, cast)
+    if 'is_active' in raw and not _blank(raw['is_active']):
+        value = raw['is_active']
+        product['is_active'] = 1 if (value is True or str(value).strip().lower() in TRUE_VALUES) else 0
+
+    if not _blank(raw.get('category')):
+        category = str(raw['category']).strip()
+        if category not in categories:
+            raise ValueError(f"Kategoriya topilmadi: {category}")
+        product['category_id'] = categories[category]
+    elif not _blank(raw.get('category_id')):
+        category_id = _number(raw, 'category_id', int)
+        if category_id not in category_ids:
+            raise ValueError(f"Kategoriya topilmadi: id={category_id}")
+        product['category_id'] = category_id
+
+    # CSV: attr:<nom> / stock:<ombor> ustunlari; JSONL: attributes / stock kalitlari
+    attributes = raw.get('attributes')
+    if isinstance(attributes, dict):
+        attributes = [(k, v) for k, v in attributes.items()]
+    elif isinstance(attributes, list):
+        attributes = [(a.get('name', a.get('attribute_name')), a.get('value', a.get('attribute_value')))
+                      for a in attributes]
+    columns = [key for key in raw if isinstance(key, str) and key.startswith('attr:')]
+    if columns:
+        attributes = [(key[5:], value) for key in columns for value in _split(raw[key] or '')]
+    if attributes is not None:
+        if any(_blank(k) or _blank(v) for k, v in attributes):
+            raise ValueError("Atribut nomi va qiymati bo'sh bo'lmasligi kerak")
+        attributes = [(str(k).strip(), str(v).strip()) for k, v in attributes]
+
+    images = raw.get('images')
+    if images is not None:
+        images = images if isinstance(images, list) else _split(images)
+        images = [image if isinstance(image, dict) else {'url': image} for image in images]
+        if any(_blank(image.get('url') or image.get('image_url')) for image in images):
+            raise ValueError("Rasm URL bo'sh")
+        has_main = any(image.get('is_main') for image in images)
+        images = [(
+            image.get('url') or image.get('image_url'), image.get('alt_text') or '',
+            1 if image.get('is_main') or (not has_main and index == 0) else 0, index
+        ) for index, image in enumerate(images)]
+
+    stock = raw.get('stock')
+    if not _blank(stock) and not isinstance(stock, dict):
+        stock = {DEFAULT_WAREHOUSE: stock}
+    elif _blank(stock):
+        stock = None
+    columns = {key[6:]: raw[key] for key in raw if isinstance(key, str) and key.startswith('stock:')}
+    if columns:
+        stock = {**(stock or {}), **{k: v for k, v in columns.items() if not _blank(v)}}
+    if stock:
+        stock = {str(warehouse).strip(): _number(stock, warehouse, int, required=True) for warehouse in stock}
+    else:
+        stock = None
+
+    return {'product': product, 'attributes': attributes, 'images': images, 'stock': stock}
+
+
+# ========================
+# CHECKPOINT
+# ========================
+def _load_checkpoint(path: str, source: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('size', 0) > os.path.getsize(source):
+        raise SystemExit(f"{source} checkpoint dan keyin qisqargan — --restart bilan boshidan boshlang")
+    return state
+
+
+def _save_checkpoint(path: str, state: Dict):
+    # Vaqtinchalik fayl + replace: to'xtab qolganda checkpoint yarim yozilmaydi
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+# ========================
+# IMPORT
+# ========================
+def _write_batch(db: ProductDatabase, batch: List[Tuple[int, Dict]]) -> Tuple[int, List[Tuple[int, str]]]:
+    """Paketni yozish; (yozilgan, [(yozuv raqami, sabab)]). Kutilmagan IntegrityError — paket yozuvlarma-yozuv"""
+    # Paket ichida bir slug bir necha marta — oxirgisi qoladi
+    latest = {record['product']['slug']: (number, record) for number, record in batch}
+    numbers, records = zip(*latest.values()) if latest else ((), ())
+    try:
+        written, rejected = db.bulk_upsert_products(list(records))
+        return written, [(numbers[index], reason) for index, reason in rejected]
+    except sqlite3.IntegrityError:
+        written, rejected = 0, []
+        for number, record in zip(numbers, records):
+            try:
+                count, problems = db.bulk_upsert_products([record])
+                written += count
+                rejected += [(number, reason) for _, reason in problems]
+            except sqlite3.IntegrityError as e:
+                rejected.append((number, str(e)))
+        return written, rejected
+
+
+def import_catalog(
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = None,
+    errors_path: Optional[str] = None,
+    restart: bool = False,
+    db: Optional[ProductDatabase] = None,
+    progress: Optional[TextIO] = sys.stderr
+) -> Dict:
+    fmt = fmt or detect_format(path)
+    batch_size = max(1, batch_size or config.BULK_BATCH_SIZE)
+    db = db or ProductDatabase()
+    checkpoint_path = f"{path}.checkpoint"
+    errors_path = errors_path or f"{path}.errors.jsonl"
+    state = None if restart else _load_checkpoint(checkpoint_path, path)
+    resumed = state is not None
+    state = state or {'source': os.path.abspath(path), 'size': 0, 'offset': 0, 'records': 0, 'written': 0, 'rejected': 0}
+    state['size'] = os.path.getsize(path)
+    if resumed and progress:
+        print(f"Davom etilmoqda: {state['records']} yozuvdan keyin", file=progress)
+
+    categories = db.category_index()
+    category_ids = set(categories.values())
+    started, last_report = time.perf_counter(), 0.0
+    batch: List[Tuple[int, Dict]] = []
+    errors: List[Tuple[int, str]] = []
+    position = state['offset']
+
+    def flush():
+        written, rejected = _write_batch(db, batch) if batch else (0, [])
+        rejected = sorted(errors + rejected)
+        if rejected:
+            with open(errors_path, 'a', encoding='utf-8') as f:
+                for number, reason in rejected:
+                    f.write(json.dumps({'record': number, 'error': reason}, ensure_ascii=False) + '\n')
+        state['written'] += written
+        state['rejected'] += len(rejected)
+        state['offset'] = position
+        _save_checkpoint(checkpoint_path, state)
+        batch.clear()
+        errors.clear()
+
+    if not resumed and os.path.exists(errors_path):
+        os.remove(errors_path)
+    for raw, position in read_records(path, fmt, state['offset']):
+        state['records'] += 1
+        try:
+            batch.append((state['records'], normalize(raw, categories, category_ids)))
+        except ValueError as e:
+            errors.append((state['records'], str(e)))
+        if len(batch) + len(errors) >= batch_size:
+            flush()
+            now = time.perf_counter()
+            if progress and now - last_report >= 1.0:
+                last_report = now
+                _report(progress, state, now - started)
+    flush()
+    os.remove(checkpoint_path)
+    if progress:
+        _report(progress, state, time.perf_counter() - started, done=True)
+    return {key: state[key] for key in ('records', 'written', 'rejected')}
+
+
+def _report(out: TextIO, state: Dict, elapsed: float, done: bool = False):
+    percent = 100.0 * state['offset'] / state['size'] if state['size'] else 100.0
+    rate = state['written'] / elapsed if elapsed > 0 else 0.0
+    label = "Tayyor" if done else f"{percent:5.1f}%"
+    print(f"{label}: {state['records']} yozuv, yozildi {state['written']}, rad etildi {state['rejected']} "
+          f"({rate:.0f} yozuv/s)", file=out)
+
+
+# ========================
+# EKSPORT
+# ========================
+def export_records(db: ProductDatabase, batch_size: int = None) -> Iterator[Dict]:
+    """Barcha mahsulotlar id tartibida, import formatida (keyset paketlar)"""
+    batch_size = max(1, batch_size or config.BULK_EXPORT_BATCH)
+    after = 0
+    while True:
+        products = db.export_products(after, batch_size)
+        for product in products:
+            after = product.pop('id')
+            product.pop('category_id', None)
+            product['attributes'] = [{'name': a['attribute_name'], 'value': a['attribute_value']}
+                                     for a in product['attributes']]
+            product['images'] = [{'url': i['image_url'], 'alt_text': i['alt_text'], 'is_main': bool(i['is_main'])}
+                                 for i in product['images']]
+            yield product
+        if len(products) < batch_size:
+            return
+
+
+def _csv_row(product: Dict) -> Dict:
+    row = {key: value for key, value in product.items() if key not in ('attributes', 'images', 'stock')}
+    for attribute in product['attributes']:
+        key = f"attr:{attribute['name']}"
+        row[key] = f"{row[key]}{LIST_SEPARATOR}{attribute['value']}" if key in row else attribute['value']
+    # Asosiy rasm birinchi (import birinchisini asosiy qiladi)
+    images = sorted(product['images'], key=lambda i: not i['is_main'])
+    row['images'] = LIST_SEPARATOR.join(image['url'] for image in images)
+    row.update({f"stock:{warehouse}": quantity for warehouse, quantity in product['stock'].items()})
+    return row
+
+
+def export_catalog(
+    path: str,
+    fmt: Optional[str] = None,
+    db: Optional[ProductDatabase] = None,
+    progress: Optional[TextIO] = sys.stderr
+) -> int:
+    fmt = fmt or detect_format(path)
+    db = db or ProductDatabase()
+    out = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    count = 0
+    try:
+        if fmt == 'csv':
+            attributes, warehouses = db.export_columns()
+            writer = csv.DictWriter(out, fieldnames=[
+                c for c in BULK_COLUMNS if c != 'category_id'
+            ] + ['category', 'images'] + [f"attr:{a}" for a in attributes] + [f"stock:{w}" for w in warehouses])
+            writer.writeheader()
+        for product in export_records(db):
+            if fmt == 'csv':
+                writer.writerow(_csv_row(product))
+            else:
+                out.write(json.dumps(product, ensure_ascii=False, default=str) + '\n')
+            count += 1
+            if progress and count % 10000 == 0:
+                print(f"{count} mahsulot", file=progress)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if progress:
+        print(f"Tayyor: {count} mahsulot", file=progress)
+    return count
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Katalog ommaviy import / eksport")
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('import', help="CSV / JSONL dan import (checkpoint bilan)")
+    load.add_argument('path')
+    load.add_argument('--format', choices=('csv', 'jsonl'))
+    load.add_argument('--batch', type=int, default=config.BULK_BATCH_SIZE)
+    load.add_argument('--errors', help="Rad etilgan yozuvlar fayli (default: <fayl>.errors.jsonl)")
+    load.add_argument('--restart', action='store_true', help="Checkpoint e'tiborsiz — boshidan")
+    dump = commands.add_parser('export', help="CSV / JSONL ga eksport")
+    dump.add_argument('path', help="'-' — stdout")
+    dump.add_argument('--format', choices=('csv', 'jsonl'))
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        result = import_catalog(args.path, args.format, args.batch, args.errors, args.restart)
+        return 1 if result['rejected'] else 0
+    export_catalog(args.path, args.format or ('jsonl' if args.path == '-' else None))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
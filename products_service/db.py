@@ -1,26 +1,380 @@
 # products_service/db.py
-import sqlite3
-from contextlib import contextmanager
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from collections import Counter
+from functools import partial
 import os
+import re
+from shared import config
+from shared.db_pool import get_pool
+from shared.migrations import Migration, migrate
+from shared.pagination import keyset_condition
+from stock_cache import StockCache
+
+# Mahsulot bilan birga yuklanadigan bog'liq ro'yxatlar
+PRODUCT_RELATIONS = ('attributes', 'images')
+# SQLite bitta so'rovdagi ? soni chegarasi (eski versiyalarda 999)
+MAX_SQL_VARIABLES = 900
+# Ombori ko'rsatilmagan qoldiq (eski yagona inventory qatori, yangi mahsulot, updateStock)
+DEFAULT_WAREHOUSE = 'asosiy'
+# Ommaviy import / eksport qiladigan mahsulot ustunlari (bulk.py)
+BULK_COLUMNS = (
+    'name', 'slug', 'description', 'short_description', 'price', 'old_price', 'sku',
+    'category_id', 'brand', 'is_active', 'weight_kg', 'dimensions', 'warranty_months',
+)
+
+# ========================
+# FULL-TEXT QIDIRUV (FTS5)
+# ========================
+# Indekslanadigan ustunlar va BM25 og'irliklari (nom va SKU mosligi tavsifdan muhimroq)
+FTS_COLUMNS = ('name', 'short_description', 'description', 'sku', 'brand')
+FTS_WEIGHTS = (10.0, 3.0, 1.0, 5.0, 4.0)
+# unicode61 qamramaydigan holatlar: o‘ / o' / oʻ bir xil bo'lishi uchun apostroflar olib tashlanadi,
+# kirill ё, ў, қ, ғ, ҳ — asosiy harfga (foydalanuvchi ko'pincha ularsiz yozadi)
+FTS_REPLACEMENTS = (
+    ("'", ""), ("‘", ""), ("’", ""), ("ʻ", ""), ("ʼ", ""), ("`", ""),
+    ("ё", "е"), ("Ё", "Е"), ("ў", "у"), ("Ў", "У"), ("қ", "к"), ("Қ", "К"),
+    ("ғ", "г"), ("Ғ", "Г"), ("ҳ", "х"), ("Ҳ", "Х"),
+)
+
+
+# ========================
+# STOCK SO'ROVLARI
+# ========================
+class _Shortfall(Exception):
+    """reserve_stock ichida: stock yetmadi — savepointgacha qaytariladi, natija shortfalls bilan"""
+    def __init__(self, shortfalls: List[Dict]):
+        super().__init__(shortfalls)
+        self.shortfalls = shortfalls
+
+
+def stock_request(items: List[Dict]) -> List[Tuple[int, int]]:
+    """[{product_id, quantity}] -> [(product_id, jami miqdor)]: takrorlanganlar qo'shiladi"""
+    totals: Dict[int, int] = {}
+    for item in items:
+        if item['quantity'] <= 0:
+            raise ValueError(f"Miqdor musbat bo'lishi kerak: product_id={item['product_id']}")
+        totals[item['product_id']] = totals.get(item['product_id'], 0) + item['quantity']
+    return list(totals.items())
+
+
+def _chunks(pairs: List[Tuple[int, int]]) -> Iterable[List[Tuple[int, int]]]:
+    size = MAX_SQL_VARIABLES // 2
+    for start in range(0, len(pairs), size):
+        yield pairs[start:start + size]
+
+
+def _request_cte(count: int, key: str = 'product_id') -> str:
+    """
+    (key, qty) juftlari uchun `req` jadvali (parametrlar bir marta, so'rovda bir necha bor ishlatiladi).
+    key — product_id (mahsulot bo'yicha) yoki inventory_id (ombor qatori bo'yicha)
+    """
+    return f"WITH req({key}, qty) AS (VALUES {', '.join(['(?, ?)'] * count)})"
+
+
+def _update_inventory(conn, sql: str, params: Iterable) -> List[int]:
+    """
+    inventory UPDATE ... RETURNING: yangilangan qatorlarning product_id lari — soni
+    (cursor.rowcount WITH bilan boshlangan UPDATE uchun -1) va stock keshi uchun
+    """
+    return [row[0] for row in conn.execute(f"{sql} RETURNING product_id", list(params))]
+
+
+def _in_chunks(values: List) -> Iterable[List]:
+    for start in range(0, len(values), MAX_SQL_VARIABLES):
+        yield values[start:start + MAX_SQL_VARIABLES]
+
+
+def _placeholders(values: List) -> str:
+    return ', '.join('?' * len(values))
+
+
+def allocate_warehouses(requested: List[Tuple[int, int]], candidates: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Buyurtma pozitsiyalarini omborlarga taqsimlash (bitta o'tishda, bazaga murojaatsiz).
+    candidates — bo'sh qoldig'i bor ombor qatorlari {id, product_id, warehouse_location, free}.
+
+    - Pozitsiyani to'liq qoplay oladigan ombor bo'lsa — bittasidan olinadi; bir nechta bo'lsa,
+      buyurtmaning eng ko'p pozitsiyasini to'liq qoplaydigani (jo'natmalar kam bo'lsin)
+    - Hech biri to'liq qoplamasa — bo'sh qoldig'i ko'plaridan boshlab bo'lib olinadi
+    - Teng holatda ombor nomi bo'yicha (natija deterministik)
+
+    (allocations [{inventory_id, product_id, warehouse_location, quantity}], shortfalls) qaytadi
+    """
+    by_product: Dict[int, List[Dict]] = {}
+    for row in candidates:
+        by_product.setdefault(row['product_id'], []).append(row)
+    coverage = Counter(
+        row['warehouse_location']
+        for pid, qty in requested for row in by_product.get(pid, ()) if row['free'] >= qty
+    )
+
+    allocations, shortfalls = [], []
+    for pid, qty in requested:
+        rows = by_product.get(pid, [])
+        whole = [row for row in rows if row['free'] >= qty]
+        if whole:
+            picked = [(min(whole, key=lambda r: (-coverage[r['warehouse_location']], r['warehouse_location'])), qty)]
+        else:
+            picked, left = [], qty
+            for row in sorted(rows, key=lambda r: (-r['free'], r['warehouse_location'])):
+                if left <= 0:
+                    break
+                take = min(left, row['free'])
+                picked.append((row, take))
+                left -= take
+            if left > 0:
+                shortfalls.append({'product_id': pid, 'requested': qty, 'free_stock': qty - left})
+                continue
+        allocations += [{
+            'inventory_id': row['id'], 'product_id': pid,
+            'warehouse_location': row['warehouse_location'], 'quantity': take,
+        } for row, take in picked]
+    return allocations, shortfalls
+
+
+def _flat(pairs: List[Tuple[int, int]]) -> List[int]:
+    return [value for pair in pairs for value in pair]
+
+
+def normalize_search_text(text: str) -> str:
+    for old, new in FTS_REPLACEMENTS:
+        text = text.replace(old, new)
+    return text
+
+
+def fts_query(text: Optional[str]) -> Optional[str]:
+    """
+    Foydalanuvchi matni -> FTS5 MATCH ifodasi: har bir so'z prefiks sifatida ("iph"* "15"*),
+    so'zlar AND bilan. Qo'shtirnoq ichida — FTS sintaksisi (OR, NEAR, -) ishlamaydi
+    """
+    tokens = re.findall(r'\w+', normalize_search_text(text or ''))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _fts_sql_expr(column: str) -> str:
+    """normalize_search_text ning SQL ko'rinishi (triggerlar uchun)"""
+    expr = f"COALESCE({column}, '')"
+    for old, new in FTS_REPLACEMENTS:
+        expr = f"replace({expr}, '{old.replace(chr(39), chr(39) * 2)}', '{new}')"
+    return expr
+
+
+# ========================
+# MIGRATSIYALAR
+# ========================
+MIGRATIONS = (
+    Migration(1, 'products_hot_indexes', (
+        # Kategoriya sahifasi: WHERE category_id = ? AND is_active = 1 ORDER BY created_at DESC, id DESC
+        "CREATE INDEX IF NOT EXISTS idx_products_category_created ON products(category_id, is_active, created_at, id)",
+        # lowStock: bo'sh qoldiq ifodasi bo'yicha (so'rovdagi ifoda bilan aynan bir xil bo'lishi kerak)
+        "CREATE INDEX IF NOT EXISTS idx_inventory_free_stock ON inventory((quantity - COALESCE(reserved_quantity, 0)))",
+        # load_relations: WHERE product_id IN (...) ORDER BY id / sort_order, id
+        "CREATE INDEX IF NOT EXISTS idx_product_attributes_product ON product_attributes(product_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_product_images_product ON product_images(product_id, sort_order, id)",
+    )),
+    # AFTER UPDATE trigger har UPDATE ni ikki marta yozardi — updated_at endi UPDATE ning o'zida
+    Migration(2, 'drop_updated_at_triggers', (
+        "DROP TRIGGER IF EXISTS update_product_ts",
+        "DROP TRIGGER IF EXISTS update_category_ts",
+    )),
+    # Buyurtma bo'yicha bronlar: idempotent reserve / release / commit va TTL (sweeper)
+    Migration(3, 'stock_reservations', (
+        """
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL CHECK(quantity > 0),
+            status TEXT NOT NULL DEFAULT 'held'
+                CHECK(status IN ('held', 'committed', 'released', 'expired')),
+            expires_at DATETIME NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (order_id, product_id),
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+        )
+        """,
+        # Sweeper: WHERE status = 'held' AND expires_at <= now ORDER BY expires_at
+        "CREATE INDEX IF NOT EXISTS idx_stock_reservations_expiry ON stock_reservations(status, expires_at)",
+    )),
+    # Bir nechta ombor: inventory — (mahsulot, ombor) bo'yicha bitta qator, stock_levels — mahsulot bo'yicha
+    # jami (triggerlar bilan oshib-kamayadi), bronlar aniq ombor qatoriga bog'lanadi
+    Migration(4, 'multi_warehouse_inventory', (
+        f"""
+        UPDATE inventory SET warehouse_location = '{DEFAULT_WAREHOUSE}'
+        WHERE warehouse_location IS NULL OR TRIM(warehouse_location) = ''
+        """,
+        "UPDATE inventory SET reserved_quantity = 0 WHERE reserved_quantity IS NULL",
+        "UPDATE inventory SET quantity = 0 WHERE quantity IS NULL",
+        # Bir omborda takrorlangan qatorlar birinchisiga qo'shiladi
+        """
+        UPDATE inventory SET
+            quantity = (SELECT SUM(d.quantity) FROM inventory d
+                        WHERE d.product_id = inventory.product_id AND d.warehouse_location = inventory.warehouse_location),
+            reserved_quantity = (SELECT SUM(d.reserved_quantity) FROM inventory d
+                                 WHERE d.product_id = inventory.product_id AND d.warehouse_location = inventory.warehouse_location)
+        WHERE id IN (SELECT MIN(id) FROM inventory GROUP BY product_id, warehouse_location HAVING COUNT(*) > 1)
+        """,
+        "DELETE FROM inventory WHERE id NOT IN (SELECT MIN(id) FROM inventory GROUP BY product_id, warehouse_location)",
+        # Bronlar ombor qatori bo'yicha (bitta mahsulot bir necha ombordan olinishi mumkin)
+        """
+        CREATE TABLE stock_reservations_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            inventory_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL CHECK(quantity > 0),
+            status TEXT NOT NULL DEFAULT 'held'
+                CHECK(status IN ('held', 'committed', 'released', 'expired')),
+            expires_at DATETIME NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (order_id, inventory_id),
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+            FOREIGN KEY (inventory_id) REFERENCES inventory(id) ON DELETE CASCADE
+        )
+        """,
+        # Eski bronlar — mahsulotning (endi yagona) ombor qatoriga
+        """
+        INSERT INTO stock_reservations_new
+            (id, order_id, product_id, inventory_id, quantity, status, expires_at, created_at, updated_at)
+        SELECT r.id, r.order_id, r.product_id, i.id, r.quantity, r.status, r.expires_at, r.created_at, r.updated_at
+        FROM stock_reservations r
+        JOIN inventory i ON i.id = (SELECT MIN(id) FROM inventory WHERE product_id = r.product_id)
+        """,
+        "DROP TABLE stock_reservations",
+        "ALTER TABLE stock_reservations_new RENAME TO stock_reservations",
+        "CREATE INDEX IF NOT EXISTS idx_stock_reservations_expiry ON stock_reservations(status, expires_at)",
+        # Taqsimlash: WHERE product_id IN (...) — faqat shu mahsulot omborlari
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_product_warehouse ON inventory(product_id, warehouse_location)",
+        "DROP INDEX IF EXISTS idx_inventory_product",
+        "DROP INDEX IF EXISTS idx_inventory_free_stock",
+        """
+        CREATE TABLE IF NOT EXISTS stock_levels (
+            product_id INTEGER PRIMARY KEY,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            reserved_quantity INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        INSERT INTO stock_levels (product_id, quantity, reserved_quantity)
+        SELECT product_id, SUM(quantity), SUM(reserved_quantity) FROM inventory GROUP BY product_id
+        """,
+        # lowStock: bo'sh qoldiq ifodasi bo'yicha (so'rovdagi ifoda bilan aynan bir xil)
+        "CREATE INDEX IF NOT EXISTS idx_stock_levels_free ON stock_levels((quantity - reserved_quantity))",
+        # stock_levels faqat farq (delta) bilan yangilanadi — jami qayta hisoblanmaydi
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_levels_insert AFTER INSERT ON inventory BEGIN
+            INSERT INTO stock_levels (product_id, quantity, reserved_quantity)
+            VALUES (NEW.product_id, COALESCE(NEW.quantity, 0), COALESCE(NEW.reserved_quantity, 0))
+            ON CONFLICT(product_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                reserved_quantity = reserved_quantity + excluded.reserved_quantity,
+                updated_at = CURRENT_TIMESTAMP;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_levels_update AFTER UPDATE OF quantity, reserved_quantity ON inventory
+        WHEN OLD.product_id = NEW.product_id BEGIN
+            UPDATE stock_levels SET
+                quantity = quantity + COALESCE(NEW.quantity, 0) - COALESCE(OLD.quantity, 0),
+                reserved_quantity = reserved_quantity + COALESCE(NEW.reserved_quantity, 0) - COALESCE(OLD.reserved_quantity, 0),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE product_id = NEW.product_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_levels_move AFTER UPDATE OF product_id ON inventory
+        WHEN OLD.product_id != NEW.product_id BEGIN
+            UPDATE stock_levels SET
+                quantity = quantity - COALESCE(OLD.quantity, 0),
+                reserved_quantity = reserved_quantity - COALESCE(OLD.reserved_quantity, 0),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE product_id = OLD.product_id;
+            INSERT INTO stock_levels (product_id, quantity, reserved_quantity)
+            VALUES (NEW.product_id, COALESCE(NEW.quantity, 0), COALESCE(NEW.reserved_quantity, 0))
+            ON CONFLICT(product_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                reserved_quantity = reserved_quantity + excluded.reserved_quantity,
+                updated_at = CURRENT_TIMESTAMP;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS inventory_levels_delete AFTER DELETE ON inventory BEGIN
+            UPDATE stock_levels SET
+                quantity = quantity - COALESCE(OLD.quantity, 0),
+                reserved_quantity = reserved_quantity - COALESCE(OLD.reserved_quantity, 0),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE product_id = OLD.product_id;
+        END
+        """,
+    )),
+)
+
+# Tez-tez ishlaydigan so'rovlar — `python -m shared.migrations` to'liq o'qishga tekshiradi
+HOT_QUERIES = {
+    'product_by_id': ("""
+        SELECT p.*, c.name as category_name, s.quantity as stock_available
+        FROM products p
+        LEFT JOIN categories c ON p.category_id = c.id
+        LEFT JOIN stock_levels s ON p.id = s.product_id
+        WHERE p.id = ? AND p.is_active = 1
+    """, (1,)),
+    'catalog_page': ("""
+        SELECT p.id FROM products p
+        WHERE p.is_active = 1 AND (p.created_at, p.id) < (?, ?)
+        ORDER BY p.created_at DESC, p.id DESC LIMIT 21
+    """, ('2024-01-01', 1)),
+    'category_page': ("""
+        SELECT p.id FROM products p
+        WHERE p.category_id = ? AND p.is_active = 1 AND (p.created_at, p.id) < (?, ?)
+        ORDER BY p.created_at DESC, p.id DESC LIMIT 21
+    """, (1, '2024-01-01', 1)),
+    'price_range': ("""
+        SELECT p.id FROM products p
+        WHERE p.is_active = 1 AND p.price >= ? AND p.price <= ?
+    """, (100, 200)),
+    'stock_by_product': ("SELECT quantity, reserved_quantity FROM stock_levels WHERE product_id = ?", (1,)),
+    'warehouse_candidates': ("""
+        SELECT id, product_id, warehouse_location, quantity - reserved_quantity AS free FROM inventory
+        WHERE product_id IN (?, ?) AND quantity - reserved_quantity > 0
+    """, (1, 2)),
+    'reservations_by_order': ("""
+        SELECT product_id, inventory_id, quantity, status FROM stock_reservations WHERE order_id = ?
+    """, (1,)),
+    'expired_reservations': ("""
+        SELECT id, inventory_id, quantity FROM stock_reservations
+        WHERE status = 'held' AND expires_at <= CURRENT_TIMESTAMP
+        ORDER BY expires_at LIMIT 500
+    """, ()),
+    'low_stock': ("""
+        SELECT p.id, s.quantity
+        FROM stock_levels s
+        JOIN products p ON p.id = s.product_id
+        WHERE (s.quantity - s.reserved_quantity) <= ? AND p.is_active = 1
+        ORDER BY (s.quantity - s.reserved_quantity)
+    """, (10,)),
+    'attributes_by_products': ("SELECT * FROM product_attributes WHERE product_id IN (?, ?)", (1, 2)),
+    'images_by_products': ("SELECT * FROM product_images WHERE product_id IN (?, ?)", (1, 2)),
+}
+
 
 class ProductDatabase:
     def __init__(self, db_path: str = 'products.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(self.db_path)
+        self.stock_cache = StockCache(self.load_stock)
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        """
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
+        """
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -116,21 +470,60 @@ class ProductDatabase:
                 )
             """)
 
-            # Trigger: updated_at
-            conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_product_ts
-                AFTER UPDATE ON products FOR EACH ROW
-                BEGIN
-                    UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-                END;
-            """)
+            # 6. products_fts — nom/tavsif/SKU/brend bo'yicha qidiruv indeksi (rowid = products.id)
+            self._init_search_index(conn)
 
-            conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_category_ts
-                AFTER UPDATE ON categories FOR EACH ROW
-                BEGIN
-                    UPDATE categories SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-                END;
+            # Indekslar: qidiruv filtrlari (inventory indeksi — 4-migratsiyada, (product_id, warehouse_location))
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_products_category_price ON products(category_id, price)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_products_price ON products(price)")
+            # Keyset pagination: WHERE is_active = 1 AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_products_active_created ON products(is_active, created_at, id)")
+
+            # Boshlang'ich sxemadan keyingi o'zgarishlar
+            migrate(conn, MIGRATIONS)
+
+    def _init_search_index(self, conn):
+        columns = ', '.join(FTS_COLUMNS)
+        values = ', '.join(_fts_sql_expr(f"new.{c}") for c in FTS_COLUMNS)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                {columns},
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3 4'
+            )
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS products_fts_insert
+            AFTER INSERT ON products FOR EACH ROW
+            BEGIN
+                INSERT INTO products_fts(rowid, {columns}) VALUES (new.id, {values});
+            END;
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS products_fts_update
+            AFTER UPDATE OF {columns} ON products FOR EACH ROW
+            BEGIN
+                DELETE FROM products_fts WHERE rowid = old.id;
+                INSERT INTO products_fts(rowid, {columns}) VALUES (new.id, {values});
+            END;
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_delete
+            AFTER DELETE ON products FOR EACH ROW
+            BEGIN
+                DELETE FROM products_fts WHERE rowid = old.id;
+            END;
+        """)
+
+        # Indeks mavjud bazaga keyin qo'shilgan bo'lsa (yoki sinxron bo'lmasa) — qayta to'ldirish
+        out_of_sync = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM products) != (SELECT COUNT(*) FROM products_fts)"
+        ).fetchone()[0]
+        if out_of_sync:
+            conn.execute("DELETE FROM products_fts")
+            conn.execute(f"""
+                INSERT INTO products_fts(rowid, {columns})
+                SELECT id, {', '.join(_fts_sql_expr(c) for c in FTS_COLUMNS)} FROM products
             """)
 
     # ========================
@@ -162,49 +555,50 @@ class ProductDatabase:
     # PRODUCT CRUD
     # ========================
     def create_product(self, name: str, slug: str, price: float, category_id: Optional[int] = None, **kwargs) -> int:
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            fields = ['name', 'slug', 'price', 'category_id']
-            values = [name, slug, price, category_id]
-            placeholders = ['?', '?', '?', '?']
-
-            optional_fields = {
-                'description': kwargs.get('description'),
-                'short_description': kwargs.get('short_description'),
-                'old_price': kwargs.get('old_price'),
-                'sku': kwargs.get('sku'),
-                'brand': kwargs.get('brand'),
-                'stock_quantity': kwargs.get('stock_quantity', 0),
-                'weight_kg': kwargs.get('weight_kg'),
-                'dimensions': kwargs.get('dimensions'),
-                'warranty_months': kwargs.get('warranty_months', 0)
-            }
-
-            for field, value in optional_fields.items():
-                if value is not None:
-                    fields.append(field)
-                    values.append(value)
-                    placeholders.append('?')
-
-            sql = f"INSERT INTO products ({', '.join(fields)}) VALUES ({', '.join(placeholders)})"
-            cursor.execute(sql, values)
-            product_id = cursor.lastrowid
-
-            # Avto inventory yaratish
+        fields = ['name', 'slug', 'price', 'category_id']
+        values = [name, slug, price, category_id]
+        placeholders = ['?', '?', '?', '?']
+
+        optional_fields = {
+            'description': kwargs.get('description'),
+            'short_description': kwargs.get('short_description'),
+            'old_price': kwargs.get('old_price'),
+            'sku': kwargs.get('sku'),
+            'brand': kwargs.get('brand'),
+            'stock_quantity': kwargs.get('stock_quantity', 0),
+            'weight_kg': kwargs.get('weight_kg'),
+            'dimensions': kwargs.get('dimensions'),
+            'warranty_months': kwargs.get('warranty_months', 0)
+        }
+
+        for field, value in optional_fields.items():
+            if value is not None:
+                fields.append(field)
+                values.append(value)
+                placeholders.append('?')
+
+        sql = f"INSERT INTO products ({', '.join(fields)}) VALUES ({', '.join(placeholders)})"
+
+        def apply(conn):
+            product_id = conn.execute(sql, values).lastrowid
+
+            # Avto inventory yaratish (asosiy omborda; stock_levels trigger bilan, kesh _stock_transaction da)
             conn.execute("""
-                INSERT INTO inventory (product_id, quantity) VALUES (?, ?)
-            """, (product_id, kwargs.get('stock_quantity', 0)))
+                INSERT INTO inventory (product_id, warehouse_location, quantity) VALUES (?, ?, ?)
+            """, (product_id, DEFAULT_WAREHOUSE, kwargs.get('stock_quantity', 0)))
+            return product_id, [product_id]
 
-            return product_id
+        return self._stock_transaction(apply)
 
-    def get_product_by_id(self, product_id: int) -> Optional[Dict]:
+    def get_product_by_id(self, product_id: int, relations: Iterable[str] = PRODUCT_RELATIONS) -> Optional[Dict]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT p.*, c.name as category_name, i.quantity as stock_available
+                SELECT p.*, c.name as category_name, COALESCE(s.quantity, 0) as stock_available,
+                       COALESCE(s.reserved_quantity, 0) as reserved_quantity
                 FROM products p
                 LEFT JOIN categories c ON p.category_id = c.id
-                LEFT JOIN inventory i ON p.id = i.product_id
+                LEFT JOIN stock_levels s ON p.id = s.product_id
                 WHERE p.id = ? AND p.is_active = 1
             """, (product_id,))
             row = cursor.fetchone()
@@ -212,68 +606,144 @@ class ProductDatabase:
                 return None
             product = dict(row)
 
-            # Atributlar
-            cursor.execute("SELECT attribute_name, attribute_value FROM product_attributes WHERE product_id = ?", (product_id,))
-            product['attributes'] = [dict(r) for r in cursor.fetchall()]
-
-            # Rasmlar
-            cursor.execute("SELECT image_url, alt_text, is_main FROM product_images WHERE product_id = ? ORDER BY sort_order", (product_id,))
-            product['images'] = [dict(r) for r in cursor.fetchall()]
-
+            # Atributlar, rasmlar (faqat so'ralganlari)
+            self.load_relations([product], relations)
             return product
 
-    def get_all_products(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+    def get_products_by_ids(self, product_ids: List[int], relations: Iterable[str] = ()) -> List[Dict]:
+        """
+        Bir nechta mahsulot bitta so'rovda (IN ro'yxat), topilmaganlari tushib qoladi.
+        Tartib kafolatlanmaydi — chaqiruvchi id bo'yicha moslaydi.
+        """
+        ids = list(dict.fromkeys(product_ids))
+        if not ids:
+            return []
+        products = []
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT p.*, c.name as category_name, i.quantity as stock_available
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                LEFT JOIN inventory i ON p.id = i.product_id
-                WHERE p.is_active = 1
-                ORDER BY p.created_at DESC
-                LIMIT ? OFFSET ?
-            """, (limit, offset))
-            rows = cursor.fetchall()
-            products = []
-            for row in rows:
-                product = dict(row)
-                pid = product['id']
-                cursor.execute("SELECT attribute_name, attribute_value FROM product_attributes WHERE product_id = ?", (pid,))
-                product['attributes'] = [dict(r) for r in cursor.fetchall()]
-                products.append(product)
-            return products
+            for start in range(0, len(ids), MAX_SQL_VARIABLES):
+                chunk = ids[start:start + MAX_SQL_VARIABLES]
+                rows = conn.execute(f"""
+                    SELECT p.*, c.name as category_name, COALESCE(s.quantity, 0) as stock_available,
+                           COALESCE(s.reserved_quantity, 0) as reserved_quantity
+                    FROM products p
+                    LEFT JOIN categories c ON p.category_id = c.id
+                    LEFT JOIN stock_levels s ON p.id = s.product_id
+                    WHERE p.id IN ({', '.join('?' * len(chunk))}) AND p.is_active = 1
+                """, chunk)
+                products.extend(dict(row) for row in rows)
+            return self.load_relations(products, relations)
+
+    def get_all_products(self, limit: int = 50, after: Optional[Tuple] = None, relations: Iterable[str] = ('attributes',)) -> List[Dict]:
+        """
+        Yangilari birinchi. after — oldingi sahifaning oxirgi (created_at, id) qiymati (keyset)
+        """
+        products = self.search_products(limit=limit, after=after)
+        # Butun sahifa uchun bitta so'rov (har mahsulotga alohida emas)
+        return self.load_relations(products, relations)
 
-    def search_products(self, query: str, category_id: Optional[int] = None, min_price: Optional[float] = None, max_price: Optional[float] = None) -> List[Dict]:
+    def search_products(
+        self,
+        query: Optional[str] = None,
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock_only: bool = False,
+        limit: int = 20,
+        offset: int = 0,
+        after: Optional[Tuple] = None
+    ) -> List[Dict]:
+        """
+        Matn bo'lsa — products_fts (BM25 bo'yicha tartib, prefiks mos kelish),
+        filtrlar FTS natijasiga qo'shiladi; matnsiz — faqat filtrlar (indekslar bo'yicha).
+        after — keyset cursor qiymatlari: matnli qidiruvda (search_rank, id), matnsiz (created_at, id)
+        """
+        match = fts_query(query)
+        if match:
+            rank = f"bm25(products_fts, {', '.join(map(str, FTS_WEIGHTS))})"
+            source = "products_fts f JOIN products p ON p.id = f.rowid"
+            conditions = ["products_fts MATCH ?"]
+            params: List[Any] = [match]
+            columns = f"{rank} as search_rank, "
+            keyset, descending = (rank, "p.id"), False
+            order = "search_rank, p.id"
+        else:
+            source = "products p"
+            conditions, params = [], []
+            columns = ""
+            keyset, descending = ("p.created_at", "p.id"), True
+            order = "p.created_at DESC, p.id DESC"
+
+        conditions.append("p.is_active = 1")
+        if category_id:
+            conditions.append("p.category_id = ?")
+            params.append(category_id)
+        if min_price is not None:
+            conditions.append("p.price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("p.price <= ?")
+            params.append(max_price)
+        if in_stock_only:
+            conditions.append("(s.quantity - s.reserved_quantity) > 0")
+        condition, keyset_params = keyset_condition(keyset, after, descending)
+        if condition:
+            conditions.append(condition)
+            params.extend(keyset_params)
+
+        sql = f"""
+            SELECT {columns}p.*, c.name as category_name,
+                   COALESCE(s.quantity, 0) as quantity, COALESCE(s.quantity, 0) as stock_available,
+                   COALESCE(s.reserved_quantity, 0) as reserved_quantity
+            FROM {source}
+            LEFT JOIN categories c ON p.category_id = c.id
+            LEFT JOIN stock_levels s ON p.id = s.product_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+        """
+        params.extend([limit, offset])
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            sql = """
-                SELECT p.*, c.name as category_name
-                FROM products p
-                LEFT JOIN categories c ON p.category_id = c.id
-                WHERE p.is_active = 1
-                AND (p.name LIKE ? OR p.description LIKE ? OR p.sku LIKE ?)
-            """
-            params = [f"%{query}%", f"%{query}%", f"%{query}%"]
-
-            if category_id:
-                sql += " AND p.category_id = ?"
-                params.append(category_id)
-            if min_price is not None:
-                sql += " AND p.price >= ?"
-                params.append(min_price)
-            if max_price is not None:
-                sql += " AND p.price <= ?"
-                params.append(max_price)
-
-            sql += " ORDER BY p.name LIMIT 20"
-
-            cursor.execute(sql, params)
-            return [dict(row) for row in cursor.fetchall()]
+            return [dict(row) for row in conn.execute(sql, params)]
 
     # ========================
     # ATTRIBUTE & IMAGE
     # ========================
+    def load_relations(self, products: List[Dict], relations: Iterable[str] = PRODUCT_RELATIONS) -> List[Dict]:
+        """
+        Mahsulotlar ro'yxatiga atribut / rasmlarni biriktirish:
+        har bir bog'lanish uchun bitta IN (...) so'rov, xotirada product_id bo'yicha guruhlanadi
+        """
+        relations = set(relations)
+        if not products or not relations:
+            return products
+        ids = list(dict.fromkeys(p['id'] for p in products))
+        with self.get_connection() as conn:
+            if 'attributes' in relations:
+                attributes = self._group_by_product(conn, """
+                    SELECT product_id, attribute_name, attribute_value
+                    FROM product_attributes WHERE product_id IN ({}) ORDER BY id
+                """, ids)
+                for product in products:
+                    product['attributes'] = attributes.get(product['id'], [])
+            if 'images' in relations:
+                images = self._group_by_product(conn, """
+                    SELECT product_id, image_url, alt_text, is_main
+                    FROM product_images WHERE product_id IN ({}) ORDER BY sort_order, id
+                """, ids)
+                for product in products:
+                    product['images'] = images.get(product['id'], [])
+        return products
+
+    @staticmethod
+    def _group_by_product(conn, sql: str, ids: List[int]) -> Dict[int, List[Dict]]:
+        grouped: Dict[int, List[Dict]] = {}
+        for start in range(0, len(ids), MAX_SQL_VARIABLES):
+            chunk = ids[start:start + MAX_SQL_VARIABLES]
+            for row in conn.execute(sql.format(', '.join('?' * len(chunk))), chunk):
+                item = dict(row)
+                grouped.setdefault(item.pop('product_id'), []).append(item)
+        return grouped
+
     def add_attribute(self, product_id: int, name: str, value: str) -> bool:
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -295,11 +765,502 @@ class ProductDatabase:
     # ========================
     # INVENTORY
     # ========================
-    def update_stock(self, product_id: int, quantity: int) -> bool:
+    def update_stock(self, product_id: int, quantity: int, warehouse_location: Optional[str] = None) -> bool:
+        """
+        Ombordagi qoldiqni o'rnatish (ombor ko'rsatilmasa — asosiy). Mahsulotda bu ombor qatori
+        bo'lmasa yaratiladi; mahsulot topilmasa False
+        """
+        warehouse_location = warehouse_location or DEFAULT_WAREHOUSE
+
+        def apply(conn):
+            touched = [row[0] for row in conn.execute("""
+                INSERT INTO inventory (product_id, warehouse_location, quantity)
+                SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM products WHERE id = ?)
+                ON CONFLICT(product_id, warehouse_location) DO UPDATE SET
+                    quantity = excluded.quantity,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING product_id
+            """, (product_id, warehouse_location, quantity, product_id))]
+            return bool(touched), touched
+
+        return self._stock_transaction(apply)
+
+    def get_warehouse_stock(self, product_id: int) -> List[Dict]:
+        """Mahsulot qoldig'i omborlar bo'yicha"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE inventory SET quantity = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE product_id = ?
-            """, (quantity, product_id))
-            return cursor.rowcount > 0
\ No newline at end of file
+            return [dict(row) for row in conn.execute("""
+                SELECT warehouse_location, quantity, COALESCE(reserved_quantity, 0) AS reserved_quantity,
+                       quantity - COALESCE(reserved_quantity, 0) AS free_stock, last_restocked, updated_at
+                FROM inventory WHERE product_id = ?
+                ORDER BY warehouse_location
+            """, (product_id,))]
+
+    def load_stock(self, product_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+        """{product_id: (quantity, reserved)} — barcha omborlar jami (stock_levels, PK); stock keshi shu bilan to'ladi"""
+        stock = {}
+        with self.get_connection() as conn:
+            for chunk in _in_chunks(product_ids):
+                for row in conn.execute(f"""
+                    SELECT product_id, quantity, reserved_quantity FROM stock_levels
+                    WHERE product_id IN ({_placeholders(chunk)})
+                """, chunk):
+                    stock[row[0]] = (row[1], row[2])
+        return stock
+
+    def get_stock_levels(self, product_ids: Iterable[int]) -> Dict[int, Tuple[int, int]]:
+        """checkStock: {product_id: (quantity, reserved)} keshdan, yo'qlari bazadan"""
+        return self.stock_cache.get_many(product_ids)
+
+    def stock_levels_drift(self) -> List[Dict]:
+        """stock_levels (triggerlar bilan yuritiladigan jami) omborlar yig'indisidan farq qiladigan mahsulotlar"""
+        with self.get_connection() as conn:
+            return [dict(row) for row in conn.execute("""
+                SELECT ids.product_id,
+                       COALESCE(s.quantity, 0) AS quantity, COALESCE(s.reserved_quantity, 0) AS reserved_quantity,
+                       COALESCE(t.quantity, 0) AS warehouse_quantity, COALESCE(t.reserved, 0) AS warehouse_reserved
+                FROM (SELECT product_id FROM stock_levels UNION SELECT product_id FROM inventory) ids
+                LEFT JOIN stock_levels s ON s.product_id = ids.product_id
+                LEFT JOIN (
+                    SELECT product_id, SUM(quantity) AS quantity, SUM(COALESCE(reserved_quantity, 0)) AS reserved
+                    FROM inventory GROUP BY product_id
+                ) t ON t.product_id = ids.product_id
+                WHERE COALESCE(s.quantity, 0) != COALESCE(t.quantity, 0)
+                   OR COALESCE(s.reserved_quantity, 0) != COALESCE(t.reserved, 0)
+            """)]
+
+    def _stock_transaction(self, apply):
+        """
+        apply(conn) -> (natija, stocki o'zgargan product_id lar) ni IMMEDIATE tranzaksiyada bajaradi.
+        O'sha mahsulotlarning yangi jamlari keshga commit dan oldin, yozish qulfi ostida qo'yiladi
+        (tartib commit tartibi bilan bir xil); tranzaksiya (tashqi `with` ichida chaqirilgan bo'lsa —
+        tashqisi) rollback bo'lsa ular keshdan o'chiriladi
+        """
+        def run(conn):
+            result, product_ids = apply(conn)
+            written = list(dict.fromkeys(product_ids))
+            if written:
+                self.pool.after_rollback(partial(self.stock_cache.invalidate, written))
+            levels = []
+            for chunk in _in_chunks(written):
+                levels += [tuple(row) for row in conn.execute(f"""
+                    SELECT product_id, quantity, reserved_quantity FROM stock_levels
+                    WHERE product_id IN ({_placeholders(chunk)})
+                """, chunk)]
+            self.stock_cache.put(levels)
+            return result
+
+        return self.pool.immediate(run)
+
+    # ========================
+    # STOCK RESERVATION
+    # ========================
+    def reserve_stock(self, items: List[Dict], order_id: int = None, ttl: int = None) -> Dict:
+        """
+        Barcha pozitsiyalarni bitta BEGIN IMMEDIATE tranzaksiyada omborlarga taqsimlab bron qiladi.
+        Hammasi yoki hech biri: birortasiga yetmasa hech narsa yozilmaydi.
+        {'shortfalls': [{product_id, requested, free_stock}],
+         'allocations': [{inventory_id, product_id, warehouse_location, quantity}]} — shortfalls bo'sh bo'lsa muvaffaqiyat.
+
+        1. Jami (stock_levels, PK) bo'yicha tekshiruv — stock tugaganda omborlar o'qilmaydi, yozuv yo'q
+        2. Faqat so'ralgan mahsulotlarning bo'sh qoldiqli ombor qatorlari bitta so'rovda -> allocate_warehouses
+        3. Bitta UPDATE ... FROM ombor qatori id si (PK) bo'yicha
+
+        order_id berilsa bron stock_reservations ga yoziladi (ttl soniyadan keyin sweeper qaytaradi)
+        va idempotent: shu buyurtma uchun to'liq faol bron bo'lsa mavjud taqsimot qaytadi. Bron qisman
+        muddati o'tgan / bekor qilingan bo'lsa (qolgan qismi ham qaytariladi) — buyurtma qaytadan bron qilinadi;
+        endi yetmasa eski bron va ledger o'zgarmay qoladi.
+        """
+        requested = stock_request(items)
+        ttl = config.RESERVATION_TTL if ttl is None else ttl
+
+        def reserve(conn):
+            released = []
+            if order_id is not None:
+                rows = conn.execute("""
+                    SELECT inventory_id, quantity, status FROM stock_reservations WHERE order_id = ?
+                """, (order_id,)).fetchall()
+                active = [r for r in rows if r['status'] in ('held', 'committed')]
+                if active and (len(active) == len(rows) or any(r['status'] == 'committed' for r in active)):
+                    return {'shortfalls': [], 'allocations': self._order_allocations(conn, order_id)}, []
+                # Qisman bron taqsimot sifatida qaytmaydi: qolgan 'held' qismi ham bo'shatiladi
+                released = self._release_reserved(
+                    conn, [(r['inventory_id'], r['quantity']) for r in active]
+                )
+                if rows:
+                    conn.execute("DELETE FROM stock_reservations WHERE order_id = ?", (order_id,))
+
+            shortfalls = self._shortfalls(conn, requested)
+            if shortfalls:
+                # Yuqorida bo'shatilgan eski bron va ledger ham qaytariladi
+                raise _Shortfall(shortfalls)
+
+            candidates = []
+            for chunk in _in_chunks([pid for pid, _ in requested]):
+                candidates += [dict(row) for row in conn.execute(f"""
+                    SELECT id, product_id, warehouse_location, quantity - COALESCE(reserved_quantity, 0) AS free
+                    FROM inventory
+                    WHERE product_id IN ({_placeholders(chunk)}) AND quantity - COALESCE(reserved_quantity, 0) > 0
+                """, chunk)]
+            allocations, shortfalls = allocate_warehouses(requested, candidates)
+            if shortfalls:
+                # Jami yetarli, lekin omborlar bo'yicha yetmaydi (stock_levels farqi) — baribir hech narsa yozilmaydi
+                raise _Shortfall(shortfalls)
+
+            pairs = [(a['inventory_id'], a['quantity']) for a in allocations]
+            touched = []
+            for chunk in _chunks(pairs):
+                touched += _update_inventory(conn, f"""
+                    {_request_cte(len(chunk), 'inventory_id')}
+                    UPDATE inventory
+                    SET reserved_quantity = COALESCE(reserved_quantity, 0) + req.qty,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM req
+                    WHERE inventory.id = req.inventory_id
+                      AND inventory.quantity - COALESCE(inventory.reserved_quantity, 0) >= req.qty
+                """, _flat(chunk))
+            if len(touched) != len(pairs):
+                # Qoldiqlar shu tranzaksiya qulfi ostida o'qilgan — bo'lmasligi kerak; hammasi qaytariladi
+                raise ValueError("Ombor qoldig'i taqsimlash davomida o'zgardi")
+
+            if order_id is not None:
+                # Oldingi (bekor qilingan / muddati o'tgan) bron qatorlari yuqorida o'chirilgan
+                conn.executemany("""
+                    INSERT INTO stock_reservations (order_id, product_id, inventory_id, quantity, expires_at)
+                    VALUES (?, ?, ?, ?, datetime('now', ?))
+                """, [(order_id, a['product_id'], a['inventory_id'], a['quantity'], f"+{ttl} seconds")
+                      for a in allocations])
+            return {'shortfalls': [], 'allocations': allocations}, released + touched
+
+        def apply(conn):
+            # Savepoint: tashqi tranzaksiya ichida chaqirilganda ham faqat shu bron yozuvlari qaytariladi
+            conn.execute("SAVEPOINT reserve_stock")
+            try:
+                result = reserve(conn)
+            except _Shortfall as e:
+                conn.execute("ROLLBACK TO reserve_stock")
+                result = {'shortfalls': e.shortfalls, 'allocations': []}, []
+            conn.execute("RELEASE reserve_stock")
+            return result
+
+        return self._stock_transaction(apply)
+
+    def release_stock(self, items: List[Dict]) -> int:
+        """
+        order_id siz qilingan bronni bekor qilish: mahsulot bo'yicha, bron qilingan ombor qatorlaridan
+        (eng ko'p bronlisidan boshlab). Yangilangan qatorlar soni
+        """
+        requested = stock_request(items)
+
+        def apply(conn):
+            by_product: Dict[int, List] = {}
+            for chunk in _in_chunks([pid for pid, _ in requested]):
+                for row in conn.execute(f"""
+                    SELECT id, product_id, reserved_quantity FROM inventory
+                    WHERE product_id IN ({_placeholders(chunk)}) AND reserved_quantity > 0
+                    ORDER BY reserved_quantity DESC, id
+                """, chunk):
+                    by_product.setdefault(row['product_id'], []).append(row)
+            pairs = []
+            for pid, qty in requested:
+                for row in by_product.get(pid, ()):
+                    if qty <= 0:
+                        break
+                    take = min(qty, row['reserved_quantity'])
+                    pairs.append((row['id'], take))
+                    qty -= take
+            touched = self._release_reserved(conn, pairs)
+            return len(touched), touched
+
+        return self._stock_transaction(apply)
+
+    def release_order_stock(self, order_id: int) -> Optional[int]:
+        """
+        Buyurtma bronini qaytarish (bekor qilish). Idempotent: qayta chaqiruv 0 qaytaradi.
+        'held' — reserved_quantity kamayadi; 'committed' (sotilgan) — quantity o'sha omborga qaytadi.
+        Buyurtmaning bron yozuvlari umuman bo'lmasa (ledgerdan oldingi buyurtma) — None
+        """
+        def apply(conn):
+            rows = conn.execute("""
+                SELECT inventory_id, quantity, status FROM stock_reservations WHERE order_id = ?
+            """, (order_id,)).fetchall()
+            if not rows:
+                return None, []
+            rows = [r for r in rows if r['status'] in ('held', 'committed')]
+            held = [(r['inventory_id'], r['quantity']) for r in rows if r['status'] == 'held']
+            committed = [(r['inventory_id'], r['quantity']) for r in rows if r['status'] == 'committed']
+            touched = self._release_reserved(conn, held)
+            for chunk in _chunks(committed):
+                touched += _update_inventory(conn, f"""
+                    {_request_cte(len(chunk), 'inventory_id')}
+                    UPDATE inventory
+                    SET quantity = quantity + req.qty,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM req
+                    WHERE inventory.id = req.inventory_id
+                """, _flat(chunk))
+            conn.execute("""
+                UPDATE stock_reservations SET status = 'released', updated_at = CURRENT_TIMESTAMP
+                WHERE order_id = ? AND status IN ('held', 'committed')
+            """, (order_id,))
+            return len(rows), touched
+
+        return self._stock_transaction(apply)
+
+    def commit_order_stock(self, order_id: int) -> int:
+        """
+        To'langan buyurtma: bron sotuvga aylanadi (o'sha ombordagi quantity va reserved_quantity birga
+        kamayadi), sweeper endi unga tegmaydi. Idempotent. Bronning birorta qatori muddati o'tgan /
+        bekor qilingan bo'lsa — ValueError (buyurtmaning bir qismi sotilmaydi)
+        """
+        def apply(conn):
+            rows = conn.execute("""
+                SELECT inventory_id, quantity, status FROM stock_reservations WHERE order_id = ?
+            """, (order_id,)).fetchall()
+            if any(r['status'] in ('expired', 'released') for r in rows):
+                raise ValueError(f"Bron muddati o'tgan yoki bekor qilingan: order_id={order_id}")
+            held = [(r['inventory_id'], r['quantity']) for r in rows if r['status'] == 'held']
+            touched = []
+            for chunk in _chunks(held):
+                touched += _update_inventory(conn, f"""
+                    {_request_cte(len(chunk), 'inventory_id')}
+                    UPDATE inventory
+                    SET quantity = quantity - req.qty,
+                        reserved_quantity = MAX(COALESCE(reserved_quantity, 0) - req.qty, 0),
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM req
+                    WHERE inventory.id = req.inventory_id
+                """, _flat(chunk))
+            conn.execute("""
+                UPDATE stock_reservations SET status = 'committed', updated_at = CURRENT_TIMESTAMP
+                WHERE order_id = ? AND status = 'held'
+            """, (order_id,))
+            return len(held), touched
+
+        return self._stock_transaction(apply)
+
+    def expire_reservations(self, limit: int = None) -> int:
+        """
+        Muddati o'tgan buyurtmalarning bir paketini (eng eskilari, ko'pi bilan limit ta) qaytaradi —
+        bitta tranzaksiyada, ombor qatori bo'yicha jamlangan bitta UPDATE bilan. Buyurtmaning hamma
+        'held' qatorlari birga: bron paketlar orasida bo'linib, qisman sotilib ketmaydi.
+        Qaytarilgan buyurtmalar soni
+        """
+        limit = limit or config.RESERVATION_SWEEP_BATCH
+
+        def apply(conn):
+            order_ids = [row['order_id'] for row in conn.execute("""
+                SELECT order_id FROM stock_reservations
+                WHERE status = 'held' AND expires_at <= CURRENT_TIMESTAMP
+                GROUP BY order_id
+                ORDER BY MIN(expires_at)
+                LIMIT ?
+            """, (limit,))]
+            if not order_ids:
+                return 0, []
+            rows = []
+            for chunk in _in_chunks(order_ids):
+                rows += conn.execute(f"""
+                    SELECT id, inventory_id, quantity FROM stock_reservations
+                    WHERE status = 'held' AND order_id IN ({_placeholders(chunk)})
+                """, chunk).fetchall()
+            # UPDATE ... FROM bir qatorga bir nechta req mos kelsa faqat bittasini qo'llaydi — avval jamlanadi
+            totals: Dict[int, int] = {}
+            for row in rows:
+                totals[row['inventory_id']] = totals.get(row['inventory_id'], 0) + row['quantity']
+            touched = self._release_reserved(conn, list(totals.items()))
+            for chunk in _in_chunks([row['id'] for row in rows]):
+                conn.execute(f"""
+                    UPDATE stock_reservations SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({_placeholders(chunk)})
+                """, chunk)
+            return len(order_ids), touched
+
+        return self._stock_transaction(apply)
+
+    def reservation_drift(self) -> List[Dict]:
+        """
+        Ombor qatorlaridan reserved_quantity faol bronlar yig'indisidan farq qiladiganlari.
+        order_id siz (eski) bronlar ham farq sifatida ko'rinadi
+        """
+        with self.get_connection() as conn:
+            return [dict(row) for row in conn.execute("""
+                SELECT i.product_id, i.warehouse_location,
+                       COALESCE(i.reserved_quantity, 0) AS reserved_quantity, COALESCE(h.held, 0) AS held
+                FROM inventory i
+                LEFT JOIN (
+                    SELECT inventory_id, SUM(quantity) AS held FROM stock_reservations
+                    WHERE status = 'held' GROUP BY inventory_id
+                ) h ON h.inventory_id = i.id
+                WHERE COALESCE(i.reserved_quantity, 0) != COALESCE(h.held, 0)
+            """)]
+
+    def _order_allocations(self, conn, order_id: int) -> List[Dict]:
+        return [dict(row) for row in conn.execute("""
+            SELECT r.inventory_id, r.product_id, i.warehouse_location, r.quantity
+            FROM stock_reservations r
+            JOIN inventory i ON i.id = r.inventory_id
+            WHERE r.order_id = ? AND r.status IN ('held', 'committed')
+            ORDER BY r.id
+        """, (order_id,))]
+
+    def _release_reserved(self, conn, pairs: List[Tuple[int, int]]) -> List[int]:
+        """[(inventory_id, qty)] — bronni kamaytirish (manfiyga tushmaydi); o'zgargan product_id lar"""
+        touched = []
+        for chunk in _chunks(pairs):
+            touched += _update_inventory(conn, f"""
+                {_request_cte(len(chunk), 'inventory_id')}
+                UPDATE inventory
+                SET reserved_quantity = MAX(COALESCE(reserved_quantity, 0) - req.qty, 0),
+                    updated_at = CURRENT_TIMESTAMP
+                FROM req
+                WHERE inventory.id = req.inventory_id
+            """, _flat(chunk))
+        return touched
+
+    def _shortfalls(self, conn, requested: List[Tuple[int, int]]) -> List[Dict]:
+        """Barcha omborlar jami bo'yicha yetmaydigan pozitsiyalar (stock_levels, PK bo'yicha)"""
+        shortfalls = []
+        for chunk in _chunks(requested):
+            shortfalls += [dict(row) for row in conn.execute(f"""
+                {_request_cte(len(chunk))}
+                SELECT req.product_id, req.qty AS requested,
+                       COALESCE(s.quantity - s.reserved_quantity, 0) AS free_stock
+                FROM req
+                LEFT JOIN stock_levels s ON s.product_id = req.product_id
+                WHERE s.product_id IS NULL OR s.quantity - s.reserved_quantity < req.qty
+            """, _flat(chunk))]
+        return shortfalls
+
+    # ========================
+    # BULK IMPORT / EKSPORT (bulk.py)
+    # ========================
+    def category_index(self) -> Dict[str, int]:
+        """{slug: id} — import yozuvlaridagi kategoriyani tekshirish uchun (bir marta o'qiladi)"""
+        with self.get_connection() as conn:
+            return {row['slug']: row['id'] for row in conn.execute("SELECT id, slug FROM categories")}
+
+    def bulk_upsert_products(self, records: List[Dict]) -> Tuple[int, List[Tuple[int, str]]]:
+        """
+        Tekshirilgan yozuvlar paketi bitta IMMEDIATE tranzaksiyada, har jadvalga executemany bilan:
+        mahsulot slug bo'yicha upsert (faqat yozuvda berilgan ustunlar), attributes / images berilgan bo'lsa
+        almashtiriladi, stock — ombor bo'yicha upsert (bronlarga tegilmaydi; omborning hozirgi bronidan kam
+        qoldiq — free_stock manfiy bo'lardi — yozuv rad etiladi). Yozuv:
+        {'product': {ustun: qiymat}, 'attributes': [(nom, qiymat)] | None,
+         'images': [(url, alt_text, is_main, sort_order)] | None, 'stock': {ombor: miqdor} | None}
+        (yozilganlar soni, rad etilganlar [(paketdagi indeks, sabab)]) qaytadi
+        """
+        def apply(conn):
+            rejected = []
+            # Boshqa mahsulotga tegishli SKU — UNIQUE xatosi butun paketni qaytarmasin, yozuv rad etiladi
+            skus = [r['product'].get('sku') for r in records if r['product'].get('sku')]
+            owners: Dict[str, str] = {}
+            for chunk in _in_chunks(skus):
+                owners.update((row['sku'], row['slug']) for row in conn.execute(
+                    f"SELECT sku, slug FROM products WHERE sku IN ({_placeholders(chunk)})", chunk
+                ))
+            # Bron qilingan ombor qatorlari: quantity bronlardan kam bo'lib qolmasin (tranzaksiya qulfi ostida o'qiladi)
+            reserved: Dict[Tuple[str, str], int] = {}
+            for chunk in _in_chunks([r['product']['slug'] for r in records if r['stock']]):
+                reserved.update(((row['slug'], row['warehouse_location']), row['reserved_quantity']) for row in conn.execute(f"""
+                    SELECT p.slug, i.warehouse_location, i.reserved_quantity
+                    FROM inventory i JOIN products p ON p.id = i.product_id
+                    WHERE p.slug IN ({_placeholders(chunk)}) AND i.reserved_quantity > 0
+                """, chunk))
+            accepted = []
+            for index, record in enumerate(records):
+                sku, slug = record['product'].get('sku'), record['product']['slug']
+                oversold = [
+                    f"{warehouse}: {quantity} < {reserved[(slug, warehouse)]}"
+                    for warehouse, quantity in (record['stock'] or {}).items()
+                    if quantity < reserved.get((slug, warehouse), 0)
+                ]
+                if oversold:
+                    rejected.append((index, f"Qoldiq bron qilingan miqdordan kam ({', '.join(oversold)})"))
+                elif sku and owners.setdefault(sku, slug) != slug:
+                    rejected.append((index, f"SKU boshqa mahsulotda: {sku} ({owners[sku]})"))
+                else:
+                    accepted.append(record)
+
+            # Ustunlar to'plami bo'yicha guruhlab (CSV da bitta guruh) — har guruhga bitta executemany
+            groups: Dict[Tuple[str, ...], List[Dict]] = {}
+            for record in accepted:
+                groups.setdefault(tuple(c for c in BULK_COLUMNS if c in record['product']), []).append(record)
+            for columns, group in groups.items():
+                updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c != 'slug')
+                conn.executemany(f"""
+                    INSERT INTO products ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+                    ON CONFLICT(slug) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP
+                """, [[r['product'][c] for c in columns] for r in group])
+
+            ids: Dict[str, int] = {}
+            for chunk in _in_chunks([r['product']['slug'] for r in accepted]):
+                ids.update((row['slug'], row['id']) for row in conn.execute(
+                    f"SELECT id, slug FROM products WHERE slug IN ({_placeholders(chunk)})", chunk
+                ))
+
+            for table, key, insert in (
+                ('product_attributes', 'attributes',
+                 "INSERT INTO product_attributes (product_id, attribute_name, attribute_value) VALUES (?, ?, ?)"),
+                ('product_images', 'images',
+                 "INSERT INTO product_images (product_id, image_url, alt_text, is_main, sort_order) VALUES (?, ?, ?, ?, ?)"),
+            ):
+                replaced = [r for r in accepted if r[key] is not None]
+                for chunk in _in_chunks([ids[r['product']['slug']] for r in replaced]):
+                    conn.execute(f"DELETE FROM {table} WHERE product_id IN ({_placeholders(chunk)})", chunk)
+                conn.executemany(insert, [
+                    (ids[r['product']['slug']], *row) for r in replaced for row in r[key]
+                ])
+
+            stocked = [r for r in accepted if r['stock'] is not None]
+            conn.executemany("""
+                INSERT INTO inventory (product_id, warehouse_location, quantity, last_restocked)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(product_id, warehouse_location) DO UPDATE SET
+                    quantity = excluded.quantity,
+                    last_restocked = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP
+            """, [(ids[r['product']['slug']], warehouse, quantity)
+                  for r in stocked for warehouse, quantity in r['stock'].items()])
+            # Qoldig'i berilmagan yangi mahsulot — create_product dagidek asosiy omborda 0
+            conn.executemany("""
+                INSERT INTO inventory (product_id, warehouse_location, quantity)
+                SELECT ?, ?, 0 WHERE NOT EXISTS (SELECT 1 FROM inventory WHERE product_id = ?)
+            """, [(ids[r['product']['slug']], DEFAULT_WAREHOUSE, ids[r['product']['slug']])
+                  for r in accepted if r['stock'] is None])
+
+            return (len(accepted), rejected), [ids[r['product']['slug']] for r in stocked]
+
+        return self._stock_transaction(apply)
+
+    def export_columns(self) -> Tuple[List[str], List[str]]:
+        """CSV sarlavhasi uchun: barcha atribut nomlari va omborlar"""
+        with self.get_connection() as conn:
+            attributes = [row[0] for row in conn.execute(
+                "SELECT DISTINCT attribute_name FROM product_attributes ORDER BY attribute_name"
+            )]
+            warehouses = [row[0] for row in conn.execute(
+                "SELECT DISTINCT warehouse_location FROM inventory ORDER BY warehouse_location"
+            )]
+        return attributes, warehouses
+
+    def export_products(self, after_id: int = 0, limit: int = 1000) -> List[Dict]:
+        """
+        id bo'yicha keyset sahifa (faol va nofaol), atributlar, rasmlar va ombor qoldiqlari bilan —
+        har bog'lanishga bitta IN so'rov
+        """
+        with self.get_connection() as conn:
+            products = [dict(row) for row in conn.execute(f"""
+                SELECT p.id, {', '.join(f'p.{c}' for c in BULK_COLUMNS)}, c.slug AS category
+                FROM products p
+                LEFT JOIN categories c ON c.id = p.category_id
+                WHERE p.id > ?
+                ORDER BY p.id
+                LIMIT ?
+            """, (after_id, limit))]
+            stock = self._group_by_product(conn, """
+                SELECT product_id, warehouse_location, quantity
+                FROM inventory WHERE product_id IN ({}) ORDER BY warehouse_location
+            """, [p['id'] for p in products])
+        for product in products:
+            product['stock'] = {row['warehouse_location']: row['quantity'] for row in stock.get(product['id'], [])}
+        return self.load_relations(products, PRODUCT_RELATIONS)
@@ -1,9 +1,14 @@
 # products_service/main.py
 import ssl
 import os
+import sys
 import subprocess
-from http.server import HTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import logs
+from shared.server import create_server
 from api import GraphQLHandler
+from repository import start_reservation_sweeper, stop_reservation_sweeper
 
 # ========================
 # SERTIFIKAT YARATISH (bir marta)
@@ -46,14 +51,12 @@ def run_server():
     # Sertifikat yaratish
     cert_file, key_file = generate_ssl_cert()
 
-    # Server yaratish
-    server = HTTPServer((HOST, PORT), GraphQLHandler)
-
     # SSL sozlash
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     context.load_cert_chain(certfile=cert_file, keyfile=key_file)
 
-    server.socket = context.wrap_socket(server.socket, server_side=True)
+    # Server yaratish (thread pool + TLS)
+    server = create_server((HOST, PORT), GraphQLHandler, context)
 
     # Xizmatni ishga tushirish
     print("=" * 60)
@@ -66,15 +69,19 @@ def run_server():
     print("Xizmatni to'xtatish uchun: Ctrl+C")
     print("=" * 60)
 
+    # To'lanmagan buyurtmalar bronini qaytaradi (fork dan oldin — faqat asosiy processda)
+    start_reservation_sweeper()
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nXizmat to'xtatildi.")
     finally:
+        stop_reservation_sweeper()
         server.server_close()
 
 # ========================
 # ISHGA TUSHIRISH
 # ========================
 if __name__ == '__main__':
+    logs.setup('products')
     run_server()
\ No newline at end of file
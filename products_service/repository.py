@@ -1,11 +1,14 @@
 # products_service/repository.py
-from db import ProductDatabase
-from typing import List, Dict, Optional, Any
+from db import ProductDatabase, PRODUCT_RELATIONS, fts_query
+from typing import List, Dict, Optional, Any, Iterable
 import logging
+import threading
+
+from shared import config
+from shared.pagination import connection, decode_cursor, page_size
 
-# Logging sozlash
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+_sweeper_stop = threading.Event()
 
 # Global DB instance
 db = ProductDatabase()
@@ -75,19 +78,28 @@ def create_product(
         logger.error(f"Mahsulot yaratishda xato: {e}")
         raise ValueError("Mahsulot yaratib bo'lmadi")
 
-def get_product(product_id: int) -> Optional[Dict]:
+def get_product(product_id: int, relations: Iterable[str] = PRODUCT_RELATIONS) -> Optional[Dict]:
     """
-    To'liq mahsulot ma'lumoti: atributlar, rasmlar, stock
+    To'liq mahsulot ma'lumoti: atributlar, rasmlar (relations — faqat so'ralganlari), stock
     """
-    return db.get_product_by_id(product_id)
+    return db.get_product_by_id(product_id, relations)
 
-def get_products_by_ids(product_ids: List[int]) -> List[Dict]:
+def get_products_by_ids(product_ids: List[int], relations: Iterable[str] = ()) -> List[Optional[Dict]]:
     """
-    Bir nechta mahsulotni ID bo'yicha olish
+    Bir nechta mahsulotni ID bo'yicha olish (bitta so'rov).
+    Natija product_ids tartibida, topilmagan o'rinda None
     """
     if not product_ids:
         return []
-    return db.get_products_by_ids(product_ids)  # db.py ga qo'shiladi
+    found = {p['id']: p for p in db.get_products_by_ids(product_ids, relations)}
+    return [found.get(pid) for pid in product_ids]
+
+def get_relations_by_product_ids(name: str, product_ids: List[int]) -> List[List[Dict]]:
+    """
+    Bitta bog'lanish (attributes / images) bir nechta mahsulot uchun — product_ids tartibida
+    """
+    products = db.load_relations([{'id': pid} for pid in product_ids], (name,))
+    return [p[name] for p in products]
 
 # ========================
 # ATTRIBUTE & IMAGE
@@ -119,103 +131,143 @@ def add_product_image(
 # ========================
 def check_stock(items: List[Dict]) -> List[Dict]:
     """
-    Stockni tekshirish (free_stock = quantity - reserved)
+    Stockni tekshirish (free_stock = quantity - reserved). Qoldiqlar stock keshidan —
+    issiq mahsulotlar uchun bazaga murojaat yo'q, qolganlari bitta IN so'rov bilan
     """
+    stock = db.get_stock_levels(item['product_id'] for item in items if item['quantity'] > 0)
     results = []
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        for item in items:
-            pid = item['product_id']
-            qty = item['quantity']
-            if qty <= 0:
-                results.append({
-                    'product_id': pid,
-                    'available': 0,
-                    'reserved': 0,
-                    'free_stock': 0,
-                    'requested': qty,
-                    'in_stock': False,
-                    'message': "Miqdor nol yoki manfiy"
-                })
-                continue
-
-            cursor.execute("""
-                SELECT quantity, COALESCE(reserved_quantity, 0) as reserved 
-                FROM inventory WHERE product_id = ?
-            """, (pid,))
-            row = cursor.fetchone()
-            available = row['quantity'] if row else 0
-            reserved = row['reserved'] if row else 0
-            free_stock = available - reserved
-            in_stock = free_stock >= qty
-
+    for item in items:
+        pid = item['product_id']
+        qty = item['quantity']
+        if qty <= 0:
             results.append({
                 'product_id': pid,
-                'available': available,
-                'reserved': reserved,
-                'free_stock': free_stock,
+                'available': 0,
+                'reserved': 0,
+                'free_stock': 0,
                 'requested': qty,
-                'in_stock': in_stock,
-                'message': f"{free_stock} dona mavjud" if not in_stock else "Yeterli"
+                'in_stock': False,
+                'message': "Miqdor nol yoki manfiy"
             })
+            continue
+
+        available, reserved = stock[pid]
+        free_stock = available - reserved
+        in_stock = free_stock >= qty
+
+        results.append({
+            'product_id': pid,
+            'available': available,
+            'reserved': reserved,
+            'free_stock': free_stock,
+            'requested': qty,
+            'in_stock': in_stock,
+            'message': f"{free_stock} dona mavjud" if not in_stock else "Yeterli"
+        })
     return results
 
-def reserve_stock(items: List[Dict]) -> bool:
+def try_reserve_stock(items: List[Dict], order_id: int = None, ttl_seconds: int = None) -> Dict:
     """
-    Buyurtma uchun stockni bron qilish (transaction bilan)
+    Bron qilishga urinish: hammasi yoki hech biri.
+    Yetmagan har bir pozitsiya shortfalls da (product_id, requested, free_stock),
+    muvaffaqiyatda allocations — qaysi ombordan qancha (product_id, warehouse_location, quantity).
+    order_id bilan — stock_reservations ga yoziladi, idempotent, ttl_seconds dan keyin qaytariladi
     """
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            for item in items:
-                pid = item['product_id']
-                qty = item['quantity']
-                cursor.execute("""
-                    UPDATE inventory 
-                    SET reserved_quantity = reserved_quantity + ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE product_id = ? 
-                      AND (quantity - reserved_quantity) >= ?
-                """, (qty, pid, qty))
-                if cursor.rowcount == 0:
-                    raise ValueError(f"Stock yetarli emas: product_id={pid}")
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Stock bron qilishda xato: {e}")
-            raise
-
-def release_stock(items: List[Dict]) -> bool:
+    if ttl_seconds is not None and ttl_seconds <= 0:
+        raise ValueError("ttl_seconds musbat bo'lishi kerak")
+    try:
+        result = db.reserve_stock(items, order_id=order_id, ttl=ttl_seconds)
+    except Exception as e:
+        logger.error(f"Stock bron qilishda xato: {e}")
+        raise
+    return {'success': not result['shortfalls'], **result}
+
+def reserve_stock(items: List[Dict], order_id: int = None, ttl_seconds: int = None) -> bool:
     """
-    Bronni bekor qilish
+    Buyurtma uchun stockni bron qilish (bitta IMMEDIATE tranzaksiya, raqobatda qayta urinish)
     """
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            for item in items:
-                pid = item['product_id']
-                qty = item['quantity']
-                cursor.execute("""
-                    UPDATE inventory 
-                    SET reserved_quantity = GREATEST(reserved_quantity - ?, 0),
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE product_id = ?
-                """, (qty, pid))
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Stock bekor qilishda xato: {e}")
-            raise
-
-def update_stock_admin(product_id: int, new_quantity: int) -> bool:
+    result = try_reserve_stock(items, order_id, ttl_seconds)
+    if not result['success']:
+        details = ", ".join(
+            f"product_id={s['product_id']} ({s['free_stock']}/{s['requested']})" for s in result['shortfalls']
+        )
+        raise ValueError(f"Stock yetarli emas: {details}")
+    return True
+
+def release_stock(items: Optional[List[Dict]] = None, order_id: int = None) -> bool:
+    """
+    Bronni bekor qilish. order_id bilan — shu buyurtmaning bronlari (idempotent); buyurtmaning
+    bron yozuvlari bo'lmasa (order_id siz qilingan eski bron) — items bo'yicha
+    """
+    if order_id is None and not items:
+        raise ValueError("items yoki order_id kerak")
+    try:
+        released = db.release_order_stock(order_id) if order_id is not None else None
+        if released is None and items:
+            db.release_stock(items)
+        return True
+    except Exception as e:
+        logger.error(f"Stock bekor qilishda xato: {e}")
+        raise
+
+def commit_stock(order_id: int) -> bool:
+    """To'langan buyurtma: bron sotuvga aylanadi (TTL endi qo'llanmaydi). Idempotent"""
+    db.commit_order_stock(order_id)
+    return True
+
+def get_reservation_drift() -> List[Dict]:
+    return db.reservation_drift()
+
+def get_warehouse_stock(product_id: int) -> List[Dict]:
+    return db.get_warehouse_stock(product_id)
+
+def get_stock_levels_drift() -> List[Dict]:
+    return db.stock_levels_drift()
+
+def get_stock_cache_stats(verify: bool = False) -> Dict:
+    """Stock keshi metrikalari; verify=True — avval keshdagi hamma yozuvlar bazaga solishtiriladi"""
+    mismatched = db.stock_cache.verify() if verify else []
+    return {**db.stock_cache.stats(), 'mismatched': mismatched}
+
+# ========================
+# RESERVATION SWEEPER
+# ========================
+def expire_reservations() -> int:
+    """Muddati o'tgan barcha bronlarni qisqa tranzaksiyalar (buyurtmalar paketi) bilan qaytaradi"""
+    total = 0
+    while True:
+        expired = db.expire_reservations(config.RESERVATION_SWEEP_BATCH)
+        total += expired
+        if expired < config.RESERVATION_SWEEP_BATCH:
+            return total
+
+def start_reservation_sweeper(interval: float = None) -> threading.Thread:
+    """Fon thread: har interval soniyada muddati o'tgan bronlarni qaytaradi (main.py dan bir marta)"""
+    interval = config.RESERVATION_SWEEP_INTERVAL if interval is None else interval
+
+    def run():
+        while not _sweeper_stop.wait(interval):
+            try:
+                expired = expire_reservations()
+                if expired:
+                    logger.info(f"Muddati o'tgan buyurtma bronlari qaytarildi: {expired}")
+            except Exception as e:
+                logger.error(f"Bron sweeper xatosi: {e}")
+
+    thread = threading.Thread(target=run, name="reservation-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+def stop_reservation_sweeper():
+    _sweeper_stop.set()
+
+def update_stock_admin(product_id: int, new_quantity: int, warehouse_location: Optional[str] = None) -> bool:
     """
-    Admin tomonidan stockni o'zgartirish
+    Admin tomonidan stockni o'zgartirish (ombor ko'rsatilmasa — asosiy ombor)
     """
     if new_quantity < 0:
         raise ValueError("Stock miqdori manfiy bo'lishi mumkin emas")
-    return db.update_stock(product_id, new_quantity)
+    return db.update_stock(product_id, new_quantity, warehouse_location)
 
 # ========================
 # SEARCH & UTILS
@@ -227,11 +279,11 @@ def get_low_stock_products(threshold: int = 10) -> List[Dict]:
     with db.get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT p.id, p.name, p.sku, i.quantity, COALESCE(i.reserved_quantity, 0) as reserved
-            FROM products p
-            JOIN inventory i ON p.id = i.product_id
-            WHERE (i.quantity - COALESCE(i.reserved_quantity, 0)) <= ? AND p.is_active = 1
-            ORDER BY (i.quantity - COALESCE(i.reserved_quantity, 0))
+            SELECT p.id, p.name, p.sku, s.quantity, s.reserved_quantity
+            FROM stock_levels s
+            JOIN products p ON p.id = s.product_id
+            WHERE (s.quantity - s.reserved_quantity) <= ? AND p.is_active = 1
+            ORDER BY (s.quantity - s.reserved_quantity)
         """, (threshold,))
         return [dict(row) for row in cursor.fetchall()]
 
@@ -242,52 +294,52 @@ def search_products(
     max_price: Optional[float] = None,
     in_stock_only: bool = False,
     limit: int = 20,
-    offset: int = 0
+    offset: int = 0,
+    relations: Iterable[str] = ('attributes',)
 ) -> List[Dict]:
     """
-    Qidiruv + filter
+    Qidiruv (FTS5 indeks, BM25) + filter. Atribut/rasmlar butun natija uchun bitta so'rovda (relations bo'yicha)
     """
-    sql = """
-        SELECT p.*, c.name as category_name, 
-               i.quantity, COALESCE(i.reserved_quantity, 0) as reserved_quantity
-        FROM products p
-        LEFT JOIN categories c ON p.category_id = c.id
-        LEFT JOIN inventory i ON p.id = i.product_id
-        WHERE p.is_active = 1
+    products = db.search_products(
+        query=query,
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock_only,
+        limit=limit,
+        offset=offset
+    )
+    return db.load_relations(products, relations)
+
+def list_products(
+    first: Optional[int] = None,
+    after: Optional[str] = None,
+    query: Optional[str] = None,
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock_only: bool = False,
+    relations: Iterable[str] = ('attributes',)
+) -> Dict:
+    """
+    Katalog / qidiruv sahifasi (Relay connection, keyset cursor).
+    Matnli qidiruvda tartib (search_rank, id), matnsiz — (created_at, id) kamayish bo'yicha
     """
-    params = []
-    conditions = []
-
-    if query:
-        conditions.append("(p.name LIKE ? OR p.description LIKE ? OR p.sku LIKE ?)")
-        params.extend([f"%{query}%"] * 3)
-    if category_id:
-        conditions.append("p.category_id = ?")
-        params.append(category_id)
-    if min_price is not None:
-        conditions.append("p.price >= ?")
-        params.append(min_price)
-    if max_price is not None:
-        conditions.append("p.price <= ?")
-        params.append(max_price)
-    if in_stock_only:
-        conditions.append("(i.quantity - COALESCE(i.reserved_quantity, 0)) > 0")
-
-    if conditions:
-        sql += " AND " + " AND ".join(conditions)
-
-    sql += " ORDER BY p.created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    size = page_size(first)
+    if fts_query(query):
+        key = lambda p: (p['search_rank'], p['id'])
+    else:
+        key = lambda p: (p['created_at'], p['id'])
 
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
-        products = []
-        for row in rows:
-            p = dict(row)
-            pid = p['id']
-            cursor.execute("SELECT attribute_name, attribute_value FROM product_attributes WHERE product_id = ?", (pid,))
-            p['attributes'] = [dict(r) for r in cursor.fetchall()]
-            products.append(p)
-        return products
\ No newline at end of file
+    products = db.search_products(
+        query=query,
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock_only=in_stock_only,
+        limit=size + 1,
+        after=decode_cursor(after, 2)
+    )
+    # Bog'lanishlar faqat sahifadagilar uchun (hasNextPage uchun o'qilgan ortiqcha qatorga emas)
+    db.load_relations(products[:size], relations)
+    return connection(products, size, key, after)
@@ -5,14 +5,53 @@ from graphql import (
     GraphQLInputObjectType, GraphQLInputField, GraphQLBoolean,
     GraphQLArgument
 )
+from functools import partial
+
+from shared.dataloader import DataLoader
+from shared.pagination import connection_type
+from shared.selection import requested
+from db import PRODUCT_RELATIONS
 from repository import (
     create_category, get_category, get_categories,
-    create_product, get_product, get_products_by_ids,
+    create_product, get_products_by_ids, get_relations_by_product_ids,
     add_product_attribute, add_product_image,
-    check_stock, reserve_stock, release_stock,
-    update_stock_admin, get_low_stock_products, search_products
+    check_stock, reserve_stock, try_reserve_stock, release_stock, commit_stock, get_reservation_drift,
+    get_stock_cache_stats, get_warehouse_stock, get_stock_levels_drift,
+    update_stock_admin, get_low_stock_products, search_products, list_products
 )
 
+# ========================
+# DATALOADERS (har bir so'rov uchun context ichida)
+# ========================
+def loaders(info) -> dict:
+    """
+    product / productsByIds va ichki atribut/rasmlar so'rov davomida
+    bitta batch SQL ga birlashadi
+    """
+    context = info.context
+    result = context.get('loaders')
+    if result is None:
+        result = {
+            'product': DataLoader(get_products_by_ids),
+            **{name: DataLoader(partial(get_relations_by_product_ids, name)) for name in PRODUCT_RELATIONS},
+        }
+        context['loaders'] = result
+    return result
+
+async def resolve_product(_, info, id):
+    return await loaders(info)['product'].load(id)
+
+async def resolve_products_by_ids(_, info, ids):
+    return await loaders(info)['product'].load_many(ids)
+
+def relation_resolver(name: str):
+    """Oldindan yuklangan bo'lsa (search) o'shani, aks holda loader orqali"""
+    def resolve(product, info):
+        if name in product:
+            return product[name]
+        return loaders(info)[name].load(product['id'])
+    return resolve
+
 # ========================
 # TYPES
 # ========================
@@ -49,6 +88,73 @@ StockCheckResultType = GraphQLObjectType('StockCheckResult', {
     'message': GraphQLField(GraphQLString),
 })
 
+StockShortfallType = GraphQLObjectType('StockShortfall', {
+    'product_id': GraphQLField(GraphQLInt),
+    'requested': GraphQLField(GraphQLInt),
+    'free_stock': GraphQLField(GraphQLInt),
+})
+
+StockAllocationType = GraphQLObjectType('StockAllocation', {
+    'product_id': GraphQLField(GraphQLInt),
+    'warehouse_location': GraphQLField(GraphQLString),
+    'quantity': GraphQLField(GraphQLInt),
+})
+
+StockReservationType = GraphQLObjectType('StockReservation', {
+    'success': GraphQLField(GraphQLBoolean),
+    'shortfalls': GraphQLField(GraphQLList(StockShortfallType)),
+    'allocations': GraphQLField(GraphQLList(StockAllocationType)),
+})
+
+ReservationDriftType = GraphQLObjectType('ReservationDrift', {
+    'product_id': GraphQLField(GraphQLInt),
+    'warehouse_location': GraphQLField(GraphQLString),
+    'reserved_quantity': GraphQLField(GraphQLInt),
+    'held': GraphQLField(GraphQLInt),
+})
+
+WarehouseStockType = GraphQLObjectType('WarehouseStock', {
+    'warehouse_location': GraphQLField(GraphQLString),
+    'quantity': GraphQLField(GraphQLInt),
+    'reserved_quantity': GraphQLField(GraphQLInt),
+    'free_stock': GraphQLField(GraphQLInt),
+    'last_restocked': GraphQLField(GraphQLString),
+    'updated_at': GraphQLField(GraphQLString),
+})
+
+StockLevelDriftType = GraphQLObjectType('StockLevelDrift', {
+    'product_id': GraphQLField(GraphQLInt),
+    'quantity': GraphQLField(GraphQLInt),
+    'reserved_quantity': GraphQLField(GraphQLInt),
+    'warehouse_quantity': GraphQLField(GraphQLInt),
+    'warehouse_reserved': GraphQLField(GraphQLInt),
+})
+
+StockCacheMismatchType = GraphQLObjectType('StockCacheMismatch', {
+    'product_id': GraphQLField(GraphQLInt),
+    'cached_quantity': GraphQLField(GraphQLInt),
+    'cached_reserved': GraphQLField(GraphQLInt),
+    'quantity': GraphQLField(GraphQLInt),
+    'reserved': GraphQLField(GraphQLInt),
+})
+
+StockCacheStatsType = GraphQLObjectType('StockCacheStats', {
+    'enabled': GraphQLField(GraphQLBoolean),
+    'size': GraphQLField(GraphQLInt),
+    'maxsize': GraphQLField(GraphQLInt),
+    'ttl': GraphQLField(GraphQLFloat),
+    'hits': GraphQLField(GraphQLInt),
+    'misses': GraphQLField(GraphQLInt),
+    'expired': GraphQLField(GraphQLInt),
+    'hit_rate': GraphQLField(GraphQLFloat),
+    'writes': GraphQLField(GraphQLInt),
+    'invalidations': GraphQLField(GraphQLInt),
+    'evictions': GraphQLField(GraphQLInt),
+    'verified': GraphQLField(GraphQLInt),
+    'mismatches': GraphQLField(GraphQLInt),
+    'mismatched': GraphQLField(GraphQLList(StockCacheMismatchType)),
+})
+
 LowStockProductType = GraphQLObjectType('LowStockProduct', {
     'id': GraphQLField(GraphQLInt),
     'name': GraphQLField(GraphQLString),
@@ -79,10 +185,12 @@ ProductType = GraphQLObjectType('Product', {
     'warranty_months': GraphQLField(GraphQLInt),
     'created_at': GraphQLField(GraphQLString),
     'updated_at': GraphQLField(GraphQLString),
-    'attributes': GraphQLField(GraphQLList(AttributeType)),
-    'images': GraphQLField(GraphQLList(ImageType)),
+    'attributes': GraphQLField(GraphQLList(AttributeType), resolve=relation_resolver('attributes')),
+    'images': GraphQLField(GraphQLList(ImageType), resolve=relation_resolver('images')),
 })
 
+ProductConnectionType = connection_type(ProductType)
+
 # ========================
 # INPUT TYPES
 # ========================
@@ -132,6 +240,8 @@ StockItemInput = GraphQLInputObjectType('StockItemInput', {
 StockUpdateInput = GraphQLInputObjectType('StockUpdateInput', {
     'product_id': GraphQLInputField(GraphQLNonNull(GraphQLInt)),
     'quantity': GraphQLInputField(GraphQLNonNull(GraphQLInt)),
+    # Ko'rsatilmasa — asosiy ombor; yangi ombor nomi bo'lsa qatori yaratiladi
+    'warehouse_location': GraphQLInputField(GraphQLString),
 })
 
 SearchInput = GraphQLInputObjectType('SearchInput', {
@@ -161,12 +271,12 @@ Query = GraphQLObjectType('Query', {
     'product': GraphQLField(
         ProductType,
         args={'id': GraphQLNonNull(GraphQLInt)},
-        resolve=lambda _, info, id: get_product(id)
+        resolve=resolve_product
     ),
     'productsByIds': GraphQLField(
         GraphQLList(ProductType),
         args={'ids': GraphQLNonNull(GraphQLList(GraphQLNonNull(GraphQLInt)))},
-        resolve=lambda _, info, ids: get_products_by_ids(ids)
+        resolve=resolve_products_by_ids
     ),
     'checkStock': GraphQLField(
         GraphQLList(StockCheckResultType),
@@ -178,10 +288,47 @@ Query = GraphQLObjectType('Query', {
         args={'threshold': GraphQLInt},
         resolve=lambda _, info, threshold=10: get_low_stock_products(threshold)
     ),
+    # reserved_quantity faol bronlar yig'indisiga teng bo'lmagan mahsulotlar (nazorat uchun)
+    'reservationDrift': GraphQLField(
+        GraphQLList(ReservationDriftType),
+        resolve=lambda *_: get_reservation_drift()
+    ),
+    # Mahsulot qoldig'i omborlar bo'yicha
+    'warehouseStock': GraphQLField(
+        GraphQLList(WarehouseStockType),
+        args={'product_id': GraphQLArgument(GraphQLNonNull(GraphQLInt))},
+        resolve=lambda _, info, product_id: get_warehouse_stock(product_id)
+    ),
+    # stock_levels jamlari omborlar yig'indisiga teng bo'lmagan mahsulotlar (nazorat uchun)
+    'stockLevelsDrift': GraphQLField(
+        GraphQLList(StockLevelDriftType),
+        resolve=lambda *_: get_stock_levels_drift()
+    ),
+    # checkStock keshi metrikalari; verify: true — keshdagi yozuvlar bazaga solishtiriladi
+    'stockCache': GraphQLField(
+        StockCacheStatsType,
+        args={'verify': GraphQLArgument(GraphQLBoolean, default_value=False)},
+        resolve=lambda _, info, verify=False: get_stock_cache_stats(verify)
+    ),
     'search': GraphQLField(
         GraphQLList(ProductType),
         args={'input': SearchInput},
-        resolve=lambda _, info, input={}: search_products(**input)
+        resolve=lambda _, info, input={}: search_products(**input, relations=requested(info, PRODUCT_RELATIONS))
+    ),
+    'products': GraphQLField(
+        ProductConnectionType,
+        args={
+            'first': GraphQLArgument(GraphQLInt),
+            'after': GraphQLArgument(GraphQLString),
+            'query': GraphQLArgument(GraphQLString),
+            'category_id': GraphQLArgument(GraphQLInt),
+            'min_price': GraphQLArgument(GraphQLFloat),
+            'max_price': GraphQLArgument(GraphQLFloat),
+            'in_stock_only': GraphQLArgument(GraphQLBoolean),
+        },
+        resolve=lambda _, info, **args: list_products(
+            **args, relations=requested(info, PRODUCT_RELATIONS, path=('edges', 'node'))
+        )
     ),
 })
 
@@ -189,6 +336,13 @@ Query = GraphQLObjectType('Query', {
 # MUTATION
 # ========================
 
+# reserveStock / tryReserveStock: order_id bilan bron stock_reservations ga yoziladi (idempotent, TTL)
+RESERVE_ARGS = {
+    'items': GraphQLArgument(GraphQLNonNull(GraphQLList(GraphQLNonNull(StockItemInput)))),
+    'order_id': GraphQLArgument(GraphQLInt),
+    'ttl_seconds': GraphQLArgument(GraphQLInt),
+}
+
 Mutation = GraphQLObjectType('Mutation', {
     # === CATEGORY ===
     'createCategory': GraphQLField(
@@ -219,18 +373,36 @@ Mutation = GraphQLObjectType('Mutation', {
     # === STOCK ===
     'reserveStock': GraphQLField(
         GraphQLBoolean,
-        args={'items': GraphQLNonNull(GraphQLList(GraphQLNonNull(StockItemInput)))},
-        resolve=lambda _, info, items: reserve_stock(items)
+        args=RESERVE_ARGS,
+        resolve=lambda _, info, **args: reserve_stock(**args)
+    ),
+    # Xato o'rniga natija: qaysi pozitsiyalarga qancha yetmadi
+    'tryReserveStock': GraphQLField(
+        StockReservationType,
+        args=RESERVE_ARGS,
+        resolve=lambda _, info, **args: try_reserve_stock(**args)
     ),
+    # order_id bilan — buyurtma bronlari (idempotent); items faqat order_id siz eski bronlar uchun
     'releaseStock': GraphQLField(
         GraphQLBoolean,
-        args={'items': GraphQLNonNull(GraphQLList(GraphQLNonNull(StockItemInput)))},
-        resolve=lambda _, info, items: release_stock(items)
+        args={
+            'items': GraphQLArgument(GraphQLList(GraphQLNonNull(StockItemInput))),
+            'order_id': GraphQLArgument(GraphQLInt),
+        },
+        resolve=lambda _, info, **args: release_stock(**args)
+    ),
+    # To'lovdan keyin: bron sotuvga aylanadi, TTL endi qo'llanmaydi
+    'commitStock': GraphQLField(
+        GraphQLBoolean,
+        args={'order_id': GraphQLArgument(GraphQLNonNull(GraphQLInt))},
+        resolve=lambda _, info, order_id: commit_stock(order_id)
     ),
     'updateStock': GraphQLField(
         GraphQLBoolean,
         args={'input': GraphQLNonNull(StockUpdateInput)},
-        resolve=lambda _, info, input: update_stock_admin(**input)
+        resolve=lambda _, info, input: update_stock_admin(
+            input['product_id'], input['quantity'], input.get('warehouse_location')
+        )
     ),
 })
 
@@ -0,0 +1,185 @@
+# products_service/stock_cache.py
+"""
+checkStock uchun process ichidagi qoldiq keshi: product_id -> (quantity, reserved).
+
+- Write-through: stockni o'zgartiradigan har bir yozuv (create_product / reserve / release / commit /
+  expire / update_stock / bulk import) yangi qiymatlarni UPDATE ... RETURNING dan oladi va keshga
+  tranzaksiya ichida, commit dan oldin qo'yadi. Yozuvchilar BEGIN IMMEDIATE qulfi bilan ketma-ket — keshga qo'yish
+  tartibi commit tartibi bilan bir xil. Tranzaksiya (tashqi `with` ichida bo'lsa — tashqisi)
+  rollback bo'lsa yozuvlar o'chiriladi
+- Kesh o'tkazib yuborgan (miss) mahsulotlar bitta IN so'rov bilan o'qiladi
+- Boshqa processlar (prefork) va tashqi skriptlar yozuvlari STOCK_CACHE_TTL soniyagacha ko'rinmaydi.
+  checkStock maslahat xarakterida: bronning o'zi (reserve_stock) doim bazada tekshiriladi
+- Tekshiruv rejimi: STOCK_CACHE_VERIFY_RATE ulush hitlar bazadan qayta o'qilib solishtiriladi,
+  verify() — keshdagi hamma yozuvlar; farq topilsa yozuv o'chiriladi va mismatches oshadi
+"""
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from shared import config
+
+logger = logging.getLogger("StockCache")
+
+# (quantity, reserved)
+Stock = Tuple[int, int]
+# Bazadan o'qish: product_id lar -> {product_id: (quantity, reserved)} (inventory yozuvi yo'qlar tushib qoladi)
+Loader = Callable[[List[int]], Dict[int, Stock]]
+
+MISSING: Stock = (0, 0)
+
+
+class StockCache:
+    def __init__(self, loader: Loader, ttl: float = None, maxsize: int = None, verify_rate: float = None):
+        self.loader = loader
+        self.ttl = config.STOCK_CACHE_TTL if ttl is None else ttl
+        self.maxsize = max(1, maxsize or config.STOCK_CACHE_MAX_SIZE)
+        self.verify_rate = config.STOCK_CACHE_VERIFY_RATE if verify_rate is None else verify_rate
+        self.enabled = config.STOCK_CACHE_ENABLED
+        self._lock = threading.Lock()
+        # product_id -> (quantity, reserved, yuklangan vaqt, yozuv tartib raqami)
+        self._entries: Dict[int, Tuple[int, int, float, int]] = {}
+        # Har bir put / invalidate da oshadi: o'qish davomida yozilgan qiymatni eski o'qish bosmasin
+        self._seq = 0
+        self._invalidated_seq = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.writes = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.verified = 0
+        self.mismatches = 0
+
+    # ========================
+    # O'QISH
+    # ========================
+    def get_many(self, product_ids: Iterable[int]) -> Dict[int, Stock]:
+        """{product_id: (quantity, reserved)}; inventory yozuvi yo'q mahsulot — (0, 0)"""
+        ids = list(dict.fromkeys(product_ids))
+        if not self.enabled:
+            loaded = self.loader(ids)
+            return {pid: loaded.get(pid, MISSING) for pid in ids}
+
+        result: Dict[int, Stock] = {}
+        missing: List[int] = []
+        now = time.monotonic()
+        with self._lock:
+            for pid in ids:
+                entry = self._entries.get(pid)
+                if entry is None:
+                    missing.append(pid)
+                    self.misses += 1
+                elif now - entry[2] > self.ttl:
+                    missing.append(pid)
+                    self.expired += 1
+                else:
+                    result[pid] = entry[:2]
+                    self.hits += 1
+            start_seq = self._seq
+
+        if missing:
+            loaded = self.loader(missing)
+            fresh = {pid: loaded.get(pid, MISSING) for pid in missing}
+            result.update(fresh)
+            self._fill(fresh, start_seq)
+        if self.verify_rate > 0:
+            sample = [pid for pid in ids if pid not in missing and random.random() < self.verify_rate]
+            if sample:
+                self._verify(sample, {pid: result[pid] for pid in sample})
+        return result
+
+    def _fill(self, stock: Dict[int, Stock], start_seq: int):
+        now = time.monotonic()
+        with self._lock:
+            if self._invalidated_seq > start_seq:
+                return
+            for pid, (quantity, reserved) in stock.items():
+                entry = self._entries.get(pid)
+                if entry is not None and entry[3] > start_seq:
+                    continue
+                self._store(pid, quantity, reserved, now)
+
+    # ========================
+    # YOZISH (tranzaksiya ichida, commit dan oldin)
+    # ========================
+    def put(self, rows: Sequence[Tuple[int, int, int]]):
+        """[(product_id, quantity, reserved)] — UPDATE ... RETURNING natijasi"""
+        if not self.enabled or not rows:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for pid, quantity, reserved in rows:
+                self._seq += 1
+                self._entries.pop(pid, None)
+                self._store(pid, quantity, reserved or 0, now)
+                self.writes += 1
+
+    def invalidate(self, product_ids: Iterable[int] = None):
+        """Berilgan (None — hamma) yozuvlarni o'chirish: keyingi o'qish bazadan"""
+        with self._lock:
+            self._seq += 1
+            self._invalidated_seq = self._seq
+            if product_ids is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            for pid in product_ids:
+                if self._entries.pop(pid, None) is not None:
+                    self.invalidations += 1
+
+    def _store(self, pid: int, quantity: int, reserved: int, now: float):
+        self._entries[pid] = (quantity, reserved, now, self._seq)
+        if len(self._entries) > self.maxsize:
+            # dict tartibi — eng avval yozilgani chiqadi (put yozuvni oxiriga o'tkazadi)
+            del self._entries[next(iter(self._entries))]
+            self.evictions += 1
+
+    # ========================
+    # TEKSHIRUV
+    # ========================
+    def verify(self) -> List[Dict]:
+        """Keshdagi barcha yozuvlarni bazaga solishtiradi; farqlar ro'yxati (o'sha yozuvlar o'chiriladi)"""
+        with self._lock:
+            cached = {pid: entry[:2] for pid, entry in self._entries.items()}
+        return self._verify(list(cached), cached)
+
+    def _verify(self, ids: List[int], cached: Dict[int, Stock]) -> List[Dict]:
+        actual = self.loader(ids)
+        diffs = []
+        for pid in ids:
+            real = actual.get(pid, MISSING)
+            if cached[pid] != real:
+                diffs.append({
+                    'product_id': pid,
+                    'cached_quantity': cached[pid][0], 'cached_reserved': cached[pid][1],
+                    'quantity': real[0], 'reserved': real[1],
+                })
+        with self._lock:
+            self.verified += len(ids)
+            self.mismatches += len(diffs)
+        if diffs:
+            logger.warning("Stock keshi bazadan farq qildi: %s", [d['product_id'] for d in diffs])
+            self.invalidate(d['product_id'] for d in diffs)
+        return diffs
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses + self.expired
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'writes': self.writes,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'verified': self.verified,
+                'mismatches': self.mismatches,
+            }
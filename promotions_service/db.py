@@ -1,33 +1,47 @@
 # promotions_service/db.py
-import sqlite3
-from contextlib import contextmanager
 from typing import Optional, List, Dict
 import os
 import logging
+from shared.db_pool import get_pool
+from shared.migrations import Migration, migrate
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PromoDB")
 
+# Boshlang'ich sxemadan keyingi o'zgarishlar (shared/migrations.py)
+MIGRATIONS = (
+    Migration(1, 'flash_sales_window_index', (
+        # Faol aksiyalar: is_active = 1 AND start_time <= now AND end_time >= now
+        "CREATE INDEX IF NOT EXISTS idx_flash_sales_window ON flash_sales(is_active, start_time, end_time)",
+    )),
+)
+
+# Tez-tez ishlaydigan so'rovlar — `python -m shared.migrations` to'liq o'qishga tekshiradi
+HOT_QUERIES = {
+    'promo_by_code': ("SELECT * FROM promo_codes WHERE code = ? AND is_active = 1", ('SALE',)),
+    'active_flash_sales': ("""
+        SELECT discount_percent, product_ids FROM flash_sales
+        WHERE is_active = 1 AND start_time <= CURRENT_TIMESTAMP AND end_time >= CURRENT_TIMESTAMP
+    """, ()),
+    'user_points': ("SELECT points FROM user_points WHERE user_id = ?", (1,)),
+    'gift_card_by_code': ("SELECT * FROM gift_cards WHERE code = ? AND is_active = 1", ('GIFT',)),
+}
+
 class PromotionsDatabase:
     def __init__(self, db_path: str = 'promotions.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(
+            self.db_path,
+            pragmas=(('foreign_keys', 'ON'),),
+            journal_mode='WAL',
+            timeout=15.0
+        )
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=15.0)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        conn.execute("PRAGMA journal_mode = WAL;")
-        try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"DB xato: {e}")
-            raise
-        finally:
-            conn.close()
+        """
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
+        """
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -130,4 +144,7 @@ class PromotionsDatabase:
                 ('Silver', 1000, 1.1),
                 ('Gold', 5000, 1.2),
                 ('Platinum', 20000, 1.5)
-            ])
\ No newline at end of file
+            ])
+
+            # Migrations
+            migrate(conn, MIGRATIONS)
\ No newline at end of file
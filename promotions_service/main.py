@@ -1,16 +1,16 @@
 # cart_service/main.py
 import ssl
 import os
+import sys
 import subprocess
 import logging
-from http.server import HTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import logs
+from shared.server import create_server
 from api import GraphQLHandler
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s',
-    datefmt='%H:%M:%S'
-)
+logs.setup('promotions')
 logger = logging.getLogger("CartService")
 
 def generate_ssl_cert():
@@ -40,10 +40,9 @@ def run():
     PORT = 8452
     cert_file, key_file = generate_ssl_cert()
 
-    server = HTTPServer((HOST, PORT), GraphQLHandler)
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     context.load_cert_chain(certfile=cert_file, keyfile=key_file)
-    server.socket = context.wrap_socket(server.socket, server_side=True)
+    server = create_server((HOST, PORT), GraphQLHandler, context)
 
     banner = f"""
 ╔══════════════════════════════════════════════════════════╗
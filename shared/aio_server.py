@@ -0,0 +1,212 @@
+# shared/aio_server.py
+"""
+Asyncio asosidagi HTTP/1.1 + TLS server.
+
+Har bir ulanish bitta coroutine: keep-alive ulanishlar thread egallamaydi,
+shuning uchun bitta process minglab ochiq ulanishni ushlab tura oladi.
+So'rovlar GraphQLApp.handle_async() orqali graphql-core async executorida bajariladi.
+"""
+import asyncio
+import logging
+import ssl
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+
+from shared import config
+from shared.graphql_app import GraphQLApp
+from shared.serializer import JSON_CONTENT_TYPE, Body
+
+logger = logging.getLogger("AsyncServer")
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class AsyncGraphQLServer:
+    """
+    create_server() bilan bir xil interfeys: serve_forever() / server_close().
+    """
+
+    def __init__(self, server_address: Tuple[str, int], app: GraphQLApp, ssl_context: Optional[ssl.SSLContext] = None):
+        self.server_address = server_address
+        self.app = app
+        self.ssl_context = ssl_context
+        self._server = None
+        self._loop = None
+        self._connections = 0
+        self._requests = 0
+        self._rejected = 0
+
+    # ========================
+    # LIFECYCLE
+    # ========================
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    def shutdown(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    def server_close(self):
+        self.shutdown()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        # Sinxron resolverlar (SQLite, requests) shu pool'da ishlaydi
+        self._loop.set_default_executor(ThreadPoolExecutor(
+            max_workers=config.SERVER_WORKERS, thread_name_prefix="graphql-exec"
+        ))
+        host, port = self.server_address
+        self._server = await asyncio.start_server(
+            self._handle_connection,
+            host, port,
+            ssl=self.ssl_context,
+            ssl_handshake_timeout=config.SERVER_HANDSHAKE_TIMEOUT if self.ssl_context else None,
+            backlog=config.ASYNC_BACKLOG,
+            reuse_address=True
+        )
+        logger.info(f"Asyncio server: {host}:{port} (max ulanish: {config.ASYNC_MAX_CONNECTIONS})")
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict:
+        return {
+            'connections': self._connections,
+            'requests': self._requests,
+            'rejected': self._rejected,
+        }
+
+    # ========================
+    # CONNECTION
+    # ========================
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self._connections >= config.ASYNC_MAX_CONNECTIONS:
+            self._rejected += 1
+            writer.close()
+            return
+
+        self._connections += 1
+        peer = writer.get_extra_info('peername') or ('-', 0)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), config.KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except _BadRequest as e:
+                    await self._write(writer, e.status, self.app.encode(self.app.error_payload(e.message)),
+                                      keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, version, headers, body = request
+                keep_alive = self._keep_alive(version, headers)
+                self._requests += 1
+
+                status, content, content_headers = await self._dispatch(method, path, headers, body, peer[0])
+                if not isinstance(content, bytes) and version == 'HTTP/1.0':
+                    # HTTP/1.0 klientlar chunked transferni bilmaydi
+                    content = b''.join(content)
+                await self._write(writer, status, content, content_headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+    async def _dispatch(self, method: str, path: str, headers: Dict, body: bytes, client_ip: str):
+        if method == 'GET' and path == '/' and self.app.index_html:
+            return 200, self.app.index_html.encode('utf-8'), {'Content-Type': 'text/html; charset=utf-8'}
+        if method == 'POST' and path == '/graphql':
+            status, payload = await self.app.handle_async(body, client_ip)
+        elif path == '/graphql':
+            status, payload = 405, self.app.error_payload("Faqat POST")
+        else:
+            status, payload = 404, self.app.error_payload("Endpoint topilmadi")
+        content, content_headers = self.app.render(payload, headers.get('accept-encoding'))
+        return status, content, content_headers
+
+    # ========================
+    # HTTP/1.1 PARSING
+    # ========================
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        except ValueError:
+            raise _BadRequest(400, "Noto'g'ri so'rov qatori")
+
+        headers = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = raw.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise _BadRequest(411, "Content-Length kerak")
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise _BadRequest(400, "Noto'g'ri Content-Length")
+        if length > config.MAX_BODY_SIZE:
+            raise _BadRequest(413, "So'rov juda katta")
+
+        body = await reader.readexactly(length) if length > 0 else b''
+        return method.upper(), target.split('?', 1)[0], version.upper(), headers, body
+
+    @staticmethod
+    def _keep_alive(version: str, headers: Dict) -> bool:
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    async def _write(self, writer: asyncio.StreamWriter, status: int, body: Body,
+                     headers: Dict[str, str] = None, keep_alive: bool = True):
+        """body bytes — Content-Length bilan, iterator — chunked transfer bilan"""
+        headers = headers or {'Content-Type': JSON_CONTENT_TYPE}
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        streaming = not isinstance(body, bytes)
+        if streaming:
+            lines.append("Transfer-Encoding: chunked")
+        else:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={int(config.KEEPALIVE_TIMEOUT)}")
+        if self.app.cors:
+            lines.append("Access-Control-Allow-Origin: *")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+        if not streaming:
+            writer.write(head + body)
+            await writer.drain()
+            return
+
+        writer.write(head)
+        for chunk in body:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                # Sekin klient xotirani to'ldirmasligi uchun har bo'lakdan keyin kutamiz
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
@@ -1 +1,167 @@
-.
+# shared/config.py
+"""
+Barcha xizmatlar uchun umumiy sozlamalar.
+Qiymatlar environment o'zgaruvchilaridan o'qiladi, aks holda default ishlatiladi.
+"""
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# ========================
+# HTTP SERVER
+# ========================
+# single   — eski xatti-harakat: bitta so'rov bir vaqtda
+# threaded — cheklangan thread pool + navbat (default)
+# prefork  — bir nechta process, har birida thread pool (faqat Unix)
+# asyncio  — bitta event loop, har bir ulanish coroutine (keep-alive uchun)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'threaded').strip().lower()
+SERVER_WORKERS = _env_int('SERVER_WORKERS', 16)
+SERVER_QUEUE_SIZE = _env_int('SERVER_QUEUE_SIZE', 64)
+# Navbat to'lganda accept qancha kutadi (backpressure), keyin ulanish rad etiladi
+SERVER_QUEUE_TIMEOUT = _env_float('SERVER_QUEUE_TIMEOUT', 2.0)
+SERVER_PROCESSES = _env_int('SERVER_PROCESSES', os.cpu_count() or 2)
+# Sekin klient TLS handshake bilan workerni band qilib qo'ymasligi uchun
+SERVER_HANDSHAKE_TIMEOUT = _env_float('SERVER_HANDSHAKE_TIMEOUT', 5.0)
+# Keep-alive ulanish shuncha soniya bo'sh tursa yopiladi (bo'sh ulanish workerni band qilmaydi)
+KEEPALIVE_TIMEOUT = _env_float('KEEPALIVE_TIMEOUT', 15.0)
+# Process boshiga bo'sh kutayotgan keep-alive ulanishlar; oshsa eng eskisi yopiladi
+KEEPALIVE_MAX_IDLE = _env_int('KEEPALIVE_MAX_IDLE', 1000)
+# So'rov boshlangandan keyin sekin klient (qator / header / tana) workerni shuncha soniya ushlaydi
+REQUEST_READ_TIMEOUT = _env_float('REQUEST_READ_TIMEOUT', 5.0)
+# So'rov tanasining maksimal hajmi (bayt)
+MAX_BODY_SIZE = _env_int('MAX_BODY_SIZE', 1024 * 1024)
+
+# ========================
+# GRAPHQL
+# ========================
+# Parse + validate qilingan hujjatlar keshi (so'rov matni hash'i bo'yicha)
+DOCUMENT_CACHE_SIZE = _env_int('DOCUMENT_CACHE_SIZE', 256)
+# Persisted queries: gateway saqlaydigan hash -> matn yozuvlari soni
+APQ_STORE_SIZE = _env_int('APQ_STORE_SIZE', 1024)
+# Ichki klientlar avval faqat hash yuboradi (0 — har doim to'liq matn)
+APQ_CLIENT_ENABLED = os.environ.get('APQ_CLIENT_ENABLED', '1').strip().lower() not in ('0', 'false', 'no')
+# Batch: bitta POST da JSON massiv ko'rinishidagi operatsiyalar
+BATCH_MAX_SIZE = _env_int('BATCH_MAX_SIZE', 20)
+# Mutatsiyasiz batch operatsiyalari parallel bajariladi (mutatsiya bo'lsa — doim ketma-ket)
+BATCH_PARALLEL = os.environ.get('BATCH_PARALLEL', '1').strip().lower() not in ('0', 'false', 'no')
+BATCH_WORKERS = _env_int('BATCH_WORKERS', 8)
+
+# ========================
+# JAVOB KODLASH
+# ========================
+# auto — orjson o'rnatilgan bo'lsa o'sha, aks holda stdlib json; json / orjson — majburiy
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto').strip().lower()
+# Faqat debug uchun: indent=2 bilan chiroyli chiqish
+JSON_PRETTY = os.environ.get('JSON_PRETTY', '0').strip().lower() in ('1', 'true', 'yes')
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', '1').strip().lower() not in ('0', 'false', 'no')
+# Bundan kichik javoblar siqilmaydi (foydadan ko'ra CPU qimmat)
+COMPRESS_MIN_SIZE = _env_int('COMPRESS_MIN_SIZE', 1024)
+COMPRESS_LEVEL_GZIP = _env_int('COMPRESS_LEVEL_GZIP', 6)
+COMPRESS_LEVEL_BR = _env_int('COMPRESS_LEVEL_BR', 5)
+# data ichidagi ro'yxat shuncha elementdan oshsa javob chunked oqim bilan yoziladi (0 — o'chiq)
+STREAM_MIN_ITEMS = _env_int('STREAM_MIN_ITEMS', 1000)
+STREAM_CHUNK_SIZE = _env_int('STREAM_CHUNK_SIZE', 64 * 1024)
+
+# ========================
+# SQLITE
+# ========================
+# Har bir ulanishdagi tayyorlangan (prepared) so'rovlar keshi
+DB_STATEMENT_CACHE_SIZE = _env_int('DB_STATEMENT_CACHE_SIZE', 256)
+# ConnectionPool.immediate(): qulf band bo'lsa qayta urinishlar soni va kutish (soniya, jitter bilan)
+DB_LOCK_RETRIES = _env_int('DB_LOCK_RETRIES', 5)
+DB_LOCK_BACKOFF = _env_float('DB_LOCK_BACKOFF', 0.01)
+DB_LOCK_BACKOFF_MAX = _env_float('DB_LOCK_BACKOFF_MAX', 0.5)
+
+# ========================
+# WRITE-BEHIND (shared/write_behind.py)
+# ========================
+# 0 — activity/audit log va hisoblagichlar eskicha: so'rov ichida, darhol
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '1').strip().lower() not in ('0', 'false', 'no')
+# Shuncha yozuv yig'ilsa yoki eng eskisi shuncha soniya kutsa — bitta tranzaksiyada yoziladi
+WRITE_BEHIND_BATCH_SIZE = _env_int('WRITE_BEHIND_BATCH_SIZE', 500)
+WRITE_BEHIND_FLUSH_INTERVAL = _env_float('WRITE_BEHIND_FLUSH_INTERVAL', 1.0)
+# Bufer to'lsa (baza uzoq band) yangi yozuvlar tashlanadi — so'rov hech qachon kutmaydi
+WRITE_BEHIND_MAX_PENDING = _env_int('WRITE_BEHIND_MAX_PENDING', 50000)
+
+# ========================
+# STOCK RESERVATION (products_service)
+# ========================
+# Buyurtma broni shuncha soniyada to'lanmasa (commit qilinmasa) sweeper stockni qaytaradi
+RESERVATION_TTL = _env_int('RESERVATION_TTL', 900)
+RESERVATION_SWEEP_INTERVAL = _env_float('RESERVATION_SWEEP_INTERVAL', 30.0)
+# Bitta tranzaksiyada qaytariladigan buyurtma bronlari (qulf qisqa tursin); ko'p bo'lsa ketma-ket paketlar
+RESERVATION_SWEEP_BATCH = _env_int('RESERVATION_SWEEP_BATCH', 500)
+# checkStock keshi (products_service/stock_cache.py): 0 — har tekshiruv bazadan
+STOCK_CACHE_ENABLED = os.environ.get('STOCK_CACHE_ENABLED', '1').strip().lower() not in ('0', 'false', 'no')
+# Boshqa process / tashqi skript yozuvlari shuncha soniyadan keyin ko'rinadi (o'z yozuvlari — darhol)
+STOCK_CACHE_TTL = _env_float('STOCK_CACHE_TTL', 2.0)
+STOCK_CACHE_MAX_SIZE = _env_int('STOCK_CACHE_MAX_SIZE', 100000)
+# Tekshiruv rejimi: hitlarning shu ulushi bazadan qayta o'qilib solishtiriladi (0 — o'chiq)
+STOCK_CACHE_VERIFY_RATE = _env_float('STOCK_CACHE_VERIFY_RATE', 0.0)
+
+# ========================
+# BULK IMPORT / EKSPORT (products_service/bulk.py)
+# ========================
+# Bitta tranzaksiyada yoziladigan yozuvlar (checkpoint ham har paketdan keyin)
+BULK_BATCH_SIZE = _env_int('BULK_BATCH_SIZE', 5000)
+BULK_EXPORT_BATCH = _env_int('BULK_EXPORT_BATCH', 1000)
+
+# ========================
+# PAGINATION
+# ========================
+# Connection maydonlari (first/after): first berilmasa va eng ko'pi
+PAGE_DEFAULT_SIZE = _env_int('PAGE_DEFAULT_SIZE', 20)
+PAGE_MAX_SIZE = _env_int('PAGE_MAX_SIZE', 100)
+
+# ========================
+# LOGGING
+# ========================
+# Servis bo'yicha: LOG_LEVEL_<SERVIS> (LOG_LEVEL_ORDERS=DEBUG) shu qiymatni bosib ketadi
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').strip().upper()
+# text | json
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').strip().lower()
+# Navbat to'lsa yangi yozuvlar tashlanadi — so'rov hech qachon logni kutmaydi
+LOG_QUEUE_SIZE = _env_int('LOG_QUEUE_SIZE', 10000)
+# Query / variables / javob qaysi ulush so'rovlar uchun yoziladi (0 — hech qachon, 1 — har doim)
+LOG_PAYLOAD_SAMPLE_RATE = _env_float('LOG_PAYLOAD_SAMPLE_RATE', 0.01)
+
+# ========================
+# HTTP CLIENT (xizmatlar orasida)
+# ========================
+# Har bir upstream uchun maksimal ochiq ulanishlar
+HTTP_POOL_MAXSIZE = _env_int('HTTP_POOL_MAXSIZE', 10)
+# Pool to'lsa: True — bo'shashini kutadi, False — vaqtinchalik ortiqcha ulanish ochadi
+HTTP_POOL_BLOCK = os.environ.get('HTTP_POOL_BLOCK', '1').strip().lower() not in ('0', 'false', 'no')
+HTTP_TIMEOUT = _env_float('HTTP_TIMEOUT', 5.0)
+# Xizmatlar orasida (localhost) siqish CPU ni behuda sarflaydi
+HTTP_ACCEPT_ENCODING = os.environ.get('HTTP_ACCEPT_ENCODING', 'identity')
+
+# ========================
+# API GATEWAY
+# ========================
+# Marshrut qarorlari keshi (query hash bo'yicha)
+GATEWAY_ROUTE_CACHE_SIZE = _env_int('GATEWAY_ROUTE_CACHE_SIZE', 512)
+# Ishlamayotgan xizmat sxemasini qayta so'rash oralig'i (soniya)
+GATEWAY_REFRESH_INTERVAL = _env_float('GATEWAY_REFRESH_INTERVAL', 10.0)
+GATEWAY_INTROSPECTION_TIMEOUT = _env_float('GATEWAY_INTROSPECTION_TIMEOUT', 2.0)
+# Subquerylarni parallel yuboradigan threadlar soni
+GATEWAY_FANOUT_WORKERS = _env_int('GATEWAY_FANOUT_WORKERS', 32)
+
+# ========================
+# ASYNCIO SERVER
+# ========================
+ASYNC_MAX_CONNECTIONS = _env_int('ASYNC_MAX_CONNECTIONS', 10000)
+ASYNC_BACKLOG = _env_int('ASYNC_BACKLOG', 1024)
@@ -0,0 +1,117 @@
+# shared/dataloader.py
+"""
+So'rov ichidagi DataLoader: bitta event loop qadamida yig'ilgan load(key) lar
+bitta batch chaqiruvga (masalan, bitta `WHERE id IN (...)`) birlashtiriladi.
+
+Har bir GraphQL so'rov uchun yangi loader (context ichida) — kesh so'rovlar orasida bo'linmaydi.
+Resolver async bo'lishi kerak (graphql-core async executor), aks holda batch qilinmaydi:
+loop ishlamayotgan joyda load() kalitni darhol, alohida yuklaydi.
+Sinxron batch funksiya (SQLite so'rovi) executor threadda chaqiriladi — event loop to'xtamaydi.
+"""
+import asyncio
+import inspect
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+
+BatchLoadFn = Callable[[List[Hashable]], Sequence[Any]]
+
+
+class DataLoader:
+    def __init__(self, batch_load_fn: BatchLoadFn, max_batch_size: int = 0, cache: bool = True):
+        """
+        batch_load_fn(keys) -> qiymatlar keys tartibida, bir xil uzunlikda (topilmasa None).
+        Sinxron yoki async bo'lishi mumkin.
+        """
+        self.batch_load_fn = batch_load_fn
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Tuple[Hashable, asyncio.Future]] = []
+        self._scheduled = False
+        self.batches = 0
+        self.keys_loaded = 0
+
+    # ========================
+    # LOAD
+    # ========================
+    def load(self, key: Hashable):
+        if self.cache and key in self._futures:
+            return self._futures[key]
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._load_now(key)
+
+        future = loop.create_future()
+        if self.cache:
+            self._futures[key] = future
+        self._queue.append((key, future))
+        if not self._scheduled:
+            # Joriy qadamdagi barcha load() lar navbatga tushgandan keyin bitta batch
+            self._scheduled = True
+            loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return future
+
+    def load_many(self, keys: Sequence[Hashable]):
+        return asyncio.gather(*(self.load(key) for key in keys))
+
+    def prime(self, key: Hashable, value: Any):
+        """Boshqa so'rovdan kelgan tayyor qiymatni keshga qo'yish"""
+        if not self.cache or key in self._futures:
+            return
+        try:
+            future = asyncio.get_running_loop().create_future()
+        except RuntimeError:
+            return
+        future.set_result(value)
+        self._futures[key] = future
+
+    def clear(self, key: Hashable = None):
+        if key is None:
+            self._futures.clear()
+        else:
+            self._futures.pop(key, None)
+
+    # ========================
+    # DISPATCH
+    # ========================
+    async def _dispatch(self):
+        queue, self._queue = self._queue, []
+        self._scheduled = False
+        size = self.max_batch_size or len(queue)
+        for start in range(0, len(queue), size):
+            await self._dispatch_batch(queue[start:start + size])
+
+    async def _dispatch_batch(self, batch: List[Tuple[Hashable, asyncio.Future]]):
+        keys = [key for key, _ in batch]
+        try:
+            values = await self._call(keys)
+        except Exception as e:
+            for key, future in batch:
+                self._futures.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), value in zip(batch, values):
+            if not future.done():
+                future.set_result(value)
+
+    async def _call(self, keys: List[Hashable]) -> Sequence[Any]:
+        if inspect.iscoroutinefunction(self.batch_load_fn):
+            values = self.batch_load_fn(keys)
+        else:
+            values = await asyncio.get_running_loop().run_in_executor(None, self.batch_load_fn, keys)
+        if inspect.isawaitable(values):
+            values = await values
+        self.batches += 1
+        self.keys_loaded += len(keys)
+        if len(values) != len(keys):
+            raise ValueError(f"DataLoader: {len(keys)} ta kalit uchun {len(values)} ta qiymat qaytdi")
+        return values
+
+    def _load_now(self, key: Hashable) -> Any:
+        values = self.batch_load_fn([key])
+        if inspect.isawaitable(values):
+            raise RuntimeError("Async batch funksiya event loopsiz chaqirildi")
+        self.batches += 1
+        self.keys_loaded += 1
+        return values[0]
@@ -0,0 +1,225 @@
+# shared/db_pool.py
+"""
+SQLite ulanishlari uchun umumiy pool.
+
+Har bir `with db.get_connection()` da yangi sqlite3.connect + PRAGMA o'rniga:
+- har bir thread uchun bitta ulanish (sqlite3 ulanishi threadlar orasida bo'linmaydi)
+- PRAGMA lar ulanish ochilganda bir marta; journal_mode (fayl xususiyati) — pool uchun bir marta
+- cached_statements — tayyorlangan (prepared) so'rovlar ulanish ichida qayta ishlatiladi
+- ichma-ich `with get_connection()` bitta tranzaksiya: commit/rollback faqat eng tashqi darajada
+- after_commit(): eng tashqi commit dan keyin bajariladigan callback (rollback bo'lsa tashlanadi),
+  after_rollback(): eng tashqi tranzaksiya rollback bo'lganda (masalan, kesh yozuvlarini o'chirish)
+- fork dan keyin (prefork) ota processning ulanishlari ishlatilmaydi
+- immediate(): yozish qulfi boshida olinadigan tranzaksiya, band bo'lsa jitterli backoff bilan qayta urinish
+"""
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from shared import config
+
+logger = logging.getLogger("DBPool")
+
+_pools: Dict[str, "ConnectionPool"] = {}
+_pools_lock = threading.Lock()
+
+T = TypeVar('T')
+
+
+def is_lock_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class _ThreadState(threading.local):
+    conn: Optional[sqlite3.Connection] = None
+    depth: int = 0
+    on_commit: Optional[List[Callable[[], None]]] = None
+    on_rollback: Optional[List[Callable[[], None]]] = None
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        db_path: str,
+        pragmas: Tuple[Tuple[str, str], ...] = (),
+        journal_mode: Optional[str] = None,
+        timeout: float = 5.0,
+        cached_statements: int = None
+    ):
+        self.db_path = db_path
+        self.name = os.path.basename(db_path)
+        self.pragmas = tuple(pragmas)
+        self.journal_mode = journal_mode
+        self.timeout = timeout
+        self.cached_statements = cached_statements or config.DB_STATEMENT_CACHE_SIZE
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = _ThreadState()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._journal_ready = False
+        self.opened = 0
+        self.reused = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.lock_retries = 0
+
+    # ========================
+    # CONNECTION
+    # ========================
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Tranzaksiya: eng tashqi `with` oxirida commit, xato bo'lsa rollback.
+        Ichki `with` lar shu ulanish va shu tranzaksiyada ishlaydi.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        state = self._local
+        if state.conn is None:
+            state.conn = self._open()
+        elif state.depth == 0:
+            self.reused += 1
+
+        conn = state.conn
+        state.depth += 1
+        try:
+            yield conn
+            if state.depth == 1:
+                conn.commit()
+                self.commits += 1
+                state.on_rollback = None
+        except Exception as e:
+            if state.depth == 1:
+                conn.rollback()
+                self.rollbacks += 1
+                state.on_commit = None
+                logger.error("DB tranzaksiya xatosi (%s): %s", self.name, e)
+                callbacks, state.on_rollback = state.on_rollback or [], None
+                for fn in callbacks:
+                    fn()
+            raise
+        finally:
+            state.depth -= 1
+        if state.depth == 0 and state.on_commit:
+            callbacks, state.on_commit = state.on_commit, None
+            for fn in callbacks:
+                fn()
+
+    def after_commit(self, fn: Callable[[], None]):
+        """
+        fn() shu threadning eng tashqi tranzaksiyasi commit bo'lgandan keyin chaqiriladi
+        (rollback bo'lsa — chaqirilmaydi). Tranzaksiya ochiq bo'lmasa — darhol
+        """
+        state = self._local
+        if state.depth == 0:
+            fn()
+            return
+        if state.on_commit is None:
+            state.on_commit = []
+        state.on_commit.append(fn)
+
+    def after_rollback(self, fn: Callable[[], None]):
+        """fn() shu threadning eng tashqi tranzaksiyasi rollback bo'lsa chaqiriladi (tranzaksiya ochiq bo'lmasa — hech qachon)"""
+        state = self._local
+        if state.depth == 0:
+            return
+        if state.on_rollback is None:
+            state.on_rollback = []
+        state.on_rollback.append(fn)
+
+    def immediate(self, fn: Callable[[sqlite3.Connection], T], retries: int = None) -> T:
+        """
+        fn(conn) ni BEGIN IMMEDIATE tranzaksiyasida bajaradi va commit qiladi.
+        Deferred tranzaksiyada SHARED -> RESERVED ko'tarilishi raqobatda busy handlerni
+        kutmasdan "database is locked" beradi; IMMEDIATE da qulf boshida (busy timeout bilan) olinadi.
+        Qulf baribir olinmasa — tranzaksiya boshidan, jitterli eksponensial kutish bilan qayta.
+        Tashqi `with connection()` ichida chaqirilsa — o'sha tranzaksiyada, qayta urinishsiz.
+        """
+        retries = config.DB_LOCK_RETRIES if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                with self.connection() as conn:
+                    if self._local.depth > 1:
+                        return fn(conn)
+                    conn.execute("BEGIN IMMEDIATE")
+                    return fn(conn)
+            except sqlite3.OperationalError as e:
+                if self._local.depth > 0 or not is_lock_error(e) or attempt >= retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.lock_retries += 1
+                # Full jitter: raqobatchilar bir vaqtda qaytib, yana to'qnashmasligi uchun
+                delay = min(config.DB_LOCK_BACKOFF_MAX, config.DB_LOCK_BACKOFF * (2 ** attempt))
+                time.sleep(random.uniform(0, delay))
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        if self.journal_mode and not self._journal_ready:
+            with self._lock:
+                if not self._journal_ready:
+                    conn.execute(f"PRAGMA journal_mode = {self.journal_mode};")
+                    self._journal_ready = True
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value};")
+        with self._lock:
+            self._connections[threading.get_ident()] = conn
+            self.opened += 1
+        return conn
+
+    def close_all(self):
+        """Barcha ochiq ulanishlarni yopish (faqat to'xtash paytida — boshqa threadlar ishlamayotganda)"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._connections.clear()
+            self._local = _ThreadState()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'db': self.name,
+                'open': len(self._connections),
+                'opened': self.opened,
+                'reused': self.reused,
+                'commits': self.commits,
+                'rollbacks': self.rollbacks,
+                'lock_retries': self.lock_retries,
+                'cached_statements': self.cached_statements,
+            }
+
+
+def get_pool(db_path: str, **kwargs) -> ConnectionPool:
+    """
+    Bitta fayl uchun bitta pool — bir xil bazaning bir nechta *Database obyekti
+    ham bitta thread ulanishini (va tranzaksiyasini) ishlatadi.
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key, **kwargs)
+            _pools[key] = pool
+        return pool
+
+
+def stats() -> Dict[str, Dict]:
+    with _pools_lock:
+        return {pool.name: pool.stats() for pool in _pools.values()}
@@ -0,0 +1,93 @@
+# shared/document_cache.py
+"""
+Parse + validate qilingan GraphQL hujjatlar keshi.
+
+Klientlar bir xil operatsiyalarni qayta-qayta yuboradi — har safar lex/parse/validate
+qilish o'rniga natija query matni hash'i bo'yicha LRU keshda saqlanadi.
+Xatoli so'rovlar ham keshlanadi (natija deterministik).
+Kalit APQ hash'i bilan bir xil — persisted query hujjati shu yerdan olinadi.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from graphql import DocumentNode, GraphQLError, GraphQLSchema, parse, validate
+
+from shared import config
+from shared.persisted_queries import query_hash
+
+CacheEntry = Tuple[Optional[DocumentNode], Optional[List[GraphQLError]]]
+
+
+class DocumentCache:
+    def __init__(self, maxsize: int = None):
+        self.maxsize = max(1, maxsize or config.DOCUMENT_CACHE_SIZE)
+        self._entries: "OrderedDict[Tuple[int, str], CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, schema: GraphQLSchema, query: str) -> CacheEntry:
+        """
+        (document, None) — tayyor hujjat, yoki (None, errors) — parse/validate xatolari
+        """
+        key = (id(schema), query_hash(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = self._prepare(schema, query)
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def lookup(self, schema: GraphQLSchema, sha: str) -> Optional[CacheEntry]:
+        """Persisted query: hujjat faqat hash bo'yicha (topilmasa None)"""
+        key = (id(schema), sha)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    @staticmethod
+    def _prepare(schema: GraphQLSchema, query: str) -> CacheEntry:
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            return None, [e]
+        errors = validate(schema, document)
+        if errors:
+            return None, errors
+        return document, None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# Bitta process ichidagi barcha handlerlar uchun umumiy kesh
+document_cache = DocumentCache()
@@ -0,0 +1,314 @@
+# shared/graphql_app.py
+"""
+Transportdan mustaqil /graphql endpoint.
+Bir xil kod ham thread pool (BaseHTTPRequestHandler), ham asyncio server ichida ishlaydi.
+"""
+import asyncio
+import inspect
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from graphql import ExecutionResult, GraphQLError, GraphQLSchema, OperationType, execute, get_operation_ast
+
+from shared import config, logs, persisted_queries
+from shared.document_cache import DocumentCache, document_cache
+from shared.serializer import Body, serializer
+
+
+class GraphQLRequestError(Exception):
+    """So'rovni bajarishdan oldingi xato (HTTP status bilan)"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class GraphQLApp:
+    def __init__(
+        self,
+        schema: GraphQLSchema,
+        name: str,
+        index_html: Optional[str] = None,
+        context: Optional[Dict] = None,
+        cors: bool = False,
+        log_payloads: bool = False,
+        cache: DocumentCache = None
+    ):
+        self.schema = schema
+        self.name = name
+        self.index_html = index_html
+        self.context = context or {}
+        self.cors = cors
+        self.log_payloads = log_payloads
+        self.document_cache = cache or document_cache
+        self.logger = logging.getLogger(f"{name.capitalize()}API")
+
+    # ========================
+    # REQUEST PARSING
+    # ========================
+    def parse_body(self, raw: bytes) -> Union[Dict, List]:
+        """
+        Bitta operatsiya (dict) yoki batch (list). Batch elementlari
+        alohida tekshiriladi — bittasi xato bo'lsa qolganlari bajariladi.
+        """
+        if not raw:
+            raise GraphQLRequestError(400, "Bo'sh so'rov")
+        try:
+            data = json.loads(raw.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            self.logger.error("JSON xatosi: %s", e)
+            raise GraphQLRequestError(400, "Noto'g'ri JSON format")
+        if isinstance(data, list):
+            if not data:
+                raise GraphQLRequestError(400, "Bo'sh batch")
+            if len(data) > config.BATCH_MAX_SIZE:
+                raise GraphQLRequestError(400, f"Batch juda katta (maksimum {config.BATCH_MAX_SIZE})")
+            return data
+        # Bitta operatsiya — tekshiruv _handle_operation ichida
+        return data
+
+    def validate_operation(self, data: Any) -> Dict:
+        if not isinstance(data, dict):
+            raise GraphQLRequestError(400, "Noto'g'ri so'rov formati")
+        query = data.get('query')
+        if query is not None and not isinstance(query, str):
+            raise GraphQLRequestError(400, "Noto'g'ri so'rov formati")
+        try:
+            sha = persisted_queries.extract_hash(data)
+            if query and sha:
+                persisted_queries.verify(query, sha)
+        except persisted_queries.PersistedQueryError as e:
+            raise GraphQLRequestError(e.status, e.message)
+        if not query and not sha:
+            raise GraphQLRequestError(400, "GraphQL query bo'sh")
+        return data
+
+    def build_context(self, client_ip: str = None, request: Any = None) -> Dict:
+        """Har bir so'rov uchun yangi context (mutable qiymatlar so'rovlar orasida bo'linmaydi)"""
+        context = dict(self.context)
+        context['client_ip'] = client_ip
+        if request is not None:
+            context['request'] = request
+        return context
+
+    # ========================
+    # EXECUTION
+    # ========================
+    def _prepare(self, request_data: Dict):
+        """Parse + validate (keshdan). Xato bo'lsa tayyor ExecutionResult qaytaradi"""
+        query = request_data.get('query')
+        if query:
+            document, errors = self.document_cache.get(self.schema, query)
+        else:
+            # APQ: faqat hash keldi — hujjat keshda bo'lmasa klient to'liq matnni qayta yuboradi
+            entry = self.document_cache.lookup(self.schema, persisted_queries.extract_hash(request_data))
+            if entry is None:
+                error = GraphQLError(
+                    persisted_queries.PERSISTED_QUERY_NOT_FOUND_MESSAGE,
+                    extensions={'code': persisted_queries.PERSISTED_QUERY_NOT_FOUND}
+                )
+                return None, ExecutionResult(data=None, errors=[error])
+            document, errors = entry
+        if errors:
+            return None, ExecutionResult(data=None, errors=errors)
+        return document, None
+
+    def _execute(self, document, request_data: Dict, context: Dict, middleware=None):
+        return execute(
+            self.schema,
+            document,
+            variable_values=request_data.get('variables') or {},
+            operation_name=request_data.get('operationName'),
+            context_value=context,
+            middleware=middleware
+        )
+
+    def execute(self, request_data: Dict, context: Dict) -> ExecutionResult:
+        """
+        Sinxron bajarish (thread pool worker ichida).
+        Async resolverlar bo'lsa — shu thread uchun event loop ochiladi.
+        """
+        document, error_result = self._prepare(request_data)
+        if error_result:
+            return error_result
+        result = self._execute(document, request_data, context)
+        if inspect.isawaitable(result):
+            result = asyncio.run(_await(result))
+        return result
+
+    async def execute_async(self, request_data: Dict, context: Dict) -> ExecutionResult:
+        """
+        Asyncio server uchun: graphql-core async executor.
+        Sinxron root resolverlar (DB, requests) executor threadda — event loop bloklanmaydi.
+        """
+        document, error_result = self._prepare(request_data)
+        if error_result:
+            return error_result
+        result = self._execute(document, request_data, context, middleware=[_offload_sync_root_resolvers])
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    # ========================
+    # HANDLE (status, payload)
+    # ========================
+    def handle(self, raw: bytes, client_ip: str = None, request: Any = None) -> Tuple[int, Any]:
+        try:
+            data = self.parse_body(raw)
+        except GraphQLRequestError as e:
+            return e.status, self.error_payload(e.message)
+        if isinstance(data, list):
+            return 200, self._handle_batch(data, client_ip, request)
+        return self._handle_operation(data, client_ip, request)
+
+    async def handle_async(self, raw: bytes, client_ip: str = None) -> Tuple[int, Any]:
+        try:
+            data = self.parse_body(raw)
+        except GraphQLRequestError as e:
+            return e.status, self.error_payload(e.message)
+        if isinstance(data, list):
+            return 200, await self._handle_batch_async(data, client_ip)
+        return await self._handle_operation_async(data, client_ip)
+
+    def _handle_operation(self, request_data: Any, client_ip: str = None, request: Any = None) -> Tuple[int, Dict]:
+        try:
+            request_data = self.validate_operation(request_data)
+            sampled = self._sampled()
+            if sampled:
+                self._log_request(request_data, client_ip)
+            result = self.execute(request_data, self.build_context(client_ip, request))
+            return self._response(result, sampled)
+        except GraphQLRequestError as e:
+            return e.status, self.error_payload(e.message)
+        except ValueError as e:
+            self.logger.warning("Business logic xatosi: %s", str(e))
+            return 400, self.error_payload(str(e))
+        except Exception:
+            self.logger.exception("Kutilmagan xato")
+            return 500, self.error_payload("Ichki server xatosi")
+
+    async def _handle_operation_async(self, request_data: Any, client_ip: str = None) -> Tuple[int, Dict]:
+        try:
+            request_data = self.validate_operation(request_data)
+            sampled = self._sampled()
+            if sampled:
+                self._log_request(request_data, client_ip)
+            result = await self.execute_async(request_data, self.build_context(client_ip))
+            return self._response(result, sampled)
+        except GraphQLRequestError as e:
+            return e.status, self.error_payload(e.message)
+        except ValueError as e:
+            self.logger.warning("Business logic xatosi: %s", str(e))
+            return 400, self.error_payload(str(e))
+        except Exception:
+            self.logger.exception("Kutilmagan xato")
+            return 500, self.error_payload("Ichki server xatosi")
+
+    # ========================
+    # BATCH
+    # ========================
+    def _handle_batch(self, operations: List, client_ip: str = None, request: Any = None) -> List[Dict]:
+        """Natijalar operatsiyalar tartibida; har birining xatosi o'z elementida"""
+        if self._batch_parallel(operations):
+            futures = [_batch_pool.submit(self._handle_operation, op, client_ip, request) for op in operations]
+            return [future.result()[1] for future in futures]
+        return [self._handle_operation(op, client_ip, request)[1] for op in operations]
+
+    async def _handle_batch_async(self, operations: List, client_ip: str = None) -> List[Dict]:
+        if self._batch_parallel(operations):
+            results = await asyncio.gather(*(self._handle_operation_async(op, client_ip) for op in operations))
+            return [payload for _, payload in results]
+        return [(await self._handle_operation_async(op, client_ip))[1] for op in operations]
+
+    def _batch_parallel(self, operations: List) -> bool:
+        # Mutatsiyalar yon ta'sirli — yozilgan tartibda ketma-ket bajariladi
+        return config.BATCH_PARALLEL and len(operations) > 1 \
+            and not any(self._is_mutation(op) for op in operations)
+
+    def _is_mutation(self, request_data: Any) -> bool:
+        if not isinstance(request_data, dict):
+            return False
+        query = request_data.get('query')
+        try:
+            if isinstance(query, str) and query:
+                document, _ = self.document_cache.get(self.schema, query)
+            else:
+                sha = persisted_queries.extract_hash(request_data)
+                entry = self.document_cache.lookup(self.schema, sha) if sha else None
+                document = entry[0] if entry else None
+        except persisted_queries.PersistedQueryError:
+            return False
+        if document is None:
+            return False
+        operation = get_operation_ast(document, request_data.get('operationName'))
+        return operation is not None and operation.operation == OperationType.MUTATION
+
+    def _sampled(self) -> bool:
+        """Payload logi: log_payloads yoqilgan, INFO darajasi ochiq va so'rov sampledga tushgan"""
+        return self.log_payloads and self.logger.isEnabledFor(logging.INFO) and logs.sampled()
+
+    def _response(self, result: ExecutionResult, sampled: bool = False) -> Tuple[int, Dict]:
+        response_data = result.formatted
+        if sampled and response_data.get('data'):
+            self.logger.info("Muvaffaqiyatli javob: %s",
+                             json.dumps(response_data['data'], ensure_ascii=False)[:500])
+        if response_data.get('errors'):
+            self.logger.warning("Xatolar: %s", [e.get('message') for e in response_data['errors']])
+        return 200, response_data
+
+    def _log_request(self, request_data: Dict, client_ip: str):
+        query = request_data.get('query') or f"<persisted {persisted_queries.extract_hash(request_data)}>"
+        self.logger.info("GraphQL so'rov | IP: %s | Query: %s", client_ip, query.strip()[:200])
+        if request_data.get('variables'):
+            self.logger.info("Variables: %s", json.dumps(request_data['variables'], ensure_ascii=False))
+
+    # ========================
+    # ENCODING
+    # ========================
+    @staticmethod
+    def error_payload(message: str) -> Dict:
+        return {"data": None, "errors": [{"message": message}]}
+
+    def encode(self, payload: Any) -> bytes:
+        return serializer.encode(payload)
+
+    def render(self, payload: Any, accept_encoding: Optional[str] = None) -> Tuple[Body, Dict[str, str]]:
+        """Kodlash + Accept-Encoding bo'yicha siqish (katta ro'yxatlar — oqim)"""
+        return serializer.render(payload, accept_encoding)
+
+
+# Batch operatsiyalari uchun umumiy pool (threadlar kerak bo'lganda ochiladi)
+_batch_pool = ThreadPoolExecutor(max_workers=config.BATCH_WORKERS, thread_name_prefix="graphql-batch")
+
+
+# ========================
+# HELPERS
+# ========================
+async def _await(awaitable):
+    return await awaitable
+
+
+def _offload_sync_root_resolvers(next_, root, info, **args):
+    """
+    Root (Query/Mutation) darajasidagi sinxron resolverlar executor threadda ishlaydi.
+    `async def` resolverlar va ichki maydonlar event loopda qoladi.
+    """
+    if info.path.prev is None:
+        # __typename kabi meta maydonlar fields ichida yo'q
+        field = info.parent_type.fields.get(info.field_name)
+        resolver = field.resolve if field else None
+        if resolver is not None and not inspect.iscoroutinefunction(resolver):
+            loop = asyncio.get_running_loop()
+            return _run_in_executor(loop, partial(next_, root, info, **args))
+    return next_(root, info, **args)
+
+
+async def _run_in_executor(loop, fn):
+    result = await loop.run_in_executor(None, fn)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
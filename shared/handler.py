@@ -0,0 +1,104 @@
+# shared/handler.py
+"""
+http.server uchun yupqa adapter: so'rovni GraphQLApp ga beradi, javobni yozadi.
+"""
+import logging
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Dict
+
+from shared import config
+from shared.graphql_app import GraphQLApp
+from shared.serializer import write_chunked
+
+
+class GraphQLRequestHandler(BaseHTTPRequestHandler):
+    app: GraphQLApp = None
+    # Keep-alive: har javobda Content-Length bor, ulanish yopilmaydi
+    protocol_version = 'HTTP/1.1'
+    # So'rovni o'qish muddati; so'rovlar orasidagi bo'sh vaqtni server selectorda kutadi
+    timeout = config.REQUEST_READ_TIMEOUT
+
+    def do_GET(self):
+        """Test sahifasi — browserda ko'rish uchun"""
+        if self.path == '/' and self.app.index_html:
+            self._send(200, self.app.index_html.encode('utf-8'), 'text/html; charset=utf-8')
+        else:
+            self._send_json(404, self.app.error_payload("Sahifa topilmadi"))
+
+    def do_POST(self):
+        if self.path != '/graphql':
+            self._send_json(404, self.app.error_payload("Endpoint topilmadi"))
+            return
+
+        length = self._content_length()
+        if length is None:
+            return
+        body = self.rfile.read(length) if length > 0 else b''
+
+        status, payload = self.app.handle(body, self.client_address[0], self)
+        self._send_json(status, payload)
+
+    def _content_length(self):
+        """Tana uzunligi; noto'g'ri yoki MAX_BODY_SIZE dan katta bo'lsa — xato javobi va None"""
+        try:
+            length = int(self.headers.get('Content-Length', 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            status, message = 400, "Noto'g'ri Content-Length"
+        elif length > config.MAX_BODY_SIZE:
+            status, message = 413, "So'rov juda katta"
+        else:
+            return length
+        # Tana o'qilmadi — ulanishda qolgan baytlar keyingi so'rov sifatida o'qilmasin
+        self.close_connection = True
+        self._send_json(status, self.app.error_payload(message))
+        return None
+
+    # ========================
+    # ACCESS LOG
+    # ========================
+    def log_message(self, format: str, *args):
+        # Standart handler har so'rovni stderr ga sinxron yozadi — navbatli logger orqali, DEBUG da
+        if self.app.logger.isEnabledFor(logging.DEBUG):
+            self.app.logger.debug("%s - %s", self.address_string(), format % args)
+
+    def log_error(self, format: str, *args):
+        self.app.logger.warning("%s - %s", self.address_string(), format % args)
+
+    # ========================
+    # RESPONSE
+    # ========================
+    def _send_json(self, code: int, payload: Any):
+        body, headers = self.app.render(payload, self.headers.get('Accept-Encoding'))
+        if isinstance(body, bytes):
+            self._send(code, body, headers.pop('Content-Type'), headers)
+            return
+        if self.request_version == 'HTTP/1.0':
+            # HTTP/1.0 klientlar chunked transferni bilmaydi
+            self._send(code, b''.join(body), headers.pop('Content-Type'), headers)
+            return
+
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Transfer-Encoding', 'chunked')
+        if self.app.cors:
+            self.send_header('Access-Control-Allow-Origin', '*')
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        write_chunked(self.wfile.write, body)
+
+    def _send(self, code: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(code)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.app.cors:
+            self.send_header('Access-Control-Allow-Origin', '*')
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
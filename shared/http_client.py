@@ -0,0 +1,215 @@
+# shared/http_client.py
+"""
+Xizmatlar orasidagi HTTP so'rovlar uchun umumiy ulanish pooli.
+
+requests.post() har safar yangi TCP ulanish ochadi va to'liq TLS handshake qiladi.
+Bu yerda har bir upstream (scheme://host:port) uchun bitta requests.Session:
+- HTTP/1.1 keep-alive — ulanishlar qayta ishlatiladi
+- upstream boshiga cheklangan pool (pool_block: limitdan oshsa kutadi)
+- TLS session resumption — yangi ulanish oldingi sessiyani davom ettiradi
+"""
+import logging
+import ssl
+import threading
+import weakref
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from shared import config, persisted_queries
+
+logger = logging.getLogger("HttpClient")
+
+# Ichki xizmatlar self-signed sertifikat ishlatadi (verify=False) — ogohlantirish har so'rovda chiqmasin
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    Oxirgi muvaffaqiyatli TLS sessiyasini eslab qoladi va yangi ulanishga beradi.
+    TLS 1.3 da session ticket handshake'dan keyin keladi, shuning uchun sessiya
+    tirik soketlardan ham olinadi.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # SSLContext protokolni __new__ da oladi
+        self._session_lock = threading.Lock()
+        self._session = None
+        self._sockets = weakref.WeakSet()
+        self.handshakes = 0
+        self.resumed = 0
+
+    def _current_session(self):
+        for sock in list(self._sockets):
+            try:
+                session = sock.session
+            except (OSError, ValueError, AttributeError):
+                continue
+            if session is not None and session.has_ticket:
+                self._session = session
+                break
+        return self._session
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        with self._session_lock:
+            session = kwargs.get('session') or self._current_session()
+        if session is not None:
+            kwargs['session'] = session
+        try:
+            ssl_sock = super().wrap_socket(sock, *args, **kwargs)
+        except ssl.SSLError:
+            # Sessiya eskirgan bo'lishi mumkin — keyingi ulanish toza handshake qiladi
+            with self._session_lock:
+                self._session = None
+            raise
+
+        with self._session_lock:
+            self.handshakes += 1
+            if ssl_sock.session_reused:
+                self.resumed += 1
+            self._sockets.add(ssl_sock)
+        return ssl_sock
+
+
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
+
+
+def _create_ssl_context() -> ResumingSSLContext:
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    # verify=False bilan bir xil xatti-harakat (self-signed sertifikatlar)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+# ========================
+# SESSION REGISTRY
+# ========================
+_sessions: Dict[str, requests.Session] = {}
+_contexts: Dict[str, ResumingSSLContext] = {}
+_lock = threading.Lock()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url: str) -> requests.Session:
+    """Upstream (scheme://host:port) uchun umumiy Session"""
+    origin = _origin(url)
+    session = _sessions.get(origin)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(origin)
+        if session is None:
+            context = _create_ssl_context()
+            adapter = PooledAdapter(
+                context,
+                pool_connections=1,
+                pool_maxsize=config.HTTP_POOL_MAXSIZE,
+                pool_block=config.HTTP_POOL_BLOCK,
+                # Faqat ulanish bosqichidagi xatoda qayta urinish (POST ikki marta yuborilmaydi)
+                max_retries=Retry(total=1, connect=1, read=0, status=0, allowed_methods=None)
+            )
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = config.HTTP_ACCEPT_ENCODING
+            session.mount(origin + '/', adapter)
+            _sessions[origin] = session
+            _contexts[origin] = context
+            logger.info(f"HTTP pool: {origin} (maks {config.HTTP_POOL_MAXSIZE} ulanish)")
+    return session
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """requests.post() o'rniga: ulanish pooli orqali"""
+    kwargs.setdefault('timeout', config.HTTP_TIMEOUT)
+    # Session.verify ni REQUESTS_CA_BUNDLE bosib ketadi — har so'rovda aniq beriladi
+    kwargs.setdefault('verify', False)
+    return get_session(url).post(url, **kwargs)
+
+
+def post_graphql(url: str, query: str, variables: Dict = None, operation_name: str = None, **kwargs) -> requests.Response:
+    """
+    GraphQL so'rov APQ bilan: avval faqat hash, upstream topmasa — to'liq matn + hash.
+    Javob (requests.Response) chaqiruvchiga odatdagidek qaytadi.
+    """
+    resp = post(url, json=_graphql_payload(query, variables, operation_name), **kwargs)
+    if config.APQ_CLIENT_ENABLED and resp.status_code < 500 and _is_not_found(resp):
+        resp = post(url, json=_graphql_payload(query, variables, operation_name, include_query=True), **kwargs)
+    return resp
+
+
+def post_graphql_batch(url: str, operations: List[Tuple[str, Optional[Dict]]], **kwargs) -> List[Dict]:
+    """
+    Bir nechta (query, variables) bitta POST da (JSON massiv).
+    Natijalar operatsiyalar tartibida: har biri {"data": ..., "errors": [...]}.
+    APQ: hash'i topilmagan operatsiyalar ikkinchi batch bilan to'liq matnda qayta yuboriladi.
+    """
+    resp = post(url, json=[_graphql_payload(query, variables) for query, variables in operations], **kwargs)
+    results = _batch_results(resp, len(operations))
+
+    missing = [i for i, result in enumerate(results) if persisted_queries.is_not_found(result)]
+    if config.APQ_CLIENT_ENABLED and missing:
+        retry = [_graphql_payload(*operations[i], include_query=True) for i in missing]
+        for i, result in zip(missing, _batch_results(post(url, json=retry, **kwargs), len(missing))):
+            results[i] = result
+    return results
+
+
+def _graphql_payload(query: str, variables: Dict = None, operation_name: str = None, include_query: bool = False) -> Dict:
+    if not config.APQ_CLIENT_ENABLED:
+        payload = {"query": query, "variables": variables or {}}
+        if operation_name:
+            payload["operationName"] = operation_name
+        return payload
+    return persisted_queries.request_payload(query, variables, operation_name, include_query)
+
+
+def _batch_results(resp: requests.Response, expected: int) -> List[Dict]:
+    resp.raise_for_status()
+    results = resp.json()
+    if not isinstance(results, list) or len(results) != expected:
+        raise ValueError("Batch javobi operatsiyalar soniga mos emas")
+    return results
+
+
+def _is_not_found(resp: requests.Response) -> bool:
+    try:
+        return persisted_queries.is_not_found(resp.json())
+    except ValueError:
+        return False
+
+
+def stats() -> Dict[str, Dict]:
+    """Upstream bo'yicha TLS handshake va resumption soni"""
+    with _lock:
+        return {
+            origin: {'handshakes': ctx.handshakes, 'resumed': ctx.resumed}
+            for origin, ctx in _contexts.items()
+        }
+
+
+def close_all():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _contexts.clear()
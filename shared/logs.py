@@ -0,0 +1,131 @@
+# shared/logs.py
+"""
+Servislar uchun bloklamaydigan logging.
+
+- Request thread faqat yozuvni navbatga qo'yadi (QueueHandler), formatlash va
+  stderr ga yozish alohida listener threadda — stdout/stderr lock kutilmaydi
+- Daraja servis bo'yicha: LOG_LEVEL_<SERVIS> (masalan LOG_LEVEL_ORDERS=DEBUG), aks holda LOG_LEVEL
+- LOG_FORMAT=json — har qator bitta JSON obyekt
+- Navbat to'lsa yozuv tashlab yuboriladi (so'rov kutmaydi), soni stats() da
+- Payload (query, variables, javob) faqat sampled() True bo'lganda yoziladi
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Dict, Optional
+
+from shared import config
+
+TEXT_FORMAT = '%(asctime)s | %(levelname)-8s | %(name)s | %(message)s'
+DATE_FORMAT = '%H:%M:%S'
+
+_lock = threading.Lock()
+_handler: Optional["DroppingQueueHandler"] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_service: Optional[str] = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """To'la navbatda kutmaydi va traceback chiqarmaydi — yozuvni tashlab, sanaydi"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'service': self.service,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup(service: str, level: str = None):
+    """
+    Root logger ni navbatli pipelinega ulaydi (oldingi handlerlar olib tashlanadi).
+    Har bir servis main.py da bir marta chaqiradi.
+    """
+    global _service
+    level = level or os.environ.get(f'LOG_LEVEL_{service.upper()}', config.LOG_LEVEL)
+    with _lock:
+        _service = service
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(level.upper())
+        _start()
+        root.addHandler(_handler)
+
+
+def _start():
+    """Navbat + listener thread. Fork dan keyin bolada qayta ochiladi (thread meros qolmaydi)"""
+    global _handler, _listener
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    stream = logging.StreamHandler(sys.stderr)
+    if config.LOG_FORMAT == 'json':
+        stream.setFormatter(JsonFormatter(_service))
+    else:
+        stream.setFormatter(logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+
+    if _handler is None:
+        _handler = DroppingQueueHandler(log_queue)
+    else:
+        _handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def _after_fork_in_child():
+    if _listener is not None:
+        _start()
+
+
+def stop():
+    """Navbatdagi yozuvlarni yozib tugatish (atexit)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def sampled() -> bool:
+    """Payload logi shu so'rov uchun yozilsinmi (LOG_PAYLOAD_SAMPLE_RATE ulushi)"""
+    rate = config.LOG_PAYLOAD_SAMPLE_RATE
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def stats() -> Dict:
+    return {
+        'service': _service,
+        'queued': _handler.queue.qsize() if _handler else 0,
+        'dropped': _handler.dropped if _handler else 0,
+    }
+
+
+atexit.register(stop)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,178 @@
+# shared/migrations.py
+"""
+Versiyalangan sxema migratsiyalari va so'rov rejasi (EXPLAIN QUERY PLAN) tekshiruvi.
+
+init_db dagi `CREATE TABLE IF NOT EXISTS` — boshlang'ich sxema; undan keyingi o'zgarishlar
+(indeks, ustun) servis db.py sidagi MIGRATIONS ro'yxatiga yangi versiya bo'lib qo'shiladi:
+- har bir migratsiya bitta SAVEPOINT ichida — yoki to'liq qo'llanadi, yoki umuman
+- qo'llanganlari schema_migrations jadvalida, qayta ishga tushganda o'tkazib yuboriladi
+- versiyalar faqat o'sib boradi; qo'llangan migratsiya o'zgartirilmaydi, yangisi qo'shiladi
+
+HOT_QUERIES — servisning tez-tez ishlaydigan so'rovlari; check_plans() ulardan birortasi
+jadvalni to'liq o'qisa (SCAN, indekssiz) xato beradi. Ishga tushirish (repo ildizidan):
+    python -m shared.migrations [servis ...]
+"""
+import glob
+import importlib.util
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Dict, List, NamedTuple, Sequence, Set, Tuple
+
+logger = logging.getLogger("Migrations")
+
+HotQueries = Dict[str, Tuple[str, Sequence]]
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+class QueryPlanError(Exception):
+    pass
+
+# ========================
+# MIGRATE
+# ========================
+def applied_versions(conn: sqlite3.Connection) -> Set[int]:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def migrate(conn: sqlite3.Connection, migrations: Sequence[Migration]) -> List[int]:
+    """Hali qo'llanmagan migratsiyalarni versiya tartibida qo'llash. Qo'llangan versiyalar qaytadi"""
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError("Migratsiya versiyalari takrorlangan")
+
+    done = applied_versions(conn)
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        conn.execute("SAVEPOINT migration")
+        try:
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                (migration.version, migration.name)
+            )
+        except Exception:
+            conn.execute("ROLLBACK TO SAVEPOINT migration")
+            conn.execute("RELEASE SAVEPOINT migration")
+            logger.error("Migratsiya %s (%s) qo'llanmadi", migration.version, migration.name)
+            raise
+        conn.execute("RELEASE SAVEPOINT migration")
+        applied.append(migration.version)
+        logger.info("Migratsiya qo'llandi: %s %s", migration.version, migration.name)
+    return applied
+
+# ========================
+# EXPLAIN QUERY PLAN
+# ========================
+def query_plan(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", tuple(params))]
+
+
+def full_scans(plan: List[str]) -> List[str]:
+    """
+    Indekssiz to'liq o'qishlar: `SCAN jadval` (USING INDEX / COVERING INDEX siz).
+    FTS virtual jadval va subquery natijasini o'qish (SCAN ... VIRTUAL TABLE / SUBQUERY) hisobga olinmaydi
+    """
+    return [
+        step for step in plan
+        if step.startswith('SCAN ')
+        and 'USING INDEX' not in step
+        and 'USING COVERING INDEX' not in step
+        and 'USING INTEGER PRIMARY KEY' not in step
+        and 'VIRTUAL TABLE' not in step
+        and 'SUBQUERY' not in step
+        and 'CONSTANT ROW' not in step
+    ]
+
+
+def check_plans(conn: sqlite3.Connection, queries: HotQueries) -> Dict[str, List[str]]:
+    """Har bir hot so'rov uchun to'liq o'qishlar; bo'sh dict — hammasi indeks bo'yicha"""
+    problems = {}
+    for name, (sql, params) in queries.items():
+        scans = full_scans(query_plan(conn, sql, params))
+        if scans:
+            problems[name] = scans
+    return problems
+
+
+def assert_indexed(conn: sqlite3.Connection, queries: HotQueries):
+    problems = check_plans(conn, queries)
+    if problems:
+        details = '; '.join(f"{name}: {', '.join(scans)}" for name, scans in problems.items())
+        raise QueryPlanError(f"To'liq jadval o'qish: {details}")
+
+# ========================
+# CLI
+# ========================
+def _load_db_module(service_dir: str):
+    path = os.path.join(service_dir, 'db.py')
+    spec = importlib.util.spec_from_file_location(f"{os.path.basename(service_dir)}_db", path)
+    module = importlib.util.module_from_spec(spec)
+    # Servis ichidagi qo'shni modullar (from stock_cache import ...) — servis o'z papkasidan ishlagandek
+    sys.path.insert(0, service_dir)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(service_dir)
+    return module
+
+
+def check_service(service_dir: str) -> Dict[str, List[str]]:
+    """
+    Servis sxemasi + migratsiyalari vaqtinchalik bazada quriladi va HOT_QUERIES rejalari tekshiriladi
+    (ishlayotgan bazaga tegilmaydi)
+    """
+    module = _load_db_module(service_dir)
+    queries = getattr(module, 'HOT_QUERIES', None)
+    if not queries:
+        return {}
+    database_cls = next(
+        value for name, value in vars(module).items()
+        if name.endswith('Database') and isinstance(value, type) and value.__module__ == module.__name__
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        database = database_cls(db_path=os.path.join(tmp, 'check.db'))
+        try:
+            with database.get_connection() as conn:
+                return check_plans(conn, queries)
+        finally:
+            database.pool.close_all()
+
+
+def main(argv: List[str]) -> int:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.append(root)
+    services = argv or sorted(
+        os.path.basename(os.path.dirname(path)) for path in glob.glob(os.path.join(root, '*_service', 'db.py'))
+    )
+    failed = False
+    for service in services:
+        problems = check_service(os.path.join(root, service))
+        for name, scans in problems.items():
+            failed = True
+            print(f"XATO  {service}.{name}: {'; '.join(scans)}")
+        if not problems:
+            print(f"OK    {service}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
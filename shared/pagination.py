@@ -0,0 +1,105 @@
+# shared/pagination.py
+"""
+Relay uslubidagi keyset (cursor) pagination.
+
+LIMIT/OFFSET da N-sahifa uchun oldingi barcha qatorlar o'qib tashlanadi;
+keyset da esa oxirgi ko'rilgan (tartib_ustuni, id) dan keyingisi indeks bo'yicha
+to'g'ridan-to'g'ri topiladi — 500-sahifa ham 1-sahifa bilan bir xil narxda.
+
+- cursor — shaffof emas (base64 JSON), mijoz uni faqat `after` ga qaytaradi
+- `first + 1` qator o'qiladi: ortig'i bo'lsa hasNextPage = True
+- tartib ustunlari (masalan created_at, id) indeksdagi tartib bilan bir xil bo'lishi kerak
+"""
+import base64
+import binascii
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from graphql import GraphQLBoolean, GraphQLField, GraphQLList, GraphQLNonNull, GraphQLObjectType, GraphQLString
+
+from shared import config
+
+# ========================
+# CURSOR
+# ========================
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[Tuple]:
+    """cursor -> tartib qiymatlari (size ta). Bo'sh cursor — birinchi sahifa"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise ValueError("Noto'g'ri cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Noto'g'ri cursor")
+    return tuple(values)
+
+
+def page_size(first: Optional[int]) -> int:
+    if first is None:
+        return config.PAGE_DEFAULT_SIZE
+    if first <= 0:
+        raise ValueError("first musbat bo'lishi kerak")
+    return min(first, config.PAGE_MAX_SIZE)
+
+# ========================
+# SQL
+# ========================
+def keyset_condition(columns: Sequence[str], after: Optional[Tuple], descending: bool = True) -> Tuple[Optional[str], List]:
+    """
+    (c1, c2) < (?, ?) — SQLite row value taqqoslashi indeks oralig'iga aylanadi.
+    after bo'lmasa (birinchi sahifa) — shart yo'q
+    """
+    if after is None:
+        return None, []
+    op = '<' if descending else '>'
+    placeholders = ', '.join('?' * len(columns))
+    return f"({', '.join(columns)}) {op} ({placeholders})", list(after)
+
+# ========================
+# CONNECTION
+# ========================
+def connection(rows: List[Dict], first: int, key: Callable[[Dict], Sequence[Any]], after: Optional[str] = None) -> Dict:
+    """
+    rows — `first + 1` gacha o'qilgan qatorlar; key(row) — cursor ga yoziladigan tartib qiymatlari
+    """
+    has_next = len(rows) > first
+    rows = rows[:first]
+    edges = [{'cursor': encode_cursor(key(row)), 'node': row} for row in rows]
+    return {
+        'edges': edges,
+        'pageInfo': {
+            'hasNextPage': has_next,
+            'hasPreviousPage': bool(after),
+            'startCursor': edges[0]['cursor'] if edges else None,
+            'endCursor': edges[-1]['cursor'] if edges else None,
+        },
+    }
+
+# ========================
+# GRAPHQL TYPES
+# ========================
+PageInfoType = GraphQLObjectType('PageInfo', {
+    'hasNextPage': GraphQLField(GraphQLNonNull(GraphQLBoolean)),
+    'hasPreviousPage': GraphQLField(GraphQLNonNull(GraphQLBoolean)),
+    'startCursor': GraphQLField(GraphQLString),
+    'endCursor': GraphQLField(GraphQLString),
+})
+
+
+def connection_type(node_type: GraphQLObjectType, name: str = None) -> GraphQLObjectType:
+    """<Node>Connection { edges { cursor node } pageInfo }"""
+    name = name or node_type.name
+    edge_type = GraphQLObjectType(f'{name}Edge', {
+        'cursor': GraphQLField(GraphQLNonNull(GraphQLString)),
+        'node': GraphQLField(node_type),
+    })
+    return GraphQLObjectType(f'{name}Connection', {
+        'edges': GraphQLField(GraphQLList(edge_type)),
+        'pageInfo': GraphQLField(GraphQLNonNull(PageInfoType)),
+    })
@@ -0,0 +1,130 @@
+# shared/persisted_queries.py
+"""
+Automatic Persisted Queries (APQ).
+
+Klient so'rov matni o'rniga uning SHA-256 hash'ini yuboradi:
+    {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "..."}}, "variables": {...}}
+Server hujjatni keshdan topsa — bajaradi, topmasa PERSISTED_QUERY_NOT_FOUND qaytaradi
+va klient bir marta to'liq matn + hash yuboradi. Shundan keyin tarmoq orqali faqat hash boradi.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional
+
+from shared import config
+
+PERSISTED_QUERY_NOT_FOUND = 'PERSISTED_QUERY_NOT_FOUND'
+PERSISTED_QUERY_NOT_FOUND_MESSAGE = 'PersistedQueryNotFound'
+
+
+class PersistedQueryError(Exception):
+    """Hash bo'yicha so'rov topilmadi yoki hash matnga mos emas"""
+
+    def __init__(self, message: str, code: Optional[str] = None, status: int = 200):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+
+    def payload(self) -> Dict:
+        error = {"message": self.message}
+        if self.code:
+            error["extensions"] = {"code": self.code}
+        return {"data": None, "errors": [error]}
+
+
+@lru_cache(maxsize=1024)
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def extract_hash(request_data: Dict) -> Optional[str]:
+    """extensions.persistedQuery.sha256Hash (bo'lmasa None)"""
+    extensions = request_data.get('extensions')
+    if not isinstance(extensions, dict):
+        return None
+    persisted = extensions.get('persistedQuery')
+    if not isinstance(persisted, dict):
+        return None
+    if persisted.get('version', 1) != 1:
+        raise PersistedQueryError("persistedQuery versiyasi qo'llab-quvvatlanmaydi", status=400)
+    sha = persisted.get('sha256Hash')
+    if not isinstance(sha, str) or not sha:
+        raise PersistedQueryError("persistedQuery.sha256Hash bo'sh", status=400)
+    return sha.lower()
+
+
+def verify(query: str, sha: str):
+    if query_hash(query) != sha:
+        raise PersistedQueryError("persistedQuery hash so'rov matniga mos emas", status=400)
+
+
+def not_found() -> PersistedQueryError:
+    return PersistedQueryError(PERSISTED_QUERY_NOT_FOUND_MESSAGE, PERSISTED_QUERY_NOT_FOUND)
+
+
+def is_not_found(payload) -> bool:
+    if not isinstance(payload, dict):
+        return False
+    for error in payload.get('errors') or []:
+        if (error.get('extensions') or {}).get('code') == PERSISTED_QUERY_NOT_FOUND \
+                or error.get('message') == PERSISTED_QUERY_NOT_FOUND_MESSAGE:
+            return True
+    return False
+
+
+def request_payload(query: str, variables: Dict = None, operation_name: str = None, include_query: bool = False) -> Dict:
+    """Upstreamga yuboriladigan APQ so'rov tanasi"""
+    payload = {
+        "variables": variables or {},
+        "extensions": {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}},
+    }
+    if include_query:
+        payload["query"] = query
+    if operation_name:
+        payload["operationName"] = operation_name
+    return payload
+
+
+class PersistedQueryStore:
+    """
+    hash -> so'rov matni (LRU). Matnning o'zi kerak bo'lgan joylar uchun (gateway rejalashtiradi).
+    Xizmatlar esa tayyor hujjatni DocumentCache dan hash bo'yicha oladi.
+    """
+
+    def __init__(self, maxsize: int = None):
+        self.maxsize = max(1, maxsize or config.APQ_STORE_SIZE)
+        self._queries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, query: Optional[str], sha: Optional[str]) -> Optional[str]:
+        """
+        So'rov matnini qaytaradi: hash bo'lsa tekshiradi va saqlaydi,
+        faqat hash kelsa keshdan oladi (topilmasa PersistedQueryError).
+        """
+        if not sha:
+            return query
+        if query:
+            verify(query, sha)
+            with self._lock:
+                self._queries[sha] = query
+                self._queries.move_to_end(sha)
+                if len(self._queries) > self.maxsize:
+                    self._queries.popitem(last=False)
+            return query
+        with self._lock:
+            query = self._queries.get(sha)
+            if query is None:
+                self.misses += 1
+                raise not_found()
+            self._queries.move_to_end(sha)
+            self.hits += 1
+            return query
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'size': len(self._queries), 'hits': self.hits, 'misses': self.misses}
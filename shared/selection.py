@@ -0,0 +1,48 @@
+# shared/selection.py
+"""
+Resolver ichida so'ralgan maydonlar (selection set) — faqat kerakli
+ma'lumotni yuklash uchun (masalan, atributlar so'ralmagan bo'lsa ularni o'qimaslik).
+"""
+from typing import Dict, Iterable, List, Sequence, Set
+
+from graphql import FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLResolveInfo, InlineFragmentNode
+
+
+def selected_fields(info: GraphQLResolveInfo, path: Sequence[str] = ()) -> Set[str]:
+    """
+    Joriy maydonning ichki maydonlari (fragmentlar ochiladi).
+    path — ichkariroq daraja, masalan connection uchun ('edges', 'node')
+    """
+    fields = _fields(list(info.field_nodes), info.fragments)
+    for name in path:
+        fields = _fields([field for field in fields if field.name.value == name], info.fragments)
+    return {field.name.value for field in fields}
+
+
+def requested(info: GraphQLResolveInfo, candidates: Iterable[str], path: Sequence[str] = ()) -> Set[str]:
+    """candidates ichidan so'rovda qatnashganlari"""
+    return selected_fields(info, path) & set(candidates)
+
+
+def _fields(nodes: List[FieldNode], fragments: Dict[str, FragmentDefinitionNode]) -> List[FieldNode]:
+    """Berilgan maydonlarning ichki maydonlari (bir xil nomli maydonlar birlashadi)"""
+    fields: List[FieldNode] = []
+    for node in nodes:
+        if node.selection_set:
+            _collect(node.selection_set, fragments, fields, set())
+    return fields
+
+
+def _collect(selection_set, fragments: Dict[str, FragmentDefinitionNode], fields: List[FieldNode], visited: Set[str]):
+    # @skip/@include hisobga olinmaydi — ortiqcha yuklash xato emas, yetishmaslik xato
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.append(selection)
+        elif isinstance(selection, InlineFragmentNode):
+            _collect(selection.selection_set, fragments, fields, visited)
+        elif isinstance(selection, FragmentSpreadNode):
+            name = selection.name.value
+            fragment = fragments.get(name)
+            if fragment is not None and name not in visited:
+                visited.add(name)
+                _collect(fragment.selection_set, fragments, fields, visited)
@@ -0,0 +1,187 @@
+# shared/serializer.py
+"""
+GraphQL javoblarini kodlash.
+
+- Default: ixcham JSON (indent yo'q, bo'sh joysiz ajratgichlar)
+- JSON_BACKEND=orjson (yoki auto va orjson o'rnatilgan bo'lsa) — tezroq backend
+- Accept-Encoding bo'yicha gzip / br (brotli o'rnatilgan bo'lsa) siqish
+- Katta ro'yxatlar Transfer-Encoding: chunked bilan oqim sifatida yoziladi
+"""
+import gzip
+import json
+import zlib
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from shared import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+Body = Union[bytes, Iterator[bytes]]
+
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+
+
+class Serializer:
+    def __init__(self, backend: str = None, pretty: bool = None):
+        backend = (backend or config.JSON_BACKEND).lower()
+        self.pretty = config.JSON_PRETTY if pretty is None else pretty
+        if backend == 'orjson' or (backend == 'auto' and orjson is not None):
+            self.backend = 'orjson' if orjson is not None else 'json'
+        else:
+            self.backend = 'json'
+        self._encoder = json.JSONEncoder(
+            ensure_ascii=False,
+            indent=2 if self.pretty else None,
+            separators=None if self.pretty else (',', ':')
+        )
+
+    # ========================
+    # ENCODE
+    # ========================
+    def encode(self, payload: Any) -> bytes:
+        if self.backend == 'orjson':
+            return orjson.dumps(payload, option=orjson.OPT_INDENT_2 if self.pretty else 0)
+        return self._encoder.encode(payload).encode('utf-8')
+
+    def iter_encode(self, payload: Any, chunk_size: int = None) -> Iterator[bytes]:
+        """
+        JSON ni bo'laklab kodlash — butun javob xotirada bitta satr bo'lib turmaydi.
+        Obyektlar ochib chiqiladi, ro'yxat elementlari esa bittadan tez encoder bilan kodlanadi
+        (stdlib iterencode sof Python — C encoderdan bir necha barobar sekin).
+        """
+        chunk_size = chunk_size or config.STREAM_CHUNK_SIZE
+        parts = (p.encode('utf-8') for p in self._encoder.iterencode(payload)) if self.pretty \
+            else self._iter_parts(payload)
+        buffer, size = [], 0
+        for part in parts:
+            buffer.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield b''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b''.join(buffer)
+
+    def _iter_parts(self, value: Any) -> Iterator[bytes]:
+        if isinstance(value, dict) and value:
+            separator = b'{'
+            for key, item in value.items():
+                yield separator + self.encode(str(key)) + b':'
+                yield from self._iter_parts(item)
+                separator = b','
+            yield b'}'
+        elif isinstance(value, list) and value:
+            separator = b'['
+            for item in value:
+                yield separator + self.encode(item)
+                separator = b','
+            yield b']'
+        else:
+            yield self.encode(value)
+
+    # ========================
+    # RENDER (kodlash + siqish + oqim)
+    # ========================
+    def render(self, payload: Any, accept_encoding: Optional[str] = None) -> Tuple[Body, Dict[str, str]]:
+        """
+        (body, headers). body bytes bo'lsa — Content-Length bilan,
+        iterator bo'lsa — chunked transfer bilan yoziladi.
+        """
+        encoding = negotiate(accept_encoding)
+        headers = {'Content-Type': JSON_CONTENT_TYPE}
+        if encoding:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if _should_stream(payload):
+            # Oqimda br emas, gzip (streaming siqish uchun zlib yetarli)
+            if encoding:
+                encoding = 'gzip'
+                headers['Content-Encoding'] = encoding
+                return _gzip_stream(self.iter_encode(payload)), headers
+            return self.iter_encode(payload), headers
+
+        body = self.encode(payload)
+        if encoding and len(body) >= config.COMPRESS_MIN_SIZE:
+            body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+        return body, headers
+
+
+# ========================
+# COMPRESSION
+# ========================
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Accept-Encoding dan qo'llab-quvvatlanadigan eng yaxshi kodlash (q=0 hisobga olinadi)"""
+    if not accept_encoding or not config.COMPRESSION_ENABLED:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=config.COMPRESS_LEVEL_BR)
+    return gzip.compress(body, compresslevel=config.COMPRESS_LEVEL_GZIP)
+
+
+def _gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(config.COMPRESS_LEVEL_GZIP, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ========================
+# STREAMING
+# ========================
+def _should_stream(payload: Any) -> bool:
+    """data ichidagi biror ro'yxat STREAM_MIN_ITEMS dan katta bo'lsa oqim bilan yoziladi"""
+    if config.STREAM_MIN_ITEMS <= 0 or not isinstance(payload, dict):
+        return False
+    data = payload.get('data')
+    if not isinstance(data, dict):
+        return False
+    for value in data.values():
+        if isinstance(value, list) and len(value) >= config.STREAM_MIN_ITEMS:
+            return True
+        if isinstance(value, dict):
+            for inner in value.values():
+                if isinstance(inner, list) and len(inner) >= config.STREAM_MIN_ITEMS:
+                    return True
+    return False
+
+
+def write_chunked(write, chunks: Iterator[bytes]):
+    """HTTP/1.1 chunked transfer: har bir bo'lak hajmi hex bilan, oxirida 0-bo'lak"""
+    for chunk in chunks:
+        if chunk:
+            write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+    write(b"0\r\n\r\n")
+
+
+# Process uchun umumiy serializer
+serializer = Serializer()
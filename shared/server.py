@@ -0,0 +1,437 @@
+# shared/server.py
+"""
+Barcha xizmatlar uchun umumiy HTTP(S) server.
+
+HTTPServer bitta so'rovni bir vaqtda bajaradi — sekin resolver butun xizmatni to'xtatadi.
+Bu yerda accept qilingan ulanishlar cheklangan navbatga tushadi va thread pool ularni
+parallel qayta ishlaydi. Navbat to'lsa accept kutadi (backpressure), kutish muddati
+o'tsa ulanish rad etiladi.
+
+Keep-alive: javobdan keyin bo'sh turgan ulanish workerda keyingi so'rovni kutmaydi —
+KeepAliveParker selectoriga o'tadi va yangi so'rov kelganda navbatga qaytadi.
+Aks holda pooldagi bo'sh klient ulanishlari barcha workerlarni band qilib qo'yardi.
+"""
+import logging
+import os
+import queue
+import selectors
+import signal
+import socket
+import ssl
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, Optional
+
+from shared import config, write_behind
+
+logger = logging.getLogger("SharedServer")
+
+
+class KeepAliveParker:
+    """
+    Bo'sh keep-alive ulanishlar uchun bitta selector thread.
+    - park(handler): ulanish kuzatuvga olinadi (worker darhol bo'shaydi)
+    - o'qishga tayyor bo'lsa — dispatch(handler) (pool navbatiga)
+    - idle_timeout dan ortiq bo'sh tursa yoki max_idle oshsa (eng eskisi) — close(handler)
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[BaseHTTPRequestHandler], None],
+        close: Callable[[BaseHTTPRequestHandler], None],
+        idle_timeout: float = None,
+        max_idle: int = None
+    ):
+        self._dispatch = dispatch
+        self._close = close
+        self.idle_timeout = config.KEEPALIVE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.max_idle = max(1, max_idle or config.KEEPALIVE_MAX_IDLE)
+        # Selector start() da ochiladi: prefork'da har process o'z epoll'iga ega bo'lsin
+        self._selector = None
+        self._wake_r = self._wake_w = None
+        self._lock = threading.Lock()
+        self._pending = []
+        # soket -> (handler, muddat); faqat selector thread o'zgartiradi, tartib — eng eskisi birinchi
+        self._idle: Dict[socket.socket, tuple] = {}
+        self._running = False
+        self._thread = None
+        self.parked = 0
+        self.resumed = 0
+        self.expired = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._selector = selectors.DefaultSelector()
+        # Workerlar park() qiladi, ro'yxatga olish faqat selector threadda — socketpair bilan uyg'otiladi
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="http-keepalive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake()
+        if self._thread is None:
+            return
+        self._thread.join(timeout=5)
+        self._thread = None
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for handler in pending + [entry[0] for entry in self._idle.values()]:
+            self._close(handler)
+        self._idle.clear()
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def park(self, handler: BaseHTTPRequestHandler):
+        with self._lock:
+            self._pending.append(handler)
+            self.parked += 1
+        self._wake()
+
+    def __len__(self) -> int:
+        return len(self._idle) + len(self._pending)
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            # Bufer to'la — selector baribir uyg'onadi
+            pass
+
+    # ========================
+    # SELECTOR LOOP
+    # ========================
+    def _loop(self):
+        while self._running:
+            timeout = 1.0
+            if self._idle:
+                oldest = next(iter(self._idle.values()))[1]
+                timeout = min(timeout, max(0.0, oldest - time.monotonic()))
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wake_r:
+                    self._drain_wake()
+                    continue
+                handler, _ = self._idle.pop(key.fileobj)
+                self._selector.unregister(key.fileobj)
+                self.resumed += 1
+                self._dispatch(handler)
+            self._register_pending()
+            self._expire()
+
+    def _drain_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except OSError:
+            pass
+
+    def _register_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        deadline = time.monotonic() + self.idle_timeout
+        for handler in pending:
+            try:
+                self._selector.register(handler.connection, selectors.EVENT_READ)
+            except (ValueError, OSError):
+                # Ulanish shu orada yopilgan
+                self._close(handler)
+                continue
+            self._idle[handler.connection] = (handler, deadline)
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._idle:
+            sock, (handler, deadline) = next(iter(self._idle.items()))
+            if deadline > now and len(self._idle) <= self.max_idle:
+                break
+            del self._idle[sock]
+            self._selector.unregister(sock)
+            self.expired += 1
+            self._close(handler)
+
+
+class BoundedThreadPoolServer(HTTPServer):
+    """
+    Cheklangan thread pool bilan ishlaydigan HTTPServer.
+    Workerlar serve_forever() ichida ishga tushadi (prefork uchun fork'dan keyin).
+    """
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        workers: int = None,
+        queue_size: int = None,
+        queue_timeout: float = None,
+        bind_and_activate: bool = True
+    ):
+        # Atributlar bind'dan oldin: bind xato bersa server_close() ularga tayanadi
+        self.workers = max(1, workers or config.SERVER_WORKERS)
+        self.queue_timeout = config.SERVER_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self._queue = queue.Queue(maxsize=max(1, queue_size or config.SERVER_QUEUE_SIZE))
+        self._threads = []
+        self._lock = threading.Lock()
+        self._active = 0
+        self._handled = 0
+        self._rejected = 0
+        # Faqat BaseHTTPRequestHandler: so'rovlar orasida ulanish selectorda kutadi
+        self._parker = None
+        if issubclass(handler_class, BaseHTTPRequestHandler):
+            self._parker = KeepAliveParker(self._resume, self._close_handler)
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+    # ========================
+    # WORKERS
+    # ========================
+    def _start_workers(self):
+        if self._threads:
+            return
+        if self._parker is not None:
+            self._parker.start()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"http-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            request, client_address, handler = item
+            with self._lock:
+                self._active += 1
+            parked = False
+            try:
+                if handler is not None:
+                    parked = self._serve(handler)
+                elif self._handshake(request, client_address):
+                    if self._parker is None:
+                        self.finish_request(request, client_address)
+                    else:
+                        parked = self._serve(self._open_handler(request, client_address))
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                if not parked:
+                    self.shutdown_request(request)
+                with self._lock:
+                    self._active -= 1
+                    self._handled += 1
+
+    def _handshake(self, request, client_address) -> bool:
+        """TLS handshake worker ichida bajariladi — accept loop bloklanmaydi"""
+        if not isinstance(request, ssl.SSLSocket):
+            return True
+        try:
+            request.settimeout(config.SERVER_HANDSHAKE_TIMEOUT)
+            request.do_handshake()
+            request.settimeout(None)
+            return True
+        except (ssl.SSLError, OSError) as e:
+            logger.debug(f"TLS handshake xatosi {client_address[0]}: {e}")
+            return False
+
+    # ========================
+    # KEEP-ALIVE
+    # ========================
+    def _open_handler(self, request, client_address) -> BaseHTTPRequestHandler:
+        """BaseRequestHandler.__init__ dagi kabi, lekin handle()/finish() siz — ulanish so'rovlar orasida yashaydi"""
+        handler = self.RequestHandlerClass.__new__(self.RequestHandlerClass)
+        handler.request = request
+        handler.client_address = client_address
+        handler.server = self
+        handler.setup()
+        return handler
+
+    def _serve(self, handler: BaseHTTPRequestHandler) -> bool:
+        """
+        Ulanishdagi tayyor so'rov(lar)ni bajaradi. True — ulanish parkovkaga qo'yildi,
+        False — yopilishi kerak (handler.finish() bajarilgan).
+        """
+        parked = False
+        try:
+            while True:
+                handler.handle_one_request()
+                if handler.close_connection:
+                    break
+                # Pipelining: keyingi so'rov buferda bo'lsa selector uni ko'rmaydi — shu yerda bajariladi
+                if not self._buffered(handler):
+                    self._parker.park(handler)
+                    parked = True
+                    break
+        finally:
+            if not parked:
+                self._finish(handler)
+        return parked
+
+    @staticmethod
+    def _buffered(handler: BaseHTTPRequestHandler) -> bool:
+        """rfile (yoki TLS) buferida o'qilmagan baytlar bormi — bloklanmasdan"""
+        sock = handler.connection
+        if isinstance(sock, ssl.SSLSocket) and sock.pending():
+            return True
+        sock.settimeout(0)
+        try:
+            return bool(handler.rfile.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        except OSError:
+            # Ulanish uzilgan — selector o'qishga tayyor deydi, xato workerda ko'rinadi
+            return False
+        finally:
+            sock.settimeout(handler.timeout)
+
+    def _resume(self, handler: BaseHTTPRequestHandler):
+        """Selector: bo'sh ulanishda yangi so'rov — yangi ulanishlar bilan bir navbatda"""
+        try:
+            self._queue.put((handler.request, handler.client_address, handler), timeout=self.queue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"Navbat to'la ({self._queue.maxsize}), keep-alive ulanish yopildi: {handler.client_address[0]}")
+            self._close_handler(handler)
+
+    def _close_handler(self, handler: BaseHTTPRequestHandler):
+        self._finish(handler)
+        self.shutdown_request(handler.request)
+
+    @staticmethod
+    def _finish(handler: BaseHTTPRequestHandler):
+        try:
+            handler.finish()
+        except OSError:
+            pass
+
+    # ========================
+    # SOCKETSERVER HOOKS
+    # ========================
+    def process_request(self, request, client_address):
+        try:
+            self._queue.put((request, client_address, None), timeout=self.queue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"Navbat to'la ({self._queue.maxsize}), ulanish rad etildi: {client_address[0]}")
+            self.shutdown_request(request)
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        self._start_workers()
+        super().serve_forever(poll_interval)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+        if self._parker is not None:
+            self._parker.stop()
+            self._parker = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'active': self._active,
+                'queue_depth': self._queue.qsize(),
+                'queue_size': self._queue.maxsize,
+                'handled': self._handled,
+                'rejected': self._rejected,
+                'idle_connections': len(self._parker) if self._parker is not None else 0,
+            }
+
+
+class PreforkServer(BoundedThreadPoolServer):
+    """
+    Bitta listening socket, bir nechta process (har birida o'z thread pooli).
+    Faqat os.fork mavjud tizimlarda.
+    """
+
+    def __init__(self, server_address, handler_class, processes: int = None, **kwargs):
+        self.processes = max(1, processes or config.SERVER_PROCESSES)
+        self._children = []
+        super().__init__(server_address, handler_class, **kwargs)
+
+    def get_request(self):
+        # Listening socket non-blocking: boshqa process ulanishni olib ketsa loop osilib qolmaydi
+        request, client_address = self.socket.accept()
+        request.setblocking(True)
+        return request, client_address
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        self.socket.setblocking(False)
+        for _ in range(self.processes - 1):
+            pid = os.fork()
+            if pid == 0:
+                self._children = []
+                # server_close() SIGTERM yuboradi: os._exit atexit ni chaqirmaydi — buferlar shu yerda yoziladi
+                signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+                try:
+                    super().serve_forever(poll_interval)
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    write_behind.close_all()
+                    os._exit(0)
+            self._children.append(pid)
+        logger.info(f"Prefork: {self.processes} process, har birida {self.workers} worker")
+        super().serve_forever(poll_interval)
+
+    def server_close(self):
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        self._children = []
+        super().server_close()
+
+
+# ========================
+# FACTORY
+# ========================
+def create_server(server_address, handler_class, ssl_context: Optional[ssl.SSLContext] = None, mode: str = None) -> HTTPServer:
+    """
+    config.SERVER_MODE bo'yicha server yaratadi va (berilgan bo'lsa) TLS bilan o'raydi.
+    """
+    mode = (mode or config.SERVER_MODE).lower()
+    if mode == 'prefork' and not hasattr(os, 'fork'):
+        logger.warning("Prefork bu tizimda yo'q, threaded rejimga o'tildi")
+        mode = 'threaded'
+    if mode == 'asyncio' and getattr(handler_class, 'app', None) is None:
+        logger.warning(f"{handler_class.__name__} GraphQLApp'ga ega emas, threaded rejimga o'tildi")
+        mode = 'threaded'
+
+    if mode == 'asyncio':
+        from shared.aio_server import AsyncGraphQLServer
+        logger.info(f"Server rejimi: {mode}")
+        return AsyncGraphQLServer(server_address, handler_class.app, ssl_context)
+
+    if mode == 'single':
+        server = HTTPServer(server_address, handler_class)
+    elif mode == 'prefork':
+        server = PreforkServer(server_address, handler_class)
+    else:
+        server = BoundedThreadPoolServer(server_address, handler_class)
+
+    if ssl_context is not None:
+        # Pool rejimlarida handshake workerda bajariladi
+        server.socket = ssl_context.wrap_socket(
+            server.socket,
+            server_side=True,
+            do_handshake_on_connect=(mode == 'single')
+        )
+
+    logger.info(f"Server rejimi: {mode}")
+    return server
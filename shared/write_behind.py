@@ -0,0 +1,306 @@
+# shared/write_behind.py
+"""
+Yuqori chastotali append-only yozuvlar (activity/audit log, ko'rishlar) uchun
+process ichidagi write-behind bufer.
+
+- So'rov thread yozuvni faqat xotiradagi buferga qo'yadi — telemetriya uchun commit/fsync kutilmaydi
+- Chaqiruvchi tranzaksiya ichida qo'shilgan yozuv buferga eng tashqi commit dan keyin tushadi
+  (rollback bo'lsa — tashlanadi): log bekor qilingan o'zgarishni yozmaydi, FK qatorlari ko'rinib turadi
+- Fon thread bufer WRITE_BEHIND_BATCH_SIZE ga yetganda yoki eng eski yozuv
+  WRITE_BEHIND_FLUSH_INTERVAL soniya kutganda hammasini bitta tranzaksiyada executemany bilan yozadi
+- Hisoblagichlar (view_count + 1) buferda jamlanadi: bitta post N marta ko'rilsa — bitta UPDATE
+- Bitta yaroqsiz qator (FK/CHECK) butun paketni yo'qotmaydi — o'sha paket qatorma-qator yoziladi
+- Baza band bo'lsa (locked) paket buferga qaytadi va keyingi flushda yoziladi
+- To'xtashda (atexit, prefork bolasida SIGTERM) qolgan yozuvlar yoziladi
+- Bufer to'lsa yozuv tashlanadi (so'rov kutmaydi); soni va kechikish (lag) stats() da
+- WRITE_BEHIND_ENABLED=0 — eski xatti-harakat: har yozuv darhol, chaqiruvchi tranzaksiyasida
+"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from shared import config
+from shared.db_pool import ConnectionPool
+
+logger = logging.getLogger("WriteBehind")
+
+_buffers: Dict[str, "WriteBehindBuffer"] = {}
+_buffers_lock = threading.Lock()
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_pending: int = None
+    ):
+        self.pool = pool
+        self.name = pool.name
+        self.batch_size = max(1, batch_size or config.WRITE_BEHIND_BATCH_SIZE)
+        self.flush_interval = config.WRITE_BEHIND_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_pending = max(self.batch_size, max_pending or config.WRITE_BEHIND_MAX_PENDING)
+        self._reset()
+
+    def _reset(self):
+        # Fork dan keyin ham chaqiriladi: ota process buferi ota processda yoziladi, thread meros qolmaydi
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._rows: Dict[str, List[Tuple]] = {}
+        self._counters: Dict[str, Dict[Tuple, int]] = {}
+        self._pending = 0
+        self._oldest: Optional[float] = None
+        # Yozilayotgan (flush ichidagi) paketning eng eski yozuvi — lag uni ham hisobga oladi
+        self._inflight_oldest: Optional[float] = None
+        # Baza band bo'lganda keyingi urinish vaqti (har kutishda darhol qayta urinilmaydi)
+        self._retry_at = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.retries = 0
+        self.last_flush_ms = 0.0
+        self.max_lag = 0.0
+
+    # ========================
+    # YOZISH (request thread)
+    # ========================
+    def add(self, sql: str, params: Sequence = ()):
+        """Bitta qator (INSERT) — keyingi flushda executemany paketiga qo'shiladi"""
+        if not config.WRITE_BEHIND_ENABLED:
+            with self.pool.connection() as conn:
+                conn.execute(sql, params)
+            return
+        self.pool.after_commit(partial(self._add_row, sql, tuple(params)))
+
+    def _add_row(self, sql: str, params: Tuple):
+        with self._cond:
+            if self._accept():
+                self._rows.setdefault(sql, []).append(params)
+                self._added()
+
+    def increment(self, sql: str, key: Sequence, amount: int = 1):
+        """
+        Hisoblagich: sql parametrlari (amount, *key), masalan
+        "UPDATE posts SET view_count = view_count + ? WHERE id = ?" va key=(post_id,)
+        """
+        key = tuple(key)
+        if not config.WRITE_BEHIND_ENABLED:
+            with self.pool.connection() as conn:
+                conn.execute(sql, (amount, *key))
+            return
+        self.pool.after_commit(partial(self._add_count, sql, key, amount))
+
+    def _add_count(self, sql: str, key: Tuple, amount: int):
+        with self._cond:
+            counters = self._counters.setdefault(sql, {})
+            if key in counters:
+                counters[key] += amount
+            elif self._accept():
+                counters[key] = amount
+                self._added()
+
+    def _accept(self) -> bool:
+        if self._pending >= self.max_pending:
+            self.dropped += 1
+            return False
+        if self._thread is None and not self._closed:
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+            self._thread.start()
+        return True
+
+    def _added(self):
+        self._pending += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+            self._cond.notify()
+        elif self._pending >= self.batch_size:
+            self._cond.notify()
+
+    # ========================
+    # FLUSH (fon thread)
+    # ========================
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._due():
+                    self._cond.wait(self._wait_time())
+                if self._closed and self._pending == 0:
+                    return
+            self.flush()
+
+    def _due(self) -> bool:
+        now = time.monotonic()
+        if self._pending == 0 or now < self._retry_at:
+            return False
+        return self._pending >= self.batch_size or now - self._oldest >= self.flush_interval
+
+    def _wait_time(self) -> Optional[float]:
+        if self._oldest is None:
+            return None
+        now = time.monotonic()
+        return max(0.0, self.flush_interval - (now - self._oldest), self._retry_at - now)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def flush(self) -> int:
+        """
+        Buferdagi hamma narsani bitta tranzaksiyada yozadi, yozilgan qatorlar sonini qaytaradi.
+        O'qish o'z yozuvini ko'rishi kerak bo'lsa (read-your-writes) — o'qishdan oldin chaqiriladi.
+        """
+        with self._flush_lock:
+            with self._cond:
+                if self._pending == 0:
+                    return 0
+                rows, counters, oldest = self._rows, self._counters, self._oldest
+                self._rows, self._counters, self._pending, self._oldest = {}, {}, 0, None
+                self._inflight_oldest = oldest
+
+            batches = list(rows.items())
+            batches += [(sql, [(amount, *key) for key, amount in values.items()]) for sql, values in counters.items()]
+            start = time.perf_counter()
+            try:
+                written = self._write(batches)
+            except sqlite3.OperationalError as e:
+                # database is locked / busy — flush_interval dan keyin qayta urinamiz
+                logger.warning("Write-behind flush kechiktirildi (%s): %s", self.name, e)
+                self._requeue(rows, counters, oldest)
+                return 0
+            except Exception as e:
+                logger.error("Write-behind flush xatosi (%s): %s", self.name, e)
+                self.failed += sum(len(params) for _, params in batches)
+                return 0
+            finally:
+                self._inflight_oldest = None
+
+            self.written += written
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            self.max_lag = max(self.max_lag, time.monotonic() - oldest)
+            return written
+
+    def _write(self, batches: List[Tuple[str, List[Tuple]]]) -> int:
+        written = 0
+        with self.pool.connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for sql, params in batches:
+                conn.execute("SAVEPOINT write_behind")
+                try:
+                    conn.executemany(sql, params)
+                    written += len(params)
+                except sqlite3.IntegrityError:
+                    # Paketning yaroqli qismi yo'qolmasin: qaytarib, qatorma-qator yozamiz
+                    conn.execute("ROLLBACK TO write_behind")
+                    for row in params:
+                        try:
+                            conn.execute(sql, row)
+                            written += 1
+                        except sqlite3.IntegrityError as e:
+                            self.failed += 1
+                            logger.warning("Write-behind qator tashlandi (%s): %s", self.name, e)
+                conn.execute("RELEASE write_behind")
+        return written
+
+    def _requeue(self, rows: Dict[str, List[Tuple]], counters: Dict[str, Dict[Tuple, int]], oldest: float):
+        with self._cond:
+            count = sum(len(params) for params in rows.values()) + sum(len(values) for values in counters.values())
+            if self._pending + count > self.max_pending:
+                self.dropped += count
+                return
+            self.retries += 1
+            for sql, params in rows.items():
+                self._rows[sql] = params + self._rows.get(sql, [])
+            for sql, values in counters.items():
+                merged = self._counters.setdefault(sql, {})
+                for key, amount in values.items():
+                    if key not in merged:
+                        self._pending += 1
+                    merged[key] = merged.get(key, 0) + amount
+            self._pending += sum(len(params) for params in rows.values())
+            self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+            self._retry_at = time.monotonic() + self.flush_interval
+
+    # ========================
+    # TO'XTASH
+    # ========================
+    def close(self, timeout: float = 5.0):
+        """Fon threadni to'xtatib, qolgan yozuvlarni yozadi"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            oldest = min((t for t in (self._oldest, self._inflight_oldest) if t is not None), default=None)
+            lag = time.monotonic() - oldest if oldest is not None else 0.0
+            return {
+                'db': self.name,
+                'pending': self._pending,
+                'lag': round(lag, 3),
+                'max_lag': round(self.max_lag, 3),
+                'written': self.written,
+                'flushes': self.flushes,
+                'last_flush_ms': round(self.last_flush_ms, 2),
+                'retries': self.retries,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+
+def get_buffer(pool: ConnectionPool, **kwargs) -> WriteBehindBuffer:
+    """Bitta baza fayli uchun bitta bufer (va bitta fon thread)"""
+    with _buffers_lock:
+        buffer = _buffers.get(pool.db_path)
+        if buffer is None:
+            buffer = WriteBehindBuffer(pool, **kwargs)
+            _buffers[pool.db_path] = buffer
+        return buffer
+
+
+def flush_all() -> int:
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    return sum(buffer.flush() for buffer in buffers)
+
+
+def close_all():
+    """Barcha buferlarni yozib tugatish (atexit, prefork bolasi to'xtashida)"""
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    for buffer in buffers:
+        try:
+            buffer.close()
+        except Exception as e:
+            logger.error("Write-behind yopishda xato (%s): %s", buffer.name, e)
+
+
+def stats() -> Dict[str, Dict]:
+    with _buffers_lock:
+        return {buffer.name: buffer.stats() for buffer in _buffers.values()}
+
+
+def _after_fork_in_child():
+    global _buffers_lock
+    _buffers_lock = threading.Lock()
+    for buffer in _buffers.values():
+        buffer._reset()
+
+
+atexit.register(close_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,28 @@
+# tests/conftest.py
+"""
+Xizmatlar flat import ishlatadi (`from db import ...`) va har birida o'z db.py bor.
+service_module() modulni o'sha xizmat papkasi sys.path boshida turgan holda yuklaydi
+va sys.modules dagi boshqa xizmatning bir xil nomli modullarini almashtiradi.
+"""
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Xizmat papkasidagi flat modullar (boshqa xizmatda ham shu nom bo'lishi mumkin)
+_FLAT_MODULES = ('db', 'repository', 'schemas', 'api', 'main', 'stock_cache', 'bulk', 'router', 'federation')
+
+
+def service_module(service: str, name: str):
+    path = os.path.join(ROOT, service)
+    for module in _FLAT_MODULES:
+        loaded = sys.modules.get(module)
+        if loaded is not None and os.path.dirname(getattr(loaded, '__file__', '') or '') != path:
+            del sys.modules[module]
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+    return importlib.import_module(name)
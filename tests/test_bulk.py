@@ -0,0 +1,119 @@
+# tests/test_bulk.py
+"""products_service/bulk.py: paketli import, checkpoint, xatolar fayli, eksport"""
+import json
+
+import pytest
+
+from conftest import service_module
+
+
+@pytest.fixture
+def bulk():
+    return service_module('products_service', 'bulk')
+
+
+@pytest.fixture
+def db(bulk, tmp_path):
+    database = bulk.ProductDatabase(str(tmp_path / 'products.db'))
+    database.create_category('Telefonlar', 'telefonlar')
+    yield database
+    database.pool.close_all()
+
+
+def _write_jsonl(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+    return str(path)
+
+
+def _record(i, **extra):
+    return {'slug': f"p{i}", 'name': f"Mahsulot {i}", 'price': 1000 + i, 'sku': f"SKU{i}",
+            'category': 'telefonlar', 'attributes': {'Rang': 'qora'}, 'images': [f"https://x/{i}.jpg"],
+            'stock': {'asosiy': 5, 'samarqand': i % 3}, **extra}
+
+
+def _counts(db):
+    with db.get_connection() as conn:
+        return tuple(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                     for table in ('products', 'product_attributes', 'product_images', 'inventory'))
+
+
+def _errors(path):
+    with open(f"{path}.errors.jsonl", encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_invalid_records_go_to_errors_file(bulk, db, tmp_path):
+    records = [_record(i) for i in range(6)]
+    records[1]['price'] = 'abc'
+    records[2]['category'] = 'yoq'
+    records[3]['sku'] = 'SKU0'
+    records.append('{buzuq json')
+    path = _write_jsonl(tmp_path / 'katalog.jsonl', records)
+
+    result = bulk.import_catalog(path, batch_size=2, db=db, progress=None)
+    assert result == {'records': 7, 'written': 3, 'rejected': 4}
+    assert [e['record'] for e in _errors(path)] == [2, 3, 4, 7]
+    assert "SKU boshqa mahsulotda" in _errors(path)[2]['error']
+    assert _counts(db) == (3, 3, 3, 6)
+    assert db.stock_levels_drift() == []
+
+
+def test_interrupted_import_resumes_from_checkpoint(bulk, db, tmp_path, monkeypatch):
+    path = _write_jsonl(tmp_path / 'katalog.jsonl', [_record(i) for i in range(10)])
+    write_batch, calls = bulk._write_batch, []
+
+    def crash_on_third(db, batch):
+        calls.append(len(batch))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return write_batch(db, batch)
+
+    monkeypatch.setattr(bulk, '_write_batch', crash_on_third)
+    with pytest.raises(KeyboardInterrupt):
+        bulk.import_catalog(path, batch_size=3, db=db, progress=None)
+    with open(f"{path}.checkpoint", encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert checkpoint['records'] == 6 and checkpoint['written'] == 6
+    monkeypatch.undo()
+
+    seen = []
+    monkeypatch.setattr(bulk, '_write_batch', lambda db, batch: seen.extend(n for n, _ in batch) or write_batch(db, batch))
+    result = bulk.import_catalog(path, batch_size=3, db=db, progress=None)
+    # Faqat 7-10 yozuvlar qayta o'qiladi; jami hisoblar checkpointdan davom etadi
+    assert seen == [7, 8, 9, 10]
+    assert result == {'records': 10, 'written': 10, 'rejected': 0}
+    assert not (tmp_path / 'katalog.jsonl.checkpoint').exists()
+    assert _counts(db) == (10, 10, 10, 20)
+
+
+def test_reimport_is_idempotent_and_export_round_trips(bulk, db, tmp_path):
+    path = _write_jsonl(tmp_path / 'katalog.jsonl', [_record(i) for i in range(5)])
+    bulk.import_catalog(path, db=db, progress=None)
+    bulk.import_catalog(path, db=db, progress=None)
+    assert _counts(db) == (5, 5, 5, 10)
+
+    for name in ('eksport.jsonl', 'eksport.csv'):
+        out = str(tmp_path / name)
+        assert bulk.export_catalog(out, db=db, progress=None) == 5
+        assert bulk.import_catalog(out, db=db, progress=None) == {'records': 5, 'written': 5, 'rejected': 0}
+        assert _counts(db) == (5, 5, 5, 10)
+    exported = list(bulk.export_records(db))
+    assert exported[1]['stock'] == {'asosiy': 5, 'samarqand': 1}
+    assert exported[1]['attributes'] == [{'name': 'Rang', 'value': 'qora'}]
+
+
+def test_stock_below_held_reservations_is_rejected(bulk, db, tmp_path):
+    bulk.import_catalog(_write_jsonl(tmp_path / 'a.jsonl', [_record(1)]), db=db, progress=None)
+    product_id = db.export_products()[0]['id']
+    assert db.reserve_stock([{'product_id': product_id, 'quantity': 4}], order_id=1)['shortfalls'] == []
+
+    path = _write_jsonl(tmp_path / 'b.jsonl', [_record(1, stock={'asosiy': 3})])
+    assert bulk.import_catalog(path, db=db, progress=None)['rejected'] == 1
+    assert "bron qilingan miqdordan kam" in _errors(path)[0]['error']
+
+    path = _write_jsonl(tmp_path / 'c.jsonl', [_record(1, stock={'asosiy': 4})])
+    assert bulk.import_catalog(path, db=db, progress=None)['written'] == 1
+    assert db.get_stock_levels([product_id]) == {product_id: (5, 4)}
+    assert db.reservation_drift() == [] and db.stock_levels_drift() == []
@@ -0,0 +1,56 @@
+# tests/test_dataloader.py
+"""shared/dataloader.py: batch yig'ish va sinxron batch funksiyaning event loopni to'xtatmasligi"""
+import asyncio
+import threading
+import time
+
+from shared.dataloader import DataLoader
+
+
+def test_sync_batch_runs_off_the_event_loop():
+    calls = []
+
+    def slow_batch(keys):
+        # SQLite so'rovi o'rnida — bloklovchi chaqiruv
+        calls.append((list(keys), threading.current_thread()))
+        time.sleep(0.3)
+        return [key * 10 for key in keys]
+
+    async def main():
+        loader = DataLoader(slow_batch)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        values = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1))
+        task.cancel()
+        return values, ticks, loader
+
+    values, ticks, loader = asyncio.run(main())
+    assert values == [10, 20, 10]
+    assert [keys for keys, _ in calls] == [[1, 2]]
+    assert calls[0][1] is not threading.main_thread()
+    # Batch davomida loop boshqa vazifalarni bajarib turdi
+    assert ticks >= 10
+    assert (loader.batches, loader.keys_loaded) == (1, 2)
+
+
+def test_async_batch_and_length_mismatch():
+    async def batch(keys):
+        return [str(key) for key in keys]
+
+    async def main():
+        values = await DataLoader(batch).load_many([3, 4])
+        try:
+            await DataLoader(lambda keys: keys[:1]).load_many([1, 2])
+        except ValueError as e:
+            return values, str(e)
+
+    values, error = asyncio.run(main())
+    assert values == ['3', '4']
+    assert "2 ta kalit uchun 1 ta qiymat" in error
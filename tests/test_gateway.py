@@ -0,0 +1,182 @@
+# tests/test_gateway.py
+"""
+api_gateway: sxema bo'yicha marshrutlash (namespace), federation (parallel subquerylar, stitching).
+Upstreamlar — graphql-core sxemalari, so'rovlar jarayon ichida bajariladi (federation._post o'rniga).
+"""
+import json
+import threading
+
+import pytest
+from graphql import build_schema, graphql_sync, introspection_from_schema
+
+from conftest import service_module
+
+SDL = {
+    'products': """
+        type Query { product(id: Int!): Product  productsByIds(ids: [Int!]!): [Product]  categories: [Category] }
+        type Mutation { createCategory(name: String!): Int }
+        type Product { id: Int  name: String  price: Float }
+        type Category { id: Int  name: String }
+    """,
+    'orders': """
+        type Query { order(id: Int!): Order }
+        type Mutation { createOrder(userId: Int!): Int }
+        type Order { id: Int  items: [OrderItem] }
+        type OrderItem { product_id: Int  quantity: Int }
+    """,
+    'blog': """
+        type Query { categories: [BlogCategory]  posts: [Post] }
+        type BlogCategory { id: Int  title: String }
+        type Post { id: Int }
+    """,
+    'users': """
+        type Query { me: User  users: [User] }
+        type Mutation { register(name: String!): Int }
+        type User { id: Int  username: String }
+    """,
+}
+PRODUCTS = {1: {'id': 1, 'name': 'Telefon', 'price': 100.0}, 2: {'id': 2, 'name': 'Quloqchin', 'price': 20.0}}
+ROOTS = {
+    'products': {
+        'product': lambda info, id: PRODUCTS.get(id),
+        'productsByIds': lambda info, ids: [PRODUCTS.get(i) for i in ids],
+        'categories': lambda info: [{'id': 1, 'name': 'Telefonlar'}],
+        'createCategory': lambda info, name: 10,
+    },
+    'orders': {
+        'order': lambda info, id: {'id': id, 'items': [
+            {'product_id': 1, 'quantity': 2}, {'product_id': 2, 'quantity': 1}, {'product_id': 1, 'quantity': 3},
+        ]},
+        'createOrder': lambda info, userId: 77,
+    },
+    'blog': {'categories': lambda info: [{'id': 5, 'title': 'Yangiliklar'}], 'posts': lambda info: []},
+    'users': {
+        'me': lambda info: {'id': 1, 'username': 'ali'},
+        'users': lambda info: [{'id': 1, 'username': 'ali'}],
+        'register': lambda info, name: 3,
+    },
+}
+SCHEMAS = {name: build_schema(sdl) for name, sdl in SDL.items()}
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    router = service_module('api_gateway', 'router')
+    federation = service_module('api_gateway', 'federation')
+    main = service_module('api_gateway', 'main')
+
+    table = router.RoutingTable({name: router.SERVICES[name] for name in SDL})
+    for name, schema in SCHEMAS.items():
+        table._load(name, introspection_from_schema(schema)['__schema'])
+    table.version += 1
+
+    calls = []
+    lock = threading.Lock()
+
+    def post(service, query, variables, operation_name=None):
+        with lock:
+            calls.append((service, query, variables))
+        result = graphql_sync(SCHEMAS[service], query, root_value=ROOTS[service],
+                              variable_values=variables, operation_name=operation_name)
+        return 200, result.formatted
+
+    monkeypatch.setattr(federation, '_post', post)
+    monkeypatch.setattr(main, 'router', router.Router(table))
+    return main, calls
+
+
+def _run(main, query, variables=None):
+    return main.execute_operation({'query': query, 'variables': variables or {}})
+
+
+# ========================
+# user-004: sxema bo'yicha marshrutlash
+# ========================
+def test_single_service_query_is_forwarded_unchanged(gateway):
+    main, calls = gateway
+    query = "{ product(id: 1) { name price } }"
+    assert _run(main, query) == (200, {'data': {'product': {'name': 'Telefon', 'price': 100.0}}})
+    assert calls == [('products', query, {})]
+
+
+def test_shared_field_uses_preferred_owner_and_namespace_selects_other(gateway):
+    main, calls = gateway
+    assert _run(main, "{ categories { name } }")[1] == {'data': {'categories': [{'name': 'Telefonlar'}]}}
+    assert calls[-1][0] == 'products'
+
+    status, result = _run(main, "{ blog { categories { title } } categories { id } }")
+    assert result == {'data': {'blog': {'categories': [{'title': 'Yangiliklar'}]}, 'categories': [{'id': 1}]}}
+    assert sorted(service for service, _, _ in calls[1:]) == ['blog', 'products']
+
+
+def test_namespace_only_when_inner_fields_are_service_roots(gateway):
+    main, calls = gateway
+    # users { id } — users xizmatining oddiy `users` maydoni
+    assert _run(main, "{ users { id } }")[1] == {'data': {'users': [{'id': 1}]}}
+    # users { me { ... } } — namespace: ichidagi maydon users xizmatining root maydoni
+    assert _run(main, "{ users { me { username } } }")[1] == {'data': {'users': {'me': {'username': 'ali'}}}}
+    assert [q for _, q, _ in calls][1].split() == ['{', 'me', '{', 'username', '}', '}']
+
+
+def test_unknown_field_is_a_routing_error(gateway):
+    main, calls = gateway
+    status, result = _run(main, "{ nimadir { id } }")
+    assert status == 400 and "Noma'lum maydon" in result['errors'][0]['message']
+    assert calls == []
+
+
+# ========================
+# user-005: federation va stitching
+# ========================
+def test_fields_are_routed_to_owning_services(gateway):
+    main, calls = gateway
+    status, result = _run(main, "query ($p: Int!, $o: Int!) { order(id: $o) { id } product(id: $p) { name } me { username } }",
+                          {'p': 2, 'o': 9})
+    assert status == 200
+    assert result == {'data': {'order': {'id': 9}, 'product': {'name': 'Quloqchin'}, 'me': {'username': 'ali'}}}
+    # Har xizmatga faqat o'z o'zgaruvchilari
+    assert sorted((service, sorted(variables)) for service, _, variables in calls) == [
+        ('orders', ['o']), ('products', ['p']), ('users', [])
+    ]
+
+
+def test_cross_service_reference_is_stitched_with_one_batched_query(gateway):
+    main, calls = gateway
+    status, result = _run(main, "{ order(id: 1) { items { quantity product { name } } } }")
+    assert status == 200
+    assert result == {'data': {'order': {'items': [
+        {'quantity': 2, 'product': {'name': 'Telefon'}},
+        {'quantity': 1, 'product': {'name': 'Quloqchin'}},
+        {'quantity': 3, 'product': {'name': 'Telefon'}},
+    ]}}}
+    services = [service for service, _, _ in calls]
+    assert services == ['orders', 'products']
+    # Takrorlangan id bir marta so'raladi
+    assert list(calls[1][2].values()) == [[1, 2]]
+
+
+def test_mutations_run_in_written_order_across_services(gateway):
+    main, calls = gateway
+    status, result = _run(main, 'mutation { register(name: "a") createCategory(name: "x") createOrder(userId: 3) }')
+    assert result == {'data': {'register': 3, 'createCategory': 10, 'createOrder': 77}}
+    assert [service for service, _, _ in calls] == ['users', 'products', 'orders']
+
+
+# ========================
+# user-009: batch
+# ========================
+def test_batch_through_shared_handler(gateway):
+    main, calls = gateway
+    app = main.GraphQLHandler.app
+    body = json.dumps([
+        {'query': '{ product(id: 1) { name } }'},
+        {'query': 'mutation { register(name: "b") }'},
+        {'query': '{ yoq }'},
+    ]).encode()
+    status, payload = app.handle(body)
+    assert status == 200
+    assert payload[0] == {'data': {'product': {'name': 'Telefon'}}}
+    assert payload[1] == {'data': {'register': 3}}
+    assert "Noma'lum maydon" in payload[2]['errors'][0]['message']
+    # Batchda mutatsiya bor — ketma-ket, yozilgan tartibda
+    assert [service for service, _, _ in calls] == ['products', 'users']
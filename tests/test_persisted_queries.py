@@ -0,0 +1,78 @@
+# tests/test_persisted_queries.py
+"""APQ: klient avval faqat hash yuboradi, xizmat topmasa — to'liq matn bilan qayta"""
+import json
+import threading
+
+import pytest
+from graphql import build_schema
+
+from shared import config, http_client, persisted_queries
+from shared.graphql_app import GraphQLApp
+from shared.handler import GraphQLRequestHandler
+from shared.server import BoundedThreadPoolServer
+
+SCHEMA = build_schema("type Query { hello(name: String): String }")
+SCHEMA.query_type.fields['hello'].resolve = lambda _, info, name='dunyo': f"salom, {name}"
+
+
+class RecordingApp(GraphQLApp):
+    """Kelgan so'rov tanalarini yozib boradi"""
+
+    def __init__(self):
+        super().__init__(SCHEMA, 'apq', context={})
+        self.bodies = []
+
+    def handle(self, raw, client_ip=None, request=None):
+        self.bodies.append(json.loads(raw))
+        return super().handle(raw, client_ip, request)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(config, 'APQ_CLIENT_ENABLED', True)
+
+    class Handler(GraphQLRequestHandler):
+        app = RecordingApp()
+
+    srv = BoundedThreadPoolServer(('127.0.0.1', 0), Handler, workers=2)
+    threading.Thread(target=srv.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    yield Handler.app, f"http://127.0.0.1:{srv.server_address[1]}/graphql"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_hash_miss_then_retry_with_full_query(service):
+    app, url = service
+    query = "query ($n: String) { hello(name: $n) }"
+
+    resp = http_client.post_graphql(url, query, {"n": "Ali"})
+    assert resp.json() == {"data": {"hello": "salom, Ali"}}
+    # 1) faqat hash -> PERSISTED_QUERY_NOT_FOUND, 2) matn + hash
+    assert [('query' in body) for body in app.bodies] == [False, True]
+
+    # Endi hujjat xizmat keshida — faqat hash yetadi
+    resp = http_client.post_graphql(url, query, {"n": "Vali"})
+    assert resp.json() == {"data": {"hello": "salom, Vali"}}
+    assert [('query' in body) for body in app.bodies] == [False, True, False]
+
+
+def test_batch_retries_only_missing_operations(service):
+    app, url = service
+    known, unknown = "{ hello }", "query Q { hello(name: \"batch\") }"
+    http_client.post_graphql(url, known)
+    app.bodies.clear()
+
+    results = http_client.post_graphql_batch(url, [(known, None), (unknown, None)])
+    assert results == [{"data": {"hello": "salom, dunyo"}}, {"data": {"hello": "salom, batch"}}]
+    first, retry = app.bodies
+    assert [('query' in op) for op in first] == [False, False]
+    assert [op.get('query') for op in retry] == [unknown]
+
+
+def test_hash_not_matching_query_is_rejected(service):
+    app, url = service
+    payload = persisted_queries.request_payload("{ hello }", include_query=True)
+    payload['query'] = "{ __typename }"
+    resp = http_client.post(url, json=payload)
+    assert resp.status_code == 400
+    assert "hash" in resp.json()['errors'][0]['message']
@@ -0,0 +1,102 @@
+# tests/test_server.py
+import http.client
+import threading
+import time
+
+import pytest
+from graphql import build_schema
+
+from shared import config
+from shared.graphql_app import GraphQLApp
+from shared.handler import GraphQLRequestHandler
+from shared.server import BoundedThreadPoolServer
+
+SCHEMA = build_schema("type Query { ping: String }")
+PING = b'{"query": "{ ping }"}'
+
+
+class PingHandler(GraphQLRequestHandler):
+    app = GraphQLApp(SCHEMA, 'test', context={})
+
+
+@pytest.fixture
+def server():
+    srv = BoundedThreadPoolServer(('127.0.0.1', 0), PingHandler, workers=2, queue_timeout=1.0)
+    thread = threading.Thread(target=srv.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _post(conn: http.client.HTTPConnection, body: bytes = PING):
+    conn.request('POST', '/graphql', body=body, headers={'Content-Type': 'application/json'})
+    resp = conn.getresponse()
+    return resp.status, resp.read(), resp.getheader('Connection')
+
+
+def _connect(srv, timeout: float = 10.0):
+    return http.client.HTTPConnection(*srv.server_address, timeout=timeout)
+
+
+def test_idle_keepalive_connections_do_not_hold_workers(server):
+    # Ikkala worker soniga teng bo'sh keep-alive klient
+    idle = [_connect(server) for _ in range(server.workers)]
+    for conn in idle:
+        assert _post(conn)[0] == 200
+
+    started = time.monotonic()
+    conn = _connect(server)
+    status, body, _ = _post(conn)
+    elapsed = time.monotonic() - started
+    assert status == 200 and b'"ping"' in body
+    assert elapsed < 1.0, f"yangi so'rov {elapsed:.1f}s kutdi — bo'sh ulanishlar workerni band qilgan"
+    assert server.stats()['idle_connections'] >= server.workers
+
+    # Parkovkadagi ulanishlar qayta ishlatiladi (yangi ulanish ochilmaydi)
+    for c in idle:
+        sock = c.sock
+        assert _post(c)[0] == 200
+        assert c.sock is sock
+    for c in idle + [conn]:
+        c.close()
+
+
+def test_pipelined_requests_on_one_connection(server):
+    # Bir paketda 3 ta so'rov: 2- va 3- si rfile buferida qoladi, selector ularni ko'rmaydi
+    conn = _connect(server)
+    conn.connect()
+    request = (b'POST /graphql HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n'
+               b'Content-Length: %d\r\n\r\n' % len(PING)) + PING
+    conn.sock.sendall(request * 3)
+    reader = conn.sock.makefile('rb')
+    for _ in range(3):
+        assert reader.readline().startswith(b'HTTP/1.1 200')
+        headers = {}
+        for line in iter(reader.readline, b'\r\n'):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        assert b'"ping"' in reader.read(int(headers['content-length']))
+    reader.close()
+    conn.close()
+
+
+def test_idle_connection_closed_after_timeout(server):
+    server._parker.idle_timeout = 0.2
+    conn = _connect(server)
+    assert _post(conn)[0] == 200
+    deadline = time.monotonic() + 3
+    while server.stats()['idle_connections'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert server.stats()['idle_connections'] == 0
+    assert conn.sock.recv(1) == b''
+    conn.close()
+
+
+def test_body_over_limit_rejected(server, monkeypatch):
+    monkeypatch.setattr(config, 'MAX_BODY_SIZE', 64)
+    conn = _connect(server)
+    status, _, connection = _post(conn, b'{"query": "' + b' ' * 100 + b'{ ping }"}')
+    assert status == 413
+    assert connection == 'close'
+    conn.close()
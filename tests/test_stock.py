@@ -0,0 +1,314 @@
+# tests/test_stock.py
+"""products_service: bron (reserve / commit / release / expire), stock keshi, omborlar va stock_levels"""
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import service_module
+
+
+@pytest.fixture
+def db(tmp_path):
+    module = service_module('products_service', 'db')
+    database = module.ProductDatabase(str(tmp_path / 'products.db'))
+    yield database
+    database.pool.close_all()
+
+
+@pytest.fixture
+def products(db):
+    """Ikki mahsulot: A — asosiy 10, B — asosiy 5"""
+    category = db.create_category('Telefonlar', 'telefonlar')
+    a = db.create_product('A', 'a', 100, category)
+    b = db.create_product('B', 'b', 200, category)
+    db.update_stock(a, 10)
+    db.update_stock(b, 5)
+    return a, b
+
+
+def _levels(db, *product_ids):
+    return {pid: db.load_stock([pid]).get(pid) for pid in product_ids}
+
+
+def _consistent(db, ledger: bool = True):
+    assert db.stock_levels_drift() == []
+    if ledger:
+        # order_id siz bronlar ledgerda yo'q — reservation_drift ularni farq sifatida ko'rsatadi
+        assert db.reservation_drift() == []
+    assert db.stock_cache.verify() == []
+
+
+# ========================
+# user-021: hammasi yoki hech biri
+# ========================
+def test_reserve_is_all_or_nothing(db, products):
+    a, b = products
+    result = db.reserve_stock([{'product_id': a, 'quantity': 3}, {'product_id': b, 'quantity': 6}])
+    assert result['allocations'] == []
+    assert result['shortfalls'] == [{'product_id': b, 'requested': 6, 'free_stock': 5}]
+    # Yetgan pozitsiya ham bron qilinmagan
+    assert _levels(db, a, b) == {a: (10, 0), b: (5, 0)}
+
+    result = db.reserve_stock([{'product_id': a, 'quantity': 3}, {'product_id': b, 'quantity': 5}])
+    assert result['shortfalls'] == []
+    assert _levels(db, a, b) == {a: (10, 3), b: (5, 5)}
+    _consistent(db, ledger=False)
+
+
+def test_reserve_merges_duplicate_items_and_rejects_unknown(db, products):
+    a, _ = products
+    result = db.reserve_stock([{'product_id': a, 'quantity': 6}, {'product_id': a, 'quantity': 5}])
+    assert result['shortfalls'] == [{'product_id': a, 'requested': 11, 'free_stock': 10}]
+    result = db.reserve_stock([{'product_id': 999, 'quantity': 1}])
+    assert result['shortfalls'] == [{'product_id': 999, 'requested': 1, 'free_stock': 0}]
+
+
+def test_concurrent_reservations_never_oversell(db, products):
+    a, _ = products
+    wins = []
+
+    def worker():
+        if not db.reserve_stock([{'product_id': a, 'quantity': 1}])['shortfalls']:
+            wins.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(25)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(wins) == 10
+    assert _levels(db, a) == {a: (10, 10)}
+
+
+# ========================
+# user-022: bron ledgeri
+# ========================
+def test_order_reservation_is_idempotent(db, products):
+    a, b = products
+    items = [{'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 1}]
+    first = db.reserve_stock(items, order_id=1)
+    again = db.reserve_stock(items, order_id=1)
+    assert again == first
+    assert _levels(db, a, b) == {a: (10, 2), b: (5, 1)}
+    _consistent(db)
+
+
+def test_commit_then_release_returns_sold_stock(db, products):
+    a, b = products
+    db.reserve_stock([{'product_id': a, 'quantity': 4}], order_id=7)
+    assert db.commit_order_stock(7) == 1
+    assert db.commit_order_stock(7) == 0          # idempotent
+    assert _levels(db, a) == {a: (6, 0)}
+
+    assert db.release_order_stock(7) == 1         # sotilgan — omborga qaytadi
+    assert _levels(db, a) == {a: (10, 0)}
+    assert db.release_order_stock(7) == 0
+    assert db.release_order_stock(12345) is None  # ledgerda yo'q buyurtma
+    with pytest.raises(ValueError):
+        db.commit_order_stock(7)
+    _consistent(db)
+
+
+def test_expired_reservation_returns_stock_and_blocks_commit(db, products):
+    a, b = products
+    db.reserve_stock([{'product_id': a, 'quantity': 3}, {'product_id': b, 'quantity': 2}], order_id=3, ttl=0)
+    db.reserve_stock([{'product_id': a, 'quantity': 1}], order_id=4, ttl=3600)
+    assert db.expire_reservations() == 1
+    assert db.expire_reservations() == 0
+    assert _levels(db, a, b) == {a: (10, 1), b: (5, 0)}
+    with pytest.raises(ValueError):
+        db.commit_order_stock(3)
+    _consistent(db)
+
+
+def test_expiry_takes_whole_orders_per_batch(db, products):
+    a, b = products
+    for order_id in (1, 2, 3):
+        db.reserve_stock([{'product_id': a, 'quantity': 1}, {'product_id': b, 'quantity': 1}],
+                         order_id=order_id, ttl=0)
+    # limit — buyurtmalar soni: bitta buyurtmaning qatorlari paketlar orasida bo'linmaydi
+    assert db.expire_reservations(limit=1) == 1
+    with db.get_connection() as conn:
+        statuses = conn.execute("""
+            SELECT order_id, GROUP_CONCAT(DISTINCT status) AS s FROM stock_reservations GROUP BY order_id
+        """).fetchall()
+    assert sorted((row['order_id'], row['s']) for row in statuses) == [(1, 'expired'), (2, 'held'), (3, 'held')]
+    assert db.expire_reservations(limit=5) == 2
+    assert _levels(db, a, b) == {a: (10, 0), b: (5, 0)}
+    _consistent(db)
+
+
+def _expire_row(db, order_id, product_id):
+    """Eski (qatorlar bo'yicha) sweeper qoldirgan holat: buyurtmaning bitta qatori muddati o'tgan"""
+    with db.get_connection() as conn:
+        row = conn.execute("SELECT id, inventory_id, quantity FROM stock_reservations WHERE order_id = ? "
+                           "AND product_id = ?", (order_id, product_id)).fetchone()
+        conn.execute("UPDATE stock_reservations SET status = 'expired' WHERE id = ?", (row['id'],))
+        conn.execute("UPDATE inventory SET reserved_quantity = reserved_quantity - ? WHERE id = ?",
+                     (row['quantity'], row['inventory_id']))
+    db.stock_cache.invalidate()
+
+
+def _ledger(db, order_id):
+    with db.get_connection() as conn:
+        return sorted(tuple(row) for row in conn.execute(
+            "SELECT product_id, quantity, status FROM stock_reservations WHERE order_id = ?", (order_id,)))
+
+
+def test_partially_expired_order_is_not_committed_or_returned_partially(db, products):
+    a, b = products
+    items = [{'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 2}]
+    db.reserve_stock(items, order_id=5)
+    _expire_row(db, 5, a)
+
+    with pytest.raises(ValueError):
+        db.commit_order_stock(5)
+    result = db.reserve_stock(items, order_id=5)
+    assert sorted((x['product_id'], x['quantity']) for x in result['allocations']) == [(a, 2), (b, 2)]
+    assert _levels(db, a, b) == {a: (10, 2), b: (5, 2)}
+    assert db.commit_order_stock(5) == 2
+    _consistent(db)
+
+
+@pytest.mark.parametrize('nested', [False, True])
+def test_failed_re_reservation_keeps_existing_hold(db, products, nested):
+    a, b = products
+    items = [{'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 2}]
+    db.reserve_stock(items, order_id=5)
+    _expire_row(db, 5, a)
+    db.reserve_stock([{'product_id': a, 'quantity': 9}])      # A dan endi 1 dona bo'sh
+    before = _ledger(db, 5)
+
+    if nested:
+        with db.get_connection():
+            result = db.reserve_stock(items, order_id=5)
+    else:
+        result = db.reserve_stock(items, order_id=5)
+    assert result == {'shortfalls': [{'product_id': a, 'requested': 2, 'free_stock': 1}], 'allocations': []}
+    # Hammasi yoki hech biri: B ning 'held' qatori va ledger joyida
+    assert _ledger(db, 5) == before == [(a, 2, 'expired'), (b, 2, 'held')]
+    assert _levels(db, a, b) == {a: (10, 9), b: (5, 2)}
+    _consistent(db, ledger=False)
+
+
+# ========================
+# user-023: write-through kesh
+# ========================
+def test_cache_matches_database_after_failed_transaction(db, products, monkeypatch):
+    a, _ = products
+    assert db.get_stock_levels([a]) == {a: (10, 0)}
+    put = db.stock_cache.put
+
+    def put_then_fail(rows):
+        # Kesh yangilangan, lekin commit bo'lmaydi (masalan disk xatosi)
+        put(rows)
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(db.stock_cache, 'put', put_then_fail)
+    with pytest.raises(sqlite3.OperationalError):
+        db.reserve_stock([{'product_id': a, 'quantity': 4}])
+    with pytest.raises(sqlite3.OperationalError):
+        db.update_stock(a, 50)
+    monkeypatch.undo()
+
+    assert db.get_stock_levels([a]) == {a: (10, 0)}
+    assert db.stock_cache.verify() == []
+
+
+def test_cache_ignores_load_that_raced_a_write(db, products):
+    a, _ = products
+    cache_module = service_module('products_service', 'stock_cache')
+    cache = None
+
+    def slow_loader(ids):
+        stale = db.load_stock(ids)
+        # Yuklash davomida boshqa thread yozdi — eski qiymat uni bosib ketmasligi kerak
+        cache.put([(a, 99, 1)])
+        return stale
+
+    cache = cache_module.StockCache(slow_loader, ttl=60)
+    assert cache.get_many([a]) == {a: (10, 0)}
+    assert cache.get_many([a]) == {a: (99, 1)}
+
+
+def test_cache_sees_reservations_immediately(db, products):
+    a, _ = products
+    assert db.get_stock_levels([a]) == {a: (10, 0)}
+    db.reserve_stock([{'product_id': a, 'quantity': 7}])
+    hits = db.stock_cache.hits
+    assert db.get_stock_levels([a]) == {a: (10, 7)}
+    assert db.stock_cache.hits == hits + 1
+
+
+def test_cache_dropped_when_outer_transaction_rolls_back(db, products):
+    a, _ = products
+    assert db.get_stock_levels([a]) == {a: (10, 0)}
+    with pytest.raises(RuntimeError):
+        with db.get_connection():
+            created = db.create_product('C', 'c', 50, stock_quantity=8)
+            db.update_stock(a, 30)
+            db.reserve_stock([{'product_id': a, 'quantity': 4}])
+            raise RuntimeError("tashqi tranzaksiya xatosi")
+    # Mahsulot ham, stock o'zgarishlari ham yo'q — kesh TTL gacha eski qiymat bermaydi
+    assert db.get_product_by_id(created) is None
+    assert db.get_stock_levels([a, created]) == {a: (10, 0), created: (0, 0)}
+    assert db.stock_cache.verify() == []
+
+    created = db.create_product('C', 'c', 50, stock_quantity=8)
+    hits = db.stock_cache.hits
+    assert db.get_stock_levels([created]) == {created: (8, 0)}
+    assert db.stock_cache.hits == hits + 1
+
+
+# ========================
+# user-024: omborlar
+# ========================
+def test_allocate_prefers_single_warehouse_covering_most_items():
+    module = service_module('products_service', 'db')
+    candidates = [
+        {'id': 1, 'product_id': 1, 'warehouse_location': 'asosiy', 'free': 5},
+        {'id': 2, 'product_id': 1, 'warehouse_location': 'samarqand', 'free': 5},
+        {'id': 3, 'product_id': 2, 'warehouse_location': 'samarqand', 'free': 2},
+        {'id': 4, 'product_id': 3, 'warehouse_location': 'asosiy', 'free': 2},
+        {'id': 5, 'product_id': 3, 'warehouse_location': 'buxoro', 'free': 3},
+    ]
+    allocations, shortfalls = module.allocate_warehouses([(1, 3), (2, 2), (3, 4)], candidates)
+    assert shortfalls == []
+    assert [(x['product_id'], x['warehouse_location'], x['quantity']) for x in allocations] == [
+        (1, 'samarqand', 3),   # 2- pozitsiya ham shu omborda — bitta jo'natma
+        (2, 'samarqand', 2),
+        (3, 'buxoro', 3),      # hech biri to'liq qoplamaydi — kattasidan boshlab bo'linadi
+        (3, 'asosiy', 1),
+    ]
+    _, shortfalls = module.allocate_warehouses([(2, 3)], candidates)
+    assert shortfalls == [{'product_id': 2, 'requested': 3, 'free_stock': 2}]
+
+
+def test_reservation_splits_across_warehouses(db, products):
+    a, _ = products
+    db.update_stock(a, 4, 'samarqand')
+    assert _levels(db, a) == {a: (14, 0)}
+    result = db.reserve_stock([{'product_id': a, 'quantity': 12}], order_id=1)
+    assert sorted((x['warehouse_location'], x['quantity']) for x in result['allocations']) == [
+        ('asosiy', 10), ('samarqand', 2)
+    ]
+    stock = {w['warehouse_location']: (w['quantity'], w['reserved_quantity']) for w in db.get_warehouse_stock(a)}
+    assert stock == {'asosiy': (10, 10), 'samarqand': (4, 2)}
+    db.commit_order_stock(1)
+    assert _levels(db, a) == {a: (2, 0)}
+    _consistent(db)
+
+
+def test_stock_levels_triggers_follow_every_inventory_change(db, products):
+    a, b = products
+    with db.get_connection() as conn:
+        conn.execute("INSERT INTO inventory (product_id, warehouse_location, quantity, reserved_quantity) "
+                     "VALUES (?, 'buxoro', 7, 2)", (a,))
+        conn.execute("UPDATE inventory SET quantity = quantity + 3 WHERE product_id = ? AND warehouse_location = 'asosiy'", (a,))
+        # Qatorni boshqa mahsulotga ko'chirish
+        conn.execute("UPDATE inventory SET product_id = ? WHERE product_id = ? AND warehouse_location = 'buxoro'", (b, a))
+        conn.execute("DELETE FROM inventory WHERE product_id = ? AND warehouse_location = 'asosiy'", (b,))
+    db.stock_cache.invalidate()
+    assert db.stock_levels_drift() == []
+    assert _levels(db, a, b) == {a: (13, 0), b: (7, 2)}
@@ -0,0 +1,66 @@
+# tests/test_write_behind.py
+"""shared/write_behind.py: yozuv buferga chaqiruvchi tranzaksiya commit bo'lgandan keyingina tushadi"""
+import pytest
+
+from shared.db_pool import ConnectionPool
+from shared.write_behind import WriteBehindBuffer
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'cart.db'), pragmas=(('foreign_keys', 'ON'),))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE carts (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE cart_activity_log (cart_id INTEGER NOT NULL REFERENCES carts(id), action TEXT)")
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def buffer(pool):
+    buffer = WriteBehindBuffer(pool, flush_interval=60)
+    yield buffer
+    buffer.close()
+
+
+LOG = "INSERT INTO cart_activity_log (cart_id, action) VALUES (?, ?)"
+
+
+def _logged(pool):
+    with pool.connection() as conn:
+        return [tuple(row) for row in conn.execute("SELECT cart_id, action FROM cart_activity_log")]
+
+
+def test_row_is_queued_after_outermost_commit(pool, buffer):
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO carts (id) VALUES (1)")
+        # Ichki `with` (db.add_item) tugadi, lekin tashqi tranzaksiya hali ochiq
+        with pool.connection():
+            buffer.add(LOG, (1, 'add'))
+        assert buffer.pending == 0
+        # Fon flush shu paytda yozsa — savat hali ko'rinmaydi va FK xatosi bilan tashlanardi
+    assert buffer.pending == 1
+    assert buffer.flush() == 1
+    assert _logged(pool) == [(1, 'add')]
+    assert buffer.failed == 0
+
+
+def test_rolled_back_change_is_not_logged(pool, buffer):
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO carts (id) VALUES (2)")
+            buffer.add(LOG, (2, 'add'))
+            buffer.increment("UPDATE carts SET id = id + ? WHERE id = ?", (2,))
+            raise RuntimeError("get_cart_summary xatosi")
+    assert buffer.pending == 0
+    # Keyingi tranzaksiya eskisining callbacklarini meros olmaydi
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO carts (id) VALUES (3)")
+        buffer.add(LOG, (3, 'add'))
+    assert buffer.flush() == 1
+    assert _logged(pool) == [(3, 'add')]
+
+
+def test_add_outside_transaction_is_queued_immediately(buffer):
+    buffer.add(LOG, (1, 'view'))
+    assert buffer.pending == 1
@@ -1,27 +1,52 @@
 # users_service/db.py
-import sqlite3
-from contextlib import contextmanager
 import bcrypt
 from typing import Optional, List, Dict, Any
 import os
+from shared.db_pool import get_pool
+from shared.migrations import Migration, migrate
+from shared.write_behind import get_buffer
+
+# Boshlang'ich sxemadan keyingi o'zgarishlar (shared/migrations.py)
+MIGRATIONS = (
+    Migration(1, 'user_activity_index', (
+        # Wishlist: WHERE user_id = ? AND action = ? — product_id ham indeksda (jadvalga qaytilmaydi)
+        "CREATE INDEX IF NOT EXISTS idx_user_activity_user_action ON user_activity(user_id, action, product_id)",
+    )),
+    # AFTER UPDATE trigger har UPDATE ni ikki marta yozardi — updated_at endi UPDATE ning o'zida
+    Migration(2, 'drop_updated_at_trigger', (
+        "DROP TRIGGER IF EXISTS update_user_ts",
+    )),
+)
+
+# Tez-tez ishlaydigan so'rovlar — `python -m shared.migrations` to'liq o'qishga tekshiradi
+HOT_QUERIES = {
+    'user_by_id': ("""
+        SELECT u.*, l.points, l.tier FROM users u
+        LEFT JOIN loyalty l ON u.id = l.user_id
+        WHERE u.id = ?
+    """, (1,)),
+    'user_by_email': ("SELECT * FROM users WHERE email = ?", ('a@b.uz',)),
+    'wishlist': ("SELECT product_id FROM user_activity WHERE user_id = ? AND action = 'wishlist_add'", (1,)),
+}
+
+# Wishlist user_activity da saqlanadi — bu foydalanuvchi ma'lumoti, telemetriya emas:
+# darhol yoziladi (keyingi o'qish har qanday processda ko'radi), write-behind buferiga tushmaydi
+SYNC_ACTIVITY_ACTIONS = ('wishlist_add', 'wishlist_remove')
+
 
 class UserDatabase:
     def __init__(self, db_path: str = 'users.db'):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
+        self.pool = get_pool(self.db_path)
+        # audit_log va ko'rishlar (user_activity 'view') — fon threadda paketlab yoziladi (shared/write_behind.py)
+        self.activity = get_buffer(self.pool)
         self.init_db()
 
-    @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        """
+        Xavfsiz tranzaksiya: commit yoki rollback (thread ulanishi pooldan)
+        """
+        return self.pool.connection()
 
     def init_db(self):
         with self.get_connection() as conn:
@@ -78,13 +103,7 @@ class UserDatabase:
                 )
             """)
 
-            conn.execute("""
-                CREATE TRIGGER IF NOT EXISTS update_user_ts
-                AFTER UPDATE ON users FOR EACH ROW
-                BEGIN
-                    UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
-                END;
-            """)
+            migrate(conn, MIGRATIONS)
 
     # ========================
     # HASHING
@@ -154,7 +173,6 @@ class UserDatabase:
                 ORDER BY u.created_at DESC
             """)
             rows = cursor.fetchall()
-            print([dict(row) for row in rows])
             return [dict(row) for row in rows]
 
     def update_user(self, user_id: int, **kwargs) -> bool:
@@ -176,7 +194,7 @@ class UserDatabase:
 
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f"UPDATE users SET {fields} WHERE id = ?", values)
+            cursor.execute(f"UPDATE users SET {fields}, updated_at = CURRENT_TIMESTAMP WHERE id = ?", values)
             return cursor.rowcount > 0
 
     def deactivate_user(self, user_id: int) -> bool:
@@ -189,13 +207,17 @@ class UserDatabase:
     # USER ACTIVITY
     # ========================
     def add_user_activity(self, user_id: int, product_id: int, action: str) -> bool:
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO user_activity (user_id, product_id, action)
-                VALUES (?, ?, ?)
-            """, (user_id, product_id, action))
-            return cursor.rowcount > 0
+        sql = """
+            INSERT INTO user_activity (user_id, product_id, action)
+            VALUES (?, ?, ?)
+        """
+        params = (user_id, product_id, action)
+        if action in SYNC_ACTIVITY_ACTIONS:
+            with self.get_connection() as conn:
+                return conn.execute(sql, params).rowcount > 0
+        # Ko'rishlar — telemetriya: buferga (tashlanishi mumkin, o'qishlar kutmaydi)
+        self.activity.add(sql, params)
+        return True
 
     def get_wishlist(self, user_id: int) -> List[int]:
         with self.get_connection() as conn:
@@ -222,8 +244,7 @@ class UserDatabase:
     # AUDIT LOG
     # ========================
     def log_action(self, user_id: int, action: str, entity: str, entity_id: int = None, details: str = None):
-        with self.get_connection() as conn:
-            conn.execute("""
-                INSERT INTO audit_log (user_id, action, entity, entity_id, details)
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_id, action, entity, entity_id, details))
\ No newline at end of file
+        self.activity.add("""
+            INSERT INTO audit_log (user_id, action, entity, entity_id, details)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, action, entity, entity_id, details))
\ No newline at end of file